@@ -0,0 +1,177 @@
+"""
+Cohort score distributions per topic.
+
+Every score submitted for a topic, across all users, lands in a fixed-bin
+histogram. Histograms merge by adding bin counts, so each process buffers
+new scores in memory and periodically adds them to the topic_sketch_bins
+table with an upsert. Reading a topic touches at most BIN_COUNT rows no
+matter how many submissions exist.
+"""
+import threading
+import time
+from submission_scores import intern_topics
+from topic_catalog import fold_topic
+
+BIN_COUNT = 100
+SCORE_MAX = 100
+DISPLAY_BIN_WIDTH = 10
+
+UPSERT_BIN_SQL = '''
+    INSERT INTO topic_sketch_bins (topic_id, bin, count, score_sum)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT (topic_id, bin) DO UPDATE SET
+        count = count + excluded.count,
+        score_sum = score_sum + excluded.score_sum
+'''
+
+
+def score_bin(score):
+    """Return the histogram bin for a score, clamping to the valid range"""
+    return min(max(int(score * BIN_COUNT / SCORE_MAX), 0), BIN_COUNT - 1)
+
+
+class Histogram:
+    """Fixed-bin score histogram that can be merged with others of the same shape"""
+
+    def __init__(self):
+        self.counts = [0] * BIN_COUNT
+        self.sums = [0.0] * BIN_COUNT
+
+    @property
+    def total(self):
+        return sum(self.counts)
+
+    def add(self, score):
+        index = score_bin(score)
+        self.counts[index] += 1
+        self.sums[index] += score
+
+    def add_bin(self, index, count, score_sum):
+        self.counts[index] += count
+        self.sums[index] += score_sum
+
+    def merge(self, other):
+        for index in range(BIN_COUNT):
+            self.counts[index] += other.counts[index]
+            self.sums[index] += other.sums[index]
+
+    def mean(self):
+        total = self.total
+        return sum(self.sums) / total if total else None
+
+    def percentile_rank(self, score):
+        """Percentage of recorded scores below score, counting its own bin as half"""
+        total = self.total
+        if not total:
+            return None
+        index = score_bin(score)
+        below = sum(self.counts[:index])
+        return 100 * (below + self.counts[index] / 2) / total
+
+    def buckets(self, width=DISPLAY_BIN_WIDTH):
+        """Coarsen the bins into [start, end) ranges of width points for display"""
+        step = max(1, int(width * BIN_COUNT / SCORE_MAX))
+        bin_width = SCORE_MAX / BIN_COUNT
+        return [
+            {
+                'start': index * bin_width,
+                'end': min((index + step) * bin_width, SCORE_MAX),
+                'count': sum(self.counts[index:index + step])
+            }
+            for index in range(0, BIN_COUNT, step)
+        ]
+
+
+def rebuild_sketches(conn):
+    """Recompute every topic histogram from submission_scores, returning the score count"""
+    conn.execute('DELETE FROM topic_sketch_bins')
+    conn.execute('''
+        INSERT INTO topic_sketch_bins (topic_id, bin, count, score_sum)
+        SELECT topic_id, MIN(MAX(CAST(score * ? / ? AS INTEGER), 0), ? - 1) AS bin, COUNT(*), SUM(score)
+        FROM submission_scores
+        GROUP BY topic_id, bin
+    ''', (BIN_COUNT, SCORE_MAX, BIN_COUNT))
+    return conn.execute('SELECT COALESCE(SUM(count), 0) FROM topic_sketch_bins').fetchone()[0]
+
+
+class TopicSketches:
+    """Per-topic histograms updated in memory and flushed to SQLite every flush_interval seconds"""
+
+    def __init__(self, pool, flush_interval=30):
+        self.pool = pool
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, topics, scores):
+        """Add one submission's scores to the pending histograms"""
+        self.record_many([(topics, scores)])
+
+    def record_many(self, entries):
+        """Add the scores of (topics, scores) entries to the pending histograms"""
+        with self._lock:
+            for topics, scores in entries:
+                for topic, score in zip(topics, scores):
+                    # Keyed by fold key, keeping a spelling to intern on flush
+                    key = fold_topic(topic)
+                    pending = self._pending.get(key)
+                    if pending is None:
+                        pending = self._pending[key] = (topic, Histogram())
+                    pending[1].add(score)
+        self.maybe_flush()
+
+    def maybe_flush(self):
+        """Flush if the last flush was more than flush_interval seconds ago"""
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Add the pending histograms to the persisted ones, returning the number of topics written"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        try:
+            with self.pool.transaction() as conn:
+                topic_ids = intern_topics(conn, [topic for topic, _ in pending.values()])
+                conn.executemany(UPSERT_BIN_SQL, [
+                    (topic_ids[topic], index, count, histogram.sums[index])
+                    for topic, histogram in pending.values()
+                    for index, count in enumerate(histogram.counts) if count
+                ])
+        except Exception:
+            # Keep the scores for the next attempt
+            with self._lock:
+                for key, (topic, histogram) in pending.items():
+                    self._pending.setdefault(key, (topic, Histogram()))[1].merge(histogram)
+            raise
+
+        return len(pending)
+
+    def discard_pending(self):
+        """Drop unflushed scores, used before rebuilding from submission_scores"""
+        with self._lock:
+            self._pending = {}
+
+    def get(self, topic):
+        """Return the persisted histogram for topic merged with this process's pending scores"""
+        key = fold_topic(topic)
+        histogram = Histogram()
+        with self.pool.connection() as conn:
+            rows = conn.execute('''
+                SELECT b.bin, b.count, b.score_sum
+                FROM topic_sketch_bins b
+                JOIN topics t ON t.id = b.topic_id
+                WHERE t.fold_key = ?
+            ''', (key,)).fetchall()
+        for index, count, score_sum in rows:
+            histogram.add_bin(index, count, score_sum)
+
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None:
+                histogram.merge(pending[1])
+        return histogram
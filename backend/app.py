@@ -1,43 +1,295 @@
-from flask import Flask, request, jsonify
-from feedback_agent import FeedbackAgent
-from rule_feedback import RuleFeedbackEngine
+from flask import Flask, Response, g, request, jsonify
+from dotenv import load_dotenv
 from database import DatabaseManager
+from sharding import ShardedDatabaseManager, shard_paths
 from auth import SimpleAuth
-import csv
+from feedback_jobs import FeedbackJobQueue
+from feedback_cache import FeedbackCache
+from rollups import BUCKETS, OVERALL_TOPIC
+from export import EXPORT_FORMATS, EXPORT_WRITERS, parse_date_filter
+from importer import IMPORT_FORMATS, IMPORT_READERS, detect_format, import_submissions
+from validation import FEEDBACK_MODES, canonicalize_topics, validate_assessment
+from topic_catalog import MAX_SUGGESTIONS, load_catalog
+from rate_limit import MemoryBucketStore, RateLimiter, SqliteBucketStore, parse_limit, parse_route_limits
+from services import LazyService
+from metrics import REGISTRY, HTTP_IN_FLIGHT, HTTP_REQUESTS, HTTP_REQUEST_DURATION, RATE_LIMITED_REQUESTS
+from profiling import SamplingProfiler, save_profile
+from serialization import dumps, json_provider_class
+from compression import compress_response, negotiate_encoding
+import atexit
+import hmac
 import io
-import json
-from datetime import datetime
+import math
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from functools import wraps
 
 app = Flask(__name__)
 
-# Initialize database and feedback engines
-db = DatabaseManager()
-auth = SimpleAuth()
-ai_feedback_agent = FeedbackAgent()
-rule_feedback_engine = RuleFeedbackEngine()
+def load_config():
+    """Read database locations and service settings from the environment and .env"""
+    load_dotenv()
 
-# Single CORS handler
+    data_dir = os.getenv('DATA_DIR', '.')
+    return {
+        'DATA_DIR': data_dir,
+        'HISTORY_DB_PATH': os.getenv('HISTORY_DB_PATH', os.path.join(data_dir, 'history.db')),
+        'HISTORY_SHARDS': int(os.getenv('HISTORY_SHARDS', '1')),
+        'USERS_DB_PATH': os.getenv('USERS_DB_PATH', os.path.join(data_dir, 'users.db')),
+        'SESSION_SECRET': os.getenv('SESSION_SECRET'),
+        'FEEDBACK_CACHE_SIZE': int(os.getenv('FEEDBACK_CACHE_SIZE', '1024')),
+        'FEEDBACK_CACHE_TTL': int(os.getenv('FEEDBACK_CACHE_TTL', '3600')),
+        'FEEDBACK_CACHE_DB': os.getenv('FEEDBACK_CACHE_DB'),
+        'FEEDBACK_WORKERS': int(os.getenv('FEEDBACK_WORKERS', '4')),
+        'FEEDBACK_QUEUE_DEPTH': int(os.getenv('FEEDBACK_QUEUE_DEPTH', '100')),
+        'FEEDBACK_JOB_TIMEOUT': int(os.getenv('FEEDBACK_JOB_TIMEOUT', '300')),
+        'JSON_SERIALIZER': os.getenv('JSON_SERIALIZER', 'auto'),
+        'COMPRESSION_MIN_SIZE': int(os.getenv('COMPRESSION_MIN_SIZE', '1024')),
+        'COMPRESSION_LEVEL': int(os.getenv('COMPRESSION_LEVEL', '6')),
+        'GROUP_COMMIT_ENABLED': os.getenv('GROUP_COMMIT_ENABLED', '').lower() in ('1', 'true', 'yes'),
+        'GROUP_COMMIT_INTERVAL_MS': float(os.getenv('GROUP_COMMIT_INTERVAL_MS', '0')),
+        'GROUP_COMMIT_MAX_BATCH': int(os.getenv('GROUP_COMMIT_MAX_BATCH', '256')),
+        'GROUP_COMMIT_SYNCHRONOUS': os.getenv('GROUP_COMMIT_SYNCHRONOUS', 'NORMAL'),
+        'IMPORT_BATCH_SIZE': int(os.getenv('IMPORT_BATCH_SIZE', '5000')),
+        'RATE_LIMIT_ENABLED': os.getenv('RATE_LIMIT_ENABLED', 'true').lower() in ('1', 'true', 'yes'),
+        'RATE_LIMIT_PER_USER': parse_limit(os.getenv('RATE_LIMIT_PER_USER', '300/m')),
+        'RATE_LIMIT_ROUTES': parse_route_limits(os.getenv(
+            'RATE_LIMIT_ROUTES', 'get_feedback=30/m,stream_feedback=30/m,get_feedback_batch=10/m,import_history=10/h'
+        )),
+        'RATE_LIMIT_DB': os.getenv('RATE_LIMIT_DB'),
+        'TOPIC_CATALOG_PATH': os.getenv('TOPIC_CATALOG_PATH'),
+    }
+
+def configure_app(config):
+    """Apply settings, including ones that replace parts of the Flask app"""
+    app.config.update(config)
+    app.json = json_provider_class(app.config['JSON_SERIALIZER'])(app)
+
+def _ensure_parent_dir(path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+# Per-process services. Each one is built on first use in the process that
+# serves the request, so importing the app opens nothing and a pre-fork
+# server never shares SQLite connections or worker threads. The schema is
+# expected to be current already, see migrate_databases().
+def _build_db():
+    _ensure_parent_dir(app.config['HISTORY_DB_PATH'])
+    group_commit = app.config['GROUP_COMMIT_ENABLED']
+    options = dict(
+        migrate=False,
+        group_commit_interval=app.config['GROUP_COMMIT_INTERVAL_MS'] / 1000 if group_commit else None,
+        group_commit_batch=app.config['GROUP_COMMIT_MAX_BATCH'],
+        group_commit_synchronous=app.config['GROUP_COMMIT_SYNCHRONOUS']
+    )
+    if app.config['HISTORY_SHARDS'] > 1:
+        return ShardedDatabaseManager(app.config['HISTORY_DB_PATH'], app.config['HISTORY_SHARDS'], **options)
+    return DatabaseManager(app.config['HISTORY_DB_PATH'], **options)
+
+def _build_auth():
+    _ensure_parent_dir(app.config['USERS_DB_PATH'])
+    return SimpleAuth(app.config['USERS_DB_PATH'], session_secret=app.config['SESSION_SECRET'], migrate=False)
+
+def _build_feedback_cache():
+    if app.config['FEEDBACK_CACHE_SIZE'] <= 0:
+        return None
+    return FeedbackCache(
+        max_entries=app.config['FEEDBACK_CACHE_SIZE'],
+        ttl=app.config['FEEDBACK_CACHE_TTL'],
+        db_path=app.config['FEEDBACK_CACHE_DB']
+    )
+
+def _build_topic_catalog():
+    return load_catalog(app.config['TOPIC_CATALOG_PATH'])
+
+def _build_rule_feedback_engine():
+    from rule_feedback import RuleFeedbackEngine
+    return RuleFeedbackEngine(catalog=topic_catalog.get())
+
+def _build_ai_feedback_agent():
+    # Imported here so requests is loaded by the first AI request, not at startup
+    from feedback_agent import FeedbackAgent
+    return FeedbackAgent(cache=feedback_cache.get(), fallback_engine=rule_feedback_engine.get(),
+                         catalog=topic_catalog.get())
+
+def _build_rate_limiter():
+    if not app.config['RATE_LIMIT_ENABLED']:
+        return None
+    # A SQLite store makes the limits hold across every worker on the host
+    if app.config['RATE_LIMIT_DB']:
+        _ensure_parent_dir(app.config['RATE_LIMIT_DB'])
+        store = SqliteBucketStore(app.config['RATE_LIMIT_DB'])
+    else:
+        store = MemoryBucketStore()
+    return RateLimiter(store, user_limit=app.config['RATE_LIMIT_PER_USER'],
+                       route_limits=app.config['RATE_LIMIT_ROUTES'])
+
+def _build_feedback_jobs():
+    return FeedbackJobQueue(
+        max_workers=app.config['FEEDBACK_WORKERS'],
+        max_queue=app.config['FEEDBACK_QUEUE_DEPTH']
+    )
+
+db = LazyService('db', _build_db)
+auth = LazyService('auth', _build_auth)
+feedback_cache = LazyService('feedback_cache', _build_feedback_cache)
+topic_catalog = LazyService('topic_catalog', _build_topic_catalog)
+rule_feedback_engine = LazyService('rule_feedback_engine', _build_rule_feedback_engine)
+ai_feedback_agent = LazyService('ai_feedback_agent', _build_ai_feedback_agent)
+feedback_jobs = LazyService('feedback_jobs', _build_feedback_jobs)
+rate_limiter = LazyService('rate_limiter', _build_rate_limiter)
+
+@atexit.register
+def close_services():
+    """Drain feedback jobs, flush topic sketches and close whatever this process opened"""
+    feedback_jobs.reset(lambda jobs: jobs.shutdown())
+    ai_feedback_agent.reset(lambda agent: agent.client.close())
+    rule_feedback_engine.reset()
+    topic_catalog.reset()
+    db.reset(lambda manager: manager.close())
+    auth.reset(lambda simple_auth: simple_auth.close())
+    feedback_cache.reset(lambda cache: cache and cache.close())
+    rate_limiter.reset(lambda limiter: limiter and limiter.close())
+
+def migrate_databases():
+    """Apply pending schema migrations, a one-time step before any worker serves requests"""
+    shard_count = app.config['HISTORY_SHARDS']
+    _ensure_parent_dir(app.config['HISTORY_DB_PATH'])
+    for index, path in enumerate(shard_paths(app.config['HISTORY_DB_PATH'], shard_count)):
+        manager = DatabaseManager(path, shard=(index, shard_count))
+        # Jobs are only held in memory, so any left pending by a stopped server are lost
+        manager.fail_stale_submissions(stale_job_cutoff(), STALE_JOB_FEEDBACK)
+        manager.close()
+    _ensure_parent_dir(app.config['USERS_DB_PATH'])
+    SimpleAuth(app.config['USERS_DB_PATH']).close()
+
+def stale_job_cutoff():
+    """Timestamp before which a pending submission's feedback job can no longer be running"""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=app.config['FEEDBACK_JOB_TIMEOUT'])
+    return cutoff.strftime('%Y-%m-%d %H:%M:%S')
+
+def create_app(config=None):
+    """Configure the app from the environment plus overrides; services start on first use"""
+    configure_app({**load_config(), **(config or {})})
+    close_services()
+    return app
+
+# Environment defaults, so importing app without create_app() still works.
+# This also loads .env before the limits below are read from the environment.
+configure_app(load_config())
+
+# Limits for POST /feedback/batch
+MAX_BATCH_SIZE = int(os.getenv('FEEDBACK_BATCH_MAX_SIZE', '1000'))
+BATCH_AI_CONCURRENCY = int(os.getenv('FEEDBACK_BATCH_AI_CONCURRENCY', '4'))
+
+# Long-poll limits for GET /feedback/<id>?wait=
+MAX_FEEDBACK_WAIT = 30
+FEEDBACK_POLL_INTERVAL = 0.5
+
+# Stored on submissions whose feedback job was lost, e.g. to a restart
+STALE_JOB_FEEDBACK = 'Feedback generation was interrupted, please try again'
+
+# Open /feedback/stream responses and long-polls each hold one of gunicorn's
+# request threads, so together they get one fewer than the worker has and a
+# thread is always left for other requests. Streams beyond the cap get a 503,
+# long-polls are answered straight away and the client polls again.
+REQUEST_THREADS = int(os.getenv('GUNICORN_THREADS', '4'))
+MAX_HELD_REQUESTS = int(os.getenv('FEEDBACK_MAX_HELD_REQUESTS') or max(1, REQUEST_THREADS - 1))
+held_request_slots = threading.BoundedSemaphore(MAX_HELD_REQUESTS)
+
+# Page sizes for the keyset-paginated /history and /progress endpoints
+DEFAULT_HISTORY_PAGE_SIZE = 20
+DEFAULT_PROGRESS_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 500
+
+# /metrics is open unless a bearer token is configured
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+# Requests sent with "X-Profile: 1" are sampled when profiling is enabled
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', '').lower() in ('1', 'true', 'yes')
+PROFILE_DIR = os.getenv('PROFILE_DIR')
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    HTTP_IN_FLIGHT.inc()
+    if PROFILING_ENABLED and request.headers.get('X-Profile') == '1':
+        g.profiler = SamplingProfiler().start()
+
+@app.after_request
+def record_response_status(response):
+    g.response_status = response.status_code
+    return response
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    started = g.pop('request_started', None)
+    if started is None:
+        return
+    HTTP_IN_FLIGHT.dec()
+
+    # Label by URL rule rather than path so ids do not explode cardinality
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, route, request.method)
+    HTTP_REQUESTS.inc(route, request.method, str(g.pop('response_status', 500)))
+
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.stop()
+        save_profile(profiler, PROFILE_DIR, f'{request.method} {route}')
+
+@REGISTRY.register_collector
+def collect_service_metrics():
+    """Report feedback cache and job queue state, for services this process has built"""
+    families = []
+    cache = feedback_cache.get() if feedback_cache.is_built else None
+    if cache is not None:
+        stats = cache.stats()
+        families.append(('feedback_cache_events_total', 'counter', 'AI feedback cache lookups and removals by result', [
+            ({'result': result}, stats[result])
+            for result in ('hits', 'persistent_hits', 'misses', 'coalesced', 'evictions', 'expirations')
+        ]))
+        families.append(('feedback_cache_entries', 'gauge', 'Entries in the in-memory AI feedback cache',
+                         [({}, stats['size'])]))
+    if feedback_jobs.is_built:
+        families.append(('feedback_jobs_in_flight', 'gauge', 'Queued or running AI feedback jobs',
+                         [({}, feedback_jobs.stats()['in_flight'])]))
+    concurrency = getattr(ai_feedback_agent.get().client, 'concurrency', None) if ai_feedback_agent.is_built else None
+    if concurrency is not None:
+        families.append(('llm_requests_waiting', 'gauge', 'Callers queued for an upstream LLM concurrency slot',
+                         [({}, concurrency.waiting)]))
+    return families
+
+# CORS headers are the same for every response, so they are built once
+CORS_HEADERS = (
+    ('Access-Control-Allow-Origin', '*'),
+    ('Access-Control-Allow-Headers', 'Content-Type,Authorization,If-None-Match'),
+    ('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS'),
+    ('Access-Control-Expose-Headers', 'ETag,Last-Modified,Retry-After'),
+)
+PREFLIGHT_BODY = b'{"status":"OK"}\n'
+
+# Single CORS and compression handler
 @app.after_request
 def after_request(response):
     # Only add CORS headers if they don't already exist
-    if not response.headers.get('Access-Control-Allow-Origin'):
-        response.headers.add('Access-Control-Allow-Origin', '*')
-    if not response.headers.get('Access-Control-Allow-Headers'):
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-    if not response.headers.get('Access-Control-Allow-Methods'):
-        response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
+    headers = response.headers
+    for name, value in CORS_HEADERS:
+        headers.setdefault(name, value)
+
+    compress_response(
+        response, negotiate_encoding(request.accept_encodings),
+        app.config['COMPRESSION_MIN_SIZE'], app.config['COMPRESSION_LEVEL']
+    )
     return response
 
 # Handle OPTIONS requests globally
 @app.before_request
 def handle_preflight():
     if request.method == "OPTIONS":
-        response = jsonify({'status': 'OK'})
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-        response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
-        return response
+        return Response(PREFLIGHT_BODY, mimetype='application/json', headers=CORS_HEADERS)
 
 def require_auth(f):
     @wraps(f)
@@ -56,10 +308,59 @@ def require_auth(f):
         
         request.user_id = session_result['user_id']
         request.username = session_result['username']
+
+        # Refused before the handler runs, so an abusive client costs one bucket lookup
+        limiter = rate_limiter.get()
+        refused = limiter.check(request.user_id, request.endpoint) if limiter else None
+        if refused:
+            return rate_limited_response(*refused)
+
         return f(*args, **kwargs)
     
     return decorated_function
 
+def rate_limited_response(scope, retry_after):
+    """429 telling the client how many whole seconds to wait before retrying"""
+    seconds = max(1, math.ceil(retry_after))
+    RATE_LIMITED_REQUESTS.inc(request.url_rule.rule, scope)
+    response = jsonify({'error': 'Too many requests, please slow down', 'retry_after': seconds})
+    response.headers['Retry-After'] = str(seconds)
+    return response, 429
+
+def conditional_on_user_version(f):
+    """Answer If-None-Match with 304 from the user's data version, before running the handler"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        version, updated_at = db.get_user_version(request.user_id)
+        # The same data version renders differently per URL, so the query
+        # string is part of the tag
+        etag = f'{request.user_id}-{version}-{zlib.crc32(request.full_path.encode()):08x}'
+
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        else:
+            response = app.make_response(f(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        # Weak, since the body may be served with different encodings
+        response.set_etag(etag, weak=True)
+        if updated_at:
+            response.last_modified = datetime.strptime(updated_at, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('Authorization')
+        return response
+
+    return decorated_function
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    if METRICS_TOKEN:
+        provided = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(provided.encode(), f'Bearer {METRICS_TOKEN}'.encode()):
+            return jsonify({'error': 'Invalid metrics token'}), 401
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/register', methods=['POST'])
 def register():
     try:
@@ -97,7 +398,7 @@ def login():
         
         result = auth.verify_user(username, password)
         if result['success']:
-            session_token = auth.create_session(result['user_id'])
+            session_token = auth.create_session(result['user_id'], result['username'])
             return jsonify({
                 'success': True,
                 'session_token': session_token,
@@ -139,19 +440,21 @@ def get_feedback():
         scores = data.get('scores', [])
         feedback_mode = data.get('feedback_mode', 'ai')
         
-        if not topics or not scores or len(topics) != len(scores):
-            return jsonify({'error': 'Invalid topics or scores'}), 400
-        
-        # Validate scores are between 0-100
-        for score in scores:
-            if not isinstance(score, (int, float)) or score < 0 or score > 100:
-                return jsonify({'error': 'Scores must be between 0 and 100'}), 400
+        error = validate_assessment(topics, scores)
+        if error is None:
+            # Stored, cached and aggregated under one name however it was typed
+            topics, error = canonicalize_topics(topics, topic_catalog)
+        if error is None and feedback_mode not in FEEDBACK_MODES:
+            error = 'feedback_mode must be ai or rule'
+        if error:
+            return jsonify({'error': error}), 400
         
-        # Generate feedback based on selected mode
+        # AI feedback is slow, so generate it on the job pool and let the
+        # client poll /feedback/<id> instead of holding this request open
         if feedback_mode == 'ai':
-            feedback_response = ai_feedback_agent.generate_feedback(topics, scores)
-        else:
-            feedback_response = rule_feedback_engine.generate_feedback(topics, scores)
+            return enqueue_ai_feedback(topics, scores)
+
+        feedback_response = rule_feedback_engine.generate_feedback(topics, scores)
         
         # Save to database with user_id
         submission_id = db.save_submission(
@@ -168,72 +471,488 @@ def get_feedback():
             'feedback': feedback_response.get('feedback', ''),
             'resources': feedback_response.get('resources', []),
             'summary_score': sum(scores) / len(scores),
-            'feedback_mode': feedback_mode
+            'feedback_mode': feedback_mode,
+            'status': 'complete'
         })
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def enqueue_ai_feedback(topics, scores):
+    """Save a pending AI submission and queue its feedback generation"""
+    if not feedback_jobs.reserve():
+        response = jsonify({'error': 'Feedback queue is full, please retry shortly'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+
+    try:
+        submission_id = db.save_submission(
+            topics=topics,
+            scores=scores,
+            feedback='',
+            resources=[],
+            feedback_mode='ai',
+            user_id=request.user_id,
+            status='pending'
+        )
+        user_id = request.user_id
+        feedback_jobs.submit(submission_id, generate_ai_feedback, submission_id, topics, scores, user_id,
+                             on_error=lambda job_id, error: fail_ai_feedback(job_id, error, user_id))
+    except Exception:
+        feedback_jobs.release()
+        raise
+
+    return jsonify({
+        'id': submission_id,
+        'job_id': submission_id,
+        'status': 'pending',
+        'status_url': f'/feedback/{submission_id}',
+        'summary_score': sum(scores) / len(scores),
+        'feedback_mode': 'ai'
+    }), 202
+
+def generate_ai_feedback(submission_id, topics, scores, user_id=None):
+    """Worker task: generate AI feedback and store it on the pending submission"""
+    feedback_response = ai_feedback_agent.generate_feedback(topics, scores)
+    db.complete_submission(
+        submission_id,
+        feedback=feedback_response.get('feedback', ''),
+        resources=feedback_response.get('resources', []),
+        user_id=user_id
+    )
+
+def fail_ai_feedback(submission_id, error, user_id=None):
+    """Worker error handler: mark the submission failed so pollers stop waiting"""
+    db.complete_submission(
+        submission_id,
+        feedback=f'Error generating feedback: {error}',
+        resources=[],
+        status='failed',
+        user_id=user_id
+    )
+
+def sse_event(event, data):
+    """Format one Server-Sent Event with a JSON payload"""
+    return f'event: {event}\ndata: {dumps(data)}\n\n'
+
+@app.route('/feedback/stream', methods=['POST'])
+@require_auth
+def stream_feedback():
+    """Relay AI feedback tokens as Server-Sent Events: start, token..., then done or error"""
+    data = request.get_json(silent=True) or {}
+    topics = data.get('topics', [])
+    scores = data.get('scores', [])
+
+    error = validate_assessment(topics, scores)
+    if error is None:
+        topics, error = canonicalize_topics(topics, topic_catalog)
+    if error:
+        return jsonify({'error': error}), 400
+
+    if not held_request_slots.acquire(blocking=False):
+        response = jsonify({'error': 'Too many feedback streams, please retry shortly'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+
+    # The generator runs after this view returns, outside the request context
+    user_id = request.user_id
+    summary_score = sum(scores) / len(scores)
+
+    def events():
+        try:
+            yield sse_event('start', {'summary_score': summary_score, 'feedback_mode': 'ai'})
+            for kind, value in ai_feedback_agent.stream_feedback(topics, scores):
+                if kind == 'token':
+                    yield sse_event('token', {'text': value})
+                    continue
+
+                # Saved only once the stream completes; a client that
+                # disconnects early stops the generation and nothing is stored
+                submission_id = db.save_submission(
+                    topics=topics,
+                    scores=scores,
+                    feedback=value.get('feedback', ''),
+                    resources=value.get('resources', []),
+                    feedback_mode='ai',
+                    user_id=user_id
+                )
+                yield sse_event('done', {
+                    'id': submission_id,
+                    'feedback': value.get('feedback', ''),
+                    'resources': value.get('resources', []),
+                    'summary_score': summary_score,
+                    'feedback_mode': 'ai',
+                    'status': 'complete',
+                    'fallback': bool(value.get('fallback'))
+                })
+        except Exception as e:
+            yield sse_event('error', {'error': str(e)})
+
+    response = Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # Stop reverse proxies from buffering the stream
+        'X-Accel-Buffering': 'no'
+    })
+    # Runs even if the client goes away before the first event is sent
+    response.call_on_close(held_request_slots.release)
+    return response
+
+@app.route('/feedback/batch', methods=['POST'])
+@require_auth
+def get_feedback_batch():
+    try:
+        data = request.get_json()
+        assessments = data.get('assessments')
+        default_mode = data.get('feedback_mode', 'rule')
+
+        if not isinstance(assessments, list) or not assessments:
+            return jsonify({'error': 'assessments must be a non-empty list'}), 400
+
+        if len(assessments) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'At most {MAX_BATCH_SIZE} assessments per batch'}), 400
+
+        # Validate everything up front so a bad item never leaves a partial batch
+        items = []
+        errors = []
+        for index, assessment in enumerate(assessments):
+            if not isinstance(assessment, dict):
+                errors.append({'index': index, 'error': 'Assessment must be an object'})
+                continue
+
+            topics = assessment.get('topics', [])
+            scores = assessment.get('scores', [])
+            feedback_mode = assessment.get('feedback_mode', default_mode)
+            error = validate_assessment(topics, scores)
+            if error is None:
+                topics, error = canonicalize_topics(topics, topic_catalog)
+            if error is None and feedback_mode not in FEEDBACK_MODES:
+                error = 'feedback_mode must be ai or rule'
+            if error:
+                errors.append({'index': index, 'error': error})
+                continue
+
+            items.append({'topics': topics, 'scores': scores, 'feedback_mode': feedback_mode})
+
+        if errors:
+            return jsonify({'error': 'Invalid assessments', 'errors': errors}), 400
+
+        responses = generate_batch_feedback(items)
+
+        for item, feedback_response in zip(items, responses):
+            item['feedback'] = feedback_response.get('feedback', '')
+            item['resources'] = feedback_response.get('resources', [])
+
+        # One transaction and one executemany for the whole batch
+        submission_ids = db.save_submissions(items, user_id=request.user_id)
+
+        results = []
+        for index, (submission_id, item) in enumerate(zip(submission_ids, items)):
+            results.append({
+                'index': index,
+                'id': submission_id,
+                'feedback': item['feedback'],
+                'resources': item['resources'],
+                'summary_score': sum(item['scores']) / len(item['scores']),
+                'feedback_mode': item['feedback_mode']
+            })
+
+        return jsonify({'count': len(results), 'results': results})
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def generate_batch_feedback(items):
+    """Generate feedback for validated batch items, keeping their order"""
+    responses = [None] * len(items)
+    ai_indexes = []
+    rule_groups = {}
+
+    for index, item in enumerate(items):
+        if item['feedback_mode'] == 'ai':
+            ai_indexes.append(index)
+        else:
+            rule_groups.setdefault(tuple(item['topics']), []).append(index)
+
+    # Rule items sharing a topic list are scored as one vectorized matrix
+    for topics, indexes in rule_groups.items():
+        generated = rule_feedback_engine.generate_feedback_batch(
+            list(topics), [items[index]['scores'] for index in indexes]
+        )
+        for index, feedback_response in zip(indexes, generated):
+            responses[index] = feedback_response
+
+    # AI items go to the generator with bounded concurrency; the feedback
+    # cache coalesces any duplicates within the batch
+    if ai_indexes:
+        workers = min(BATCH_AI_CONCURRENCY, len(ai_indexes))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch-feedback') as executor:
+            generated = executor.map(
+                lambda index: ai_feedback_agent.generate_feedback(items[index]['topics'], items[index]['scores']),
+                ai_indexes
+            )
+            for index, feedback_response in zip(ai_indexes, generated):
+                responses[index] = feedback_response
+
+    return responses
+
+@app.route('/feedback/cache', methods=['GET'])
+@require_auth
+def get_feedback_cache_stats():
+    cache = feedback_cache.get()
+    if cache is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **cache.stats()})
+
+@app.route('/feedback/<int:submission_id>', methods=['GET'])
+@require_auth
+def get_feedback_status(submission_id):
+    try:
+        wait = min(request.args.get('wait', 0, type=float) or 0, MAX_FEEDBACK_WAIT)
+        submission = db.get_submission(submission_id, request.user_id)
+        if not submission:
+            return jsonify({'error': 'Submission not found'}), 404
+
+        if submission['status'] == 'pending' and wait > 0 and held_request_slots.acquire(blocking=False):
+            try:
+                submission = wait_for_submission(submission, wait)
+            finally:
+                held_request_slots.release()
+
+        if (submission['status'] == 'pending' and not feedback_jobs.is_running(submission_id)
+                and submission['timestamp'] < stale_job_cutoff()):
+            # No worker can still be on it, so stop the client waiting forever
+            db.complete_submission(submission_id, feedback=STALE_JOB_FEEDBACK, status='failed',
+                                   user_id=request.user_id)
+            submission = db.get_submission(submission_id, request.user_id)
+
+        return jsonify(submission)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def wait_for_submission(submission, wait):
+    """Long-poll: re-read a pending submission until its job finishes or wait seconds pass"""
+    deadline = time.monotonic() + wait
+    while submission['status'] == 'pending':
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        if feedback_jobs.is_running(submission['id']):
+            feedback_jobs.wait(submission['id'], remaining)
+        else:
+            # Job belongs to another worker process, fall back to polling
+            time.sleep(min(FEEDBACK_POLL_INTERVAL, remaining))
+        submission = db.get_submission(submission['id'], request.user_id)
+    return submission
+
+def parse_page_args(default_limit):
+    """Read limit, cursor and since_id query parameters, raising ValueError on bad input"""
+    limit = request.args.get('limit', default_limit, type=int)
+    if limit is None or limit < 1:
+        raise ValueError('limit must be a positive integer')
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    cursor = request.args.get('cursor')
+    since_id = request.args.get('since_id')
+    if since_id is not None:
+        if cursor:
+            raise ValueError('cursor and since_id cannot be combined')
+        try:
+            since_id = int(since_id)
+        except ValueError:
+            raise ValueError('since_id must be an integer')
+
+    return limit, cursor, since_id
+
 @app.route('/history', methods=['GET'])
 @require_auth
+@conditional_on_user_version
 def get_history():
     try:
-        submissions = db.get_all_submissions(user_id=request.user_id)
-        return jsonify({'submissions': submissions})
+        limit, cursor, since_id = parse_page_args(DEFAULT_HISTORY_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        if since_id is not None:
+            submissions, has_more = db.get_submissions_since(request.user_id, since_id, limit)
+            return jsonify({
+                'submissions': submissions,
+                'latest_id': submissions[-1]['id'] if submissions else since_id,
+                'has_more': has_more
+            })
+
+        submissions, next_cursor = db.get_submissions_page(request.user_id, limit, cursor)
+        return jsonify({'submissions': submissions, 'next_cursor': next_cursor})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/progress', methods=['GET'])
 @require_auth
+@conditional_on_user_version
 def get_progress():
+    bucket = request.args.get('bucket')
+    if bucket is not None:
+        return get_progress_rollups(bucket)
+
+    try:
+        limit, cursor, since_id = parse_page_args(DEFAULT_PROGRESS_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     try:
-        progress_data = db.get_progress_data(user_id=request.user_id)
-        return jsonify({'progress': progress_data})
+        if since_id is not None:
+            progress_data, has_more = db.get_progress_since(request.user_id, since_id, limit)
+            return jsonify({
+                'progress': progress_data,
+                'latest_id': progress_data[-1]['id'] if progress_data else since_id,
+                'has_more': has_more
+            })
+
+        progress_data, next_cursor = db.get_progress_page(request.user_id, limit, cursor)
+        return jsonify({'progress': progress_data, 'next_cursor': next_cursor})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def get_progress_rollups(bucket):
+    """Answer /progress?bucket=day|week&topic= from the precomputed rollups"""
+    if bucket not in BUCKETS:
+        return jsonify({'error': f"bucket must be one of: {', '.join(BUCKETS)}"}), 400
+
+    try:
+        topic = canonical_topic_arg()
+        rollups = db.get_rollups(request.user_id, bucket=bucket, topic=topic)
+        return jsonify({
+            'bucket': bucket,
+            'overall_topic': OVERALL_TOPIC,
+            'rollups': rollups
+        })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/export/csv', methods=['GET'])
+def canonical_topic_arg():
+    """The ?topic= filter under its canonical name, or None when not given"""
+    topic = request.args.get('topic')
+    if topic is None or topic == OVERALL_TOPIC:
+        return topic
+    return topic_catalog.canonical(topic)
+
+@app.route('/progress/topics', methods=['GET'])
 @require_auth
-def export_csv():
+@conditional_on_user_version
+def get_topic_progress():
+    """Per-topic averages over the user's whole history, computed in SQLite"""
     try:
-        submissions = db.get_all_submissions(user_id=request.user_id)
-        
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write headers
-        writer.writerow(['ID', 'Timestamp', 'Topics', 'Scores', 'Summary Score', 'Feedback Mode', 'Feedback'])
-        
-        # Write data
-        for submission in submissions:
-            writer.writerow([
-                submission['id'],
-                submission['timestamp'],
-                ', '.join(submission['topics']),
-                ', '.join(map(str, submission['scores'])),
-                submission['summary_score'],
-                submission.get('feedback_mode', 'ai'),
-                submission['feedback'][:100] + '...' if len(submission['feedback']) > 100 else submission['feedback']
-            ])
-        
-        output.seek(0)
-        return output.getvalue(), 200, {
-            'Content-Type': 'text/csv',
-            'Content-Disposition': f'attachment; filename={request.username}_feedback_history.csv'
-        }
-    
+        topic = canonical_topic_arg()
+        return jsonify({'topics': db.get_topic_stats(request.user_id, topic=topic)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/analytics/topic/<path:topic>', methods=['GET'])
+@require_auth
+def get_topic_analytics(topic):
+    """Cohort mean, histogram and the user's percentile rank for one topic"""
+    score = request.args.get('score', type=float)
+    if score is not None and not 0 <= score <= 100:
+        return jsonify({'error': 'score must be between 0 and 100'}), 400
+
+    try:
+        topic = topic_catalog.canonical(topic)
+        distribution = db.get_topic_distribution(topic)
+        if not distribution.total:
+            return jsonify({'error': 'No scores recorded for this topic'}), 404
+
+        # Rank the user's latest score unless one is given explicitly
+        if score is None:
+            score = db.get_latest_topic_score(request.user_id, topic)
+
+        return jsonify({
+            'topic': topic,
+            'count': distribution.total,
+            'mean': distribution.mean(),
+            'histogram': distribution.buckets(),
+            'score': score,
+            'percentile': distribution.percentile_rank(score) if score is not None else None
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/topics/suggest', methods=['GET'])
+@require_auth
+def suggest_topics():
+    """Autocomplete topic names: catalog topics with a name or alias starting with ?q="""
+    limit = request.args.get('limit', MAX_SUGGESTIONS, type=int)
+    if limit is None or limit < 1:
+        return jsonify({'error': 'limit must be a positive integer'}), 400
+
+    prefix = request.args.get('q', '')
+    return jsonify({
+        'query': prefix,
+        'canonical': topic_catalog.lookup(prefix) if prefix.strip() else None,
+        'suggestions': topic_catalog.suggest(prefix, min(limit, MAX_SUGGESTIONS))
+    })
+
+@app.route('/export/<export_format>', methods=['GET'])
+@require_auth
+@conditional_on_user_version
+def export_history(export_format):
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'Unsupported export format: {export_format}'}), 404
+
+    try:
+        start = parse_date_filter(request.args.get('start'))
+        end = parse_date_filter(request.args.get('end'), end=True)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        submissions = db.iter_submissions(request.user_id, start=start, end=end)
+        body = EXPORT_WRITERS[export_format](submissions)
+
+        return Response(body, mimetype=EXPORT_FORMATS[export_format], headers={
+            'Content-Disposition': f'attachment; filename={request.username}_feedback_history.{export_format}'
+        })
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/import', methods=['POST'])
+@require_auth
+def import_history():
+    # Either a raw text/csv or application/x-ndjson body, or a multipart form
+    # with the file in "file"; ?format= overrides the detected format
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('file')
+        if upload is None:
+            return jsonify({'error': 'No file uploaded'}), 400
+        stream = upload.stream
+        import_format = detect_format(upload.mimetype, upload.filename)
+    else:
+        stream = request.stream
+        import_format = detect_format(request.mimetype)
+    import_format = request.args.get('format', import_format)
+
+    if import_format not in IMPORT_FORMATS:
+        return jsonify({'error': f'Unsupported import format, expected one of: {", ".join(IMPORT_FORMATS)}'}), 400
+
+    try:
+        # Decoded as it is read; utf-8-sig drops the BOM spreadsheet programs add
+        lines = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        rows = IMPORT_READERS[import_format](lines)
+        result = import_submissions(db, rows, request.user_id, rule_feedback_engine,
+                                    batch_size=app.config['IMPORT_BATCH_SIZE'], catalog=topic_catalog.get())
+        return jsonify(result)
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
-    import os
-    
-    # Create data directory if it doesn't exist
-    os.makedirs('/app/data', exist_ok=True)
-    
-    # Use data directory for databases
-    db = DatabaseManager('/app/data/history.db')
-    auth = SimpleAuth('/app/data/users.db')
-    
-    # Run the app
-    app.run(host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file
+    # Development server only, production runs wsgi:app under gunicorn
+    create_app()
+    migrate_databases()
+    app.run(host='0.0.0.0', port=int(os.getenv('PORT', '5000')), debug=False)
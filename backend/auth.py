@@ -1,128 +1,201 @@
 import sqlite3
 import hashlib
 import secrets
+import time
 from datetime import datetime, timedelta
+from connection_pool import ConnectionPool
+from migrations import run_migrations, require_current_schema, USERS_MIGRATIONS
+from tokens import TokenSigner, is_signed_token
+from metrics import timed_operation
 
 class SimpleAuth:
-    def __init__(self, db_path='users.db'):
+    def __init__(self, db_path='users.db', pool_size=8, sweep_interval=3600,
+                 session_secret=None, revocation_refresh_interval=5, migrate=True):
         self.db_path = db_path
-        self.init_database()
-    
+        self.pool = ConnectionPool(db_path, max_size=pool_size)
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0
+
+        # Signed tokens are only issued when a secret is configured. Opaque
+        # database tokens are always accepted so existing sessions keep working.
+        self.signer = TokenSigner(session_secret) if session_secret else None
+        self.revocation_refresh_interval = revocation_refresh_interval
+        self._revoked_token_ids = frozenset()
+        self._revocations_loaded_at = None
+
+        # Servers pass migrate=False and rely on a separate migrate step
+        if migrate:
+            self.init_database()
+        else:
+            self.check_schema()
+
+    def close(self):
+        """Close all pooled connections"""
+        self.pool.close()
+
     def init_database(self):
-        """Initialize the users database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                session_token TEXT UNIQUE NOT NULL,
-                expires_at DATETIME NOT NULL,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
-    
+        """Bring the users database schema up to the latest version"""
+        with self.pool.connection() as conn:
+            run_migrations(conn, USERS_MIGRATIONS)
+
+    def check_schema(self):
+        """Fail fast if the schema has not been migrated to the latest version"""
+        with self.pool.connection() as conn:
+            require_current_schema(conn, USERS_MIGRATIONS)
+
     def hash_password(self, password):
         """Hash a password with salt"""
         return hashlib.sha256(password.encode()).hexdigest()
-    
+
+    @timed_operation('users')
     def create_user(self, username, password):
         """Create a new user"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         try:
             password_hash = self.hash_password(password)
-            cursor.execute(
-                'INSERT INTO users (username, password_hash) VALUES (?, ?)',
-                (username, password_hash)
-            )
-            conn.commit()
-            user_id = cursor.lastrowid
-            conn.close()
-            return {'success': True, 'user_id': user_id}
+            with self.pool.transaction() as conn:
+                cursor = conn.execute(
+                    'INSERT INTO users (username, password_hash) VALUES (?, ?)',
+                    (username, password_hash)
+                )
+            return {'success': True, 'user_id': cursor.lastrowid}
         except sqlite3.IntegrityError:
-            conn.close()
             return {'success': False, 'error': 'Username already exists'}
-    
+
+    @timed_operation('users')
     def verify_user(self, username, password):
         """Verify user credentials"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         password_hash = self.hash_password(password)
-        cursor.execute(
-            'SELECT id, username FROM users WHERE username = ? AND password_hash = ?',
-            (username, password_hash)
-        )
-        
-        user = cursor.fetchone()
-        conn.close()
-        
+        with self.pool.connection() as conn:
+            user = conn.execute(
+                'SELECT id, username FROM users WHERE username = ? AND password_hash = ?',
+                (username, password_hash)
+            ).fetchone()
+
         if user:
             return {'success': True, 'user_id': user[0], 'username': user[1]}
         else:
             return {'success': False, 'error': 'Invalid credentials'}
-    
-    def create_session(self, user_id):
+
+    @timed_operation('users')
+    def get_user_id(self, username):
+        """Return the id of a username, or None if there is no such user"""
+        with self.pool.connection() as conn:
+            user = conn.execute('SELECT id FROM users WHERE username = ?', (username,)).fetchone()
+        return user[0] if user else None
+
+    @timed_operation('users')
+    def create_session(self, user_id, username=None):
         """Create a new session for user"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        session_token = secrets.token_urlsafe(32)
         expires_at = datetime.now() + timedelta(days=7)  # 7 days
-        
-        cursor.execute(
-            'INSERT INTO sessions (user_id, session_token, expires_at) VALUES (?, ?, ?)',
-            (user_id, session_token, expires_at)
-        )
-        
-        conn.commit()
-        conn.close()
-        
+        # Before either branch, so revoked signed tokens and any opaque
+        # sessions issued before the secret was set are still swept
+        self.maybe_purge_expired_sessions()
+
+        if self.signer and username:
+            # Verified in memory, so no sessions row is needed
+            return self.signer.sign(user_id, username, expires_at.timestamp())
+
+        session_token = secrets.token_urlsafe(32)
+
+        with self.pool.transaction() as conn:
+            conn.execute(
+                'INSERT INTO sessions (user_id, session_token, expires_at) VALUES (?, ?, ?)',
+                (user_id, session_token, expires_at)
+            )
+
         return session_token
-    
+
+    @timed_operation('users')
     def verify_session(self, session_token):
         """Verify if session is valid"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT s.user_id, u.username 
-            FROM sessions s 
-            JOIN users u ON s.user_id = u.id 
-            WHERE s.session_token = ? AND s.expires_at > ?
-        ''', (session_token, datetime.now()))
-        
-        result = cursor.fetchone()
-        conn.close()
-        
+        if self.signer and is_signed_token(session_token):
+            return self._verify_signed_session(session_token)
+
+        with self.pool.connection() as conn:
+            result = conn.execute('''
+                SELECT s.user_id, u.username
+                FROM sessions s
+                JOIN users u ON s.user_id = u.id
+                WHERE s.session_token = ? AND s.expires_at > ?
+            ''', (session_token, datetime.now())).fetchone()
+
         if result:
             return {'success': True, 'user_id': result[0], 'username': result[1]}
         else:
             return {'success': False, 'error': 'Invalid or expired session'}
-    
+
+    def _verify_signed_session(self, session_token):
+        """Verify a signed token against its signature, expiry and the deny-list"""
+        claims = self.signer.verify(session_token)
+        if not claims or claims['jti'] in self._revoked_tokens():
+            return {'success': False, 'error': 'Invalid or expired session'}
+
+        return {'success': True, 'user_id': claims['uid'], 'username': claims['usr']}
+
+    def _revoked_tokens(self):
+        """Return the revoked token ids, reloading them from the DB when stale"""
+        now = time.monotonic()
+        loaded_at = self._revocations_loaded_at
+        if loaded_at is None or now - loaded_at >= self.revocation_refresh_interval:
+            with self.pool.connection() as conn:
+                rows = conn.execute(
+                    'SELECT token_id FROM revoked_tokens WHERE expires_at > ?',
+                    (datetime.now(),)
+                ).fetchall()
+            # Swap in a new set so concurrent readers never see a partial update
+            self._revoked_token_ids = frozenset(row[0] for row in rows)
+            self._revocations_loaded_at = now
+
+        return self._revoked_token_ids
+
+    @timed_operation('users')
     def logout(self, session_token):
         """Delete session (logout)"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM sessions WHERE session_token = ?', (session_token,))
-        conn.commit()
-        conn.close()
-        
-        return {'success': True}
\ No newline at end of file
+        if self.signer and is_signed_token(session_token):
+            claims = self.signer.verify(session_token)
+            if claims:
+                with self.pool.transaction() as conn:
+                    conn.execute(
+                        'INSERT OR IGNORE INTO revoked_tokens (token_id, expires_at) VALUES (?, ?)',
+                        (claims['jti'], datetime.fromtimestamp(claims['exp']))
+                    )
+                # Other workers pick this up on their next deny-list refresh
+                self._revoked_token_ids = self._revoked_token_ids | {claims['jti']}
+            self.maybe_purge_expired_sessions()
+            return {'success': True}
+
+        with self.pool.transaction() as conn:
+            conn.execute('DELETE FROM sessions WHERE session_token = ?', (session_token,))
+
+        self.maybe_purge_expired_sessions()
+        return {'success': True}
+
+    @timed_operation('users')
+    def purge_expired_sessions(self, batch_size=1000):
+        """Delete expired sessions in small batches and return how many were removed"""
+        now = datetime.now()
+        removed = 0
+
+        # Deleting in batches keeps each write transaction short, so logins
+        # are never stuck behind one huge DELETE.
+        while True:
+            with self.pool.transaction() as conn:
+                cursor = conn.execute('''
+                    DELETE FROM sessions WHERE id IN (
+                        SELECT id FROM sessions WHERE expires_at <= ? LIMIT ?
+                    )
+                ''', (now, batch_size))
+            removed += cursor.rowcount
+            if cursor.rowcount < batch_size:
+                break
+
+        with self.pool.transaction() as conn:
+            conn.execute('DELETE FROM revoked_tokens WHERE expires_at <= ?', (now,))
+
+        self._last_sweep = time.monotonic()
+        return removed
+
+    def maybe_purge_expired_sessions(self):
+        """Run the sweeper if it has not run within sweep_interval seconds"""
+        if time.monotonic() - self._last_sweep >= self.sweep_interval:
+            self.purge_expired_sessions()
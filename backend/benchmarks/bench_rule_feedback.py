@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Compare RuleFeedbackEngine's per-student path with its vectorized batch path.
+
+The first batch call pays for importing numpy, as the first batch in a
+fresh worker would; the warm figures repeat the call with numpy loaded.
+Batches below rule_feedback's row thresholds take the per-student path.
+
+Usage:
+    python benchmarks/bench_rule_feedback.py --students 100000 --topics 5
+"""
+
+import argparse
+import importlib
+import importlib.util
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rule_feedback import RuleFeedbackEngine  # noqa: E402
+
+TOPIC_NAMES = ['Python', 'JavaScript', 'SQL', 'Machine Learning', 'Data Structures',
+               'Algorithms', 'Statistics', 'Web Development', 'Networking', 'Linux']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=100000)
+    parser.add_argument('--topics', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    topics = TOPIC_NAMES[:args.topics]
+    matrix = [[random.randint(0, 100) for _ in topics] for _ in range(args.students)]
+    engine = RuleFeedbackEngine()
+
+    started = time.perf_counter()
+    single = [engine.generate_feedback(topics, row) for row in matrix]
+    single_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batch = engine.generate_feedback_batch(topics, matrix)
+    batch_seconds = time.perf_counter() - started
+
+    # Warm means numpy is loaded, as in a process that already vectorized a batch
+    if importlib.util.find_spec('numpy'):
+        importlib.import_module('numpy')
+    started = time.perf_counter()
+    engine.generate_feedback_batch(topics, matrix)
+    warm_seconds = time.perf_counter() - started
+
+    if single != batch:
+        raise SystemExit('Batch output differs from the single-call path')
+
+    print(json.dumps({
+        'students': args.students,
+        'topics': args.topics,
+        'single_seconds': round(single_seconds, 3),
+        'batch_seconds': round(batch_seconds, 3),
+        'single_per_student_us': round(single_seconds / args.students * 1e6, 2),
+        'batch_per_student_us': round(batch_seconds / args.students * 1e6, 2),
+        'speedup': round(single_seconds / batch_seconds, 2),
+        'batch_warm_seconds': round(warm_seconds, 3),
+        'warm_speedup': round(single_seconds / warm_seconds, 2),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
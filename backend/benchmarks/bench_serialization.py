@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Measure JSON encoding time and compressed payload size for one user's history.
+
+Saves --submissions rule-based submissions for a single user in a throwaway
+database, reads them back the way the export does, and reports for each JSON
+serializer how long encoding the list takes and how many bytes it produces,
+then how gzip and deflate at several levels shrink the fastest encoding.
+
+Usage:
+    python benchmarks/bench_serialization.py --submissions 5000 --repeat 5
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+from database import DatabaseManager  # noqa: E402
+from rule_feedback import RuleFeedbackEngine  # noqa: E402
+from serialization import JSON_PROVIDERS  # noqa: E402
+
+TOPIC_NAMES = ['Python', 'JavaScript', 'SQL', 'Machine Learning', 'Data Structures']
+COMPRESSION = [('gzip', 31, 1), ('gzip', 31, 6), ('gzip', 31, 9), ('deflate', 15, 6)]
+
+
+def build_history(count, seed):
+    """Save count rule submissions for one user and read them back as dicts"""
+    rng = random.Random(seed)
+    engine = RuleFeedbackEngine()
+    submissions = []
+    for _ in range(count):
+        topics = rng.sample(TOPIC_NAMES, rng.randint(2, len(TOPIC_NAMES)))
+        scores = [rng.randint(0, 100) for _ in topics]
+        submissions.append({'topics': topics, 'scores': scores, 'feedback_mode': 'rule',
+                            **engine.generate_feedback(topics, scores)})
+
+    with tempfile.TemporaryDirectory(prefix='bench-serialization-') as directory:
+        db = DatabaseManager(os.path.join(directory, 'history.db'))
+        try:
+            db.save_submissions(submissions, user_id=1)
+            return list(db.iter_submissions(1))
+        finally:
+            db.close()
+
+
+def median_seconds(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--submissions', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    payload = {'submissions': build_history(args.submissions, args.seed)}
+    app = Flask('bench')
+
+    # Flask's stock provider (sorted keys, ASCII escapes) is the baseline
+    providers = {'flask_default': DefaultJSONProvider(app)}
+    providers.update({name: provider_class(app) for name, provider_class in JSON_PROVIDERS.items()})
+
+    serializers = {}
+    encoded = {}
+    for name, provider in providers.items():
+        with app.app_context():
+            seconds, response = median_seconds(lambda: provider.response(payload), args.repeat)
+        encoded[name] = response.get_data()
+        serializers[name] = {
+            'encode_ms': round(seconds * 1000, 2),
+            'bytes': len(encoded[name]),
+        }
+
+    baseline = serializers['flask_default']['encode_ms']
+    for result in serializers.values():
+        result['speedup'] = round(baseline / result['encode_ms'], 2) if result['encode_ms'] else None
+
+    fastest = min(serializers, key=lambda name: serializers[name]['encode_ms'])
+    body = encoded[fastest]
+    compression = {}
+    for encoding, wbits, level in COMPRESSION:
+        def compress():
+            compressor = zlib.compressobj(level, zlib.DEFLATED, wbits)
+            return compressor.compress(body) + compressor.flush()
+
+        seconds, compressed = median_seconds(compress, args.repeat)
+        compression[f'{encoding}-{level}'] = {
+            'compress_ms': round(seconds * 1000, 2),
+            'bytes': len(compressed),
+            'ratio': round(len(body) / len(compressed), 1),
+        }
+
+    report = {
+        'submissions': len(payload['submissions']),
+        'python': sys.version.split()[0],
+        'serializers': serializers,
+        'compressed_serializer': fastest,
+        'compression': compression,
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
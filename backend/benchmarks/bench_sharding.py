@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Measure submission write throughput against the number of history shards.
+
+Starts --processes writer processes, like gunicorn workers, each saving
+--inserts rule submissions one transaction at a time for users picked at
+random from --users. Every process opens the same sharded storage, so with
+one shard all of them queue on a single SQLite write lock, and with N shards
+on N independent ones. Reports rows per second for each shard count.
+
+Usage:
+    python benchmarks/bench_sharding.py --shards 1 2 4 --processes 8 --inserts 500
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager  # noqa: E402
+from sharding import ShardedDatabaseManager, shard_paths  # noqa: E402
+
+TOPIC_NAMES = ['Python', 'JavaScript', 'SQL', 'Machine Learning', 'Data Structures']
+
+
+def open_history(base_path, shard_count):
+    if shard_count > 1:
+        return ShardedDatabaseManager(base_path, shard_count, migrate=False)
+    return DatabaseManager(base_path, migrate=False)
+
+
+def write_submissions(base_path, shard_count, inserts, users, seed, start):
+    """Writer process: wait for the shared start time, then save inserts submissions"""
+    rng = random.Random(seed)
+    db = open_history(base_path, shard_count)
+    try:
+        time.sleep(max(start - time.time(), 0))
+        for _ in range(inserts):
+            topics = rng.sample(TOPIC_NAMES, 2)
+            db.save_submission(topics, [rng.randint(0, 100) for _ in topics], 'Benchmark feedback', [],
+                               'rule', user_id=rng.randint(1, users))
+    finally:
+        db.close()
+
+
+def run(shard_count, args):
+    with tempfile.TemporaryDirectory(prefix='bench-sharding-') as directory:
+        base_path = os.path.join(directory, 'history.db')
+        for index, path in enumerate(shard_paths(base_path, shard_count)):
+            DatabaseManager(path, shard=(index, shard_count)).close()
+
+        # Processes start together so interpreter start-up is not timed
+        start = time.time() + 1.0
+        writers = [
+            multiprocessing.Process(target=write_submissions,
+                                    args=(base_path, shard_count, args.inserts, args.users, args.seed + index, start))
+            for index in range(args.processes)
+        ]
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join()
+        elapsed = time.time() - start
+
+        db = open_history(base_path, shard_count)
+        rows = len(db.get_all_submissions())
+        db.close()
+
+    return {
+        'rows': rows,
+        'seconds': round(elapsed, 2),
+        'rows_per_second': round(rows / elapsed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--inserts', type=int, default=500, help='Submissions saved by each process')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    results = {str(shard_count): run(shard_count, args) for shard_count in args.shards}
+    baseline = results[str(args.shards[0])]['rows_per_second']
+    for result in results.values():
+        result['speedup'] = round(result['rows_per_second'] / baseline, 2)
+
+    report = {
+        'processes': args.processes,
+        'inserts_per_process': args.inserts,
+        'python': sys.version.split()[0],
+        'shards': results,
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
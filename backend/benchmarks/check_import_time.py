@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Check that importing the backend app stays within a startup-time budget.
+
+Runs `python -X importtime -c "import app"` in a fresh interpreter, takes the
+median over several runs, and fails when the cumulative import time of the
+app module exceeds the budget or when a module that should load lazily was
+imported at startup.
+
+Usage:
+    python benchmarks/check_import_time.py --budget-ms 300 --runs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only needed once the first request of a kind arrives
+LAZY_MODULES = ['requests', 'numpy', 'feedback_agent', 'cohere_client', 'rule_feedback']
+
+
+def measure_once(module):
+    """Return ({module: (self_us, cumulative_us)}, ordered module names) for one cold import"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--budget-ms', type=float, default=300)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='Slowest imports to list')
+    args = parser.parse_args()
+
+    runs = [measure_once(args.module) for _ in range(args.runs)]
+    total_ms = statistics.median(run[args.module][1] for run in runs) / 1000
+
+    last = runs[-1]
+    slowest = sorted(last.items(), key=lambda item: item[1][0], reverse=True)[:args.top]
+    eager = [name for name in LAZY_MODULES if name in last]
+
+    report = {
+        'module': args.module,
+        'import_ms': round(total_ms, 1),
+        'budget_ms': args.budget_ms,
+        'eagerly_imported': eager,
+        'slowest_self_ms': {name: round(self_us / 1000, 1) for name, (self_us, _) in slowest},
+    }
+    print(json.dumps(report, indent=2))
+
+    failures = []
+    if total_ms > args.budget_ms:
+        failures.append(f'import {args.module} took {total_ms:.1f}ms, budget is {args.budget_ms}ms')
+    if eager:
+        failures.append(f"modules that should load lazily were imported at startup: {', '.join(eager)}")
+    if failures:
+        raise SystemExit('\n'.join(failures))
+
+
+if __name__ == '__main__':
+    main()
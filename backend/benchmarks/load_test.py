@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Load test the backend API and report per-endpoint latency percentiles as JSON.
+
+By default the app runs in-process through the Flask test client against
+throwaway databases, with AI feedback served by a local fake Cohere server.
+Pass --target to drive an already running server over HTTP instead; start
+that server with COHERE_BASE_URL pointing at `python fake_cohere.py`.
+
+Usage:
+    python benchmarks/load_test.py --concurrency 8 --requests 200 --output run.json
+    python benchmarks/load_test.py --baseline baseline.json --max-regression 0.2
+    python benchmarks/load_test.py --target http://localhost:5000 --endpoints login,history
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from fake_cohere import FakeCohereServer  # noqa: E402
+
+ENDPOINTS = ['login', 'feedback_rule', 'feedback_ai', 'history', 'progress', 'export_csv']
+TOPICS = ['Python', 'JavaScript', 'SQL', 'Machine Learning', 'Data Structures']
+PASSWORD = 'load-test-password'
+
+# How long feedback_ai keeps polling for a job, and the shortest gap between polls
+AI_FEEDBACK_DEADLINE = 30
+AI_FEEDBACK_POLL_INTERVAL = 0.1
+
+
+class InProcessClient:
+    """Calls the app through one Flask test client per thread"""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, body=None, token=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        response = client.open(path, method=method, json=body, headers=headers)
+        return response.status_code, response.get_data()
+
+
+class HttpClient:
+    """Calls a running server with one keep-alive session per thread"""
+
+    def __init__(self, base_url):
+        import requests
+        self.requests = requests
+        self.base_url = base_url.rstrip('/')
+        self._local = threading.local()
+
+    def request(self, method, path, body=None, token=None):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self.requests.Session()
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        response = session.request(method, self.base_url + path, json=body, headers=headers, timeout=60)
+        return response.status_code, response.content
+
+
+def random_assessment(rng, mode):
+    count = rng.randint(2, len(TOPICS))
+    return {
+        'topics': rng.sample(TOPICS, count),
+        'scores': [rng.randint(0, 100) for _ in range(count)],
+        'feedback_mode': mode,
+    }
+
+
+class Scenario:
+    """Test users plus one request function per endpoint"""
+
+    def __init__(self, client, users, seed_submissions, seed):
+        self.client = client
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.users = [f'loadtest_{seed}_{index}' for index in range(users)]
+        self.tokens = []
+
+        for username in self.users:
+            self.client.request('POST', '/register', {'username': username, 'password': PASSWORD})
+            self.tokens.append(self._login(username))
+
+        # Give history, progress and export some rows to return
+        for token in self.tokens:
+            for _ in range(seed_submissions):
+                self.client.request('POST', '/feedback', self._assessment('rule'), token)
+
+    def _login(self, username):
+        status, body = self.client.request('POST', '/login', {'username': username, 'password': PASSWORD})
+        if status != 200:
+            raise SystemExit(f'Could not log in {username}: HTTP {status} {body[:200]!r}')
+        return json.loads(body)['session_token']
+
+    def _assessment(self, mode):
+        with self.rng_lock:
+            return random_assessment(self.rng, mode)
+
+    def _token(self):
+        with self.rng_lock:
+            return self.rng.choice(self.tokens)
+
+    def login(self):
+        with self.rng_lock:
+            username = self.rng.choice(self.users)
+        return self.client.request('POST', '/login', {'username': username, 'password': PASSWORD})[0]
+
+    def feedback_rule(self):
+        return self.client.request('POST', '/feedback', self._assessment('rule'), self._token())[0]
+
+    def feedback_ai(self):
+        # End to end: enqueue, then long-poll until the worker has finished.
+        # The server answers at once when its long-poll slots are taken, so
+        # poll again after a short pause, as the frontend does.
+        token = self._token()
+        status, body = self.client.request('POST', '/feedback', self._assessment('ai'), token)
+        if status != 202:
+            return status
+        submission_id = json.loads(body)['id']
+        deadline = time.monotonic() + AI_FEEDBACK_DEADLINE
+        while time.monotonic() < deadline:
+            polled_at = time.monotonic()
+            status, body = self.client.request('GET', f'/feedback/{submission_id}?wait=10', token=token)
+            if status != 200 or json.loads(body)['status'] != 'pending':
+                return status
+            time.sleep(max(0, AI_FEEDBACK_POLL_INTERVAL - (time.monotonic() - polled_at)))
+        return 504
+
+    def history(self):
+        return self.client.request('GET', '/history?limit=20', token=self._token())[0]
+
+    def progress(self):
+        return self.client.request('GET', '/progress', token=self._token())[0]
+
+    def export_csv(self):
+        return self.client.request('GET', '/export/csv', token=self._token())[0]
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def run_endpoint(call, requests_count, concurrency):
+    """Issue requests_count calls from concurrency threads and summarize the latencies"""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(_):
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            status = call()
+        except Exception:
+            status = None
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if status is None or status >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(requests_count)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    to_ms = lambda seconds: round(seconds * 1000, 2) if seconds is not None else None  # noqa: E731
+    return {
+        'requests': requests_count,
+        'errors': errors,
+        'throughput_rps': round(requests_count / wall, 1),
+        'mean_ms': to_ms(sum(latencies) / len(latencies)),
+        'p50_ms': to_ms(percentile(latencies, 0.50)),
+        'p95_ms': to_ms(percentile(latencies, 0.95)),
+        'p99_ms': to_ms(percentile(latencies, 0.99)),
+        'max_ms': to_ms(latencies[-1]),
+    }
+
+
+def compare(results, baseline, max_regression):
+    """Compare p95 latency and throughput with a stored run, returning (comparison, regressions)"""
+    comparison = {}
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get('endpoints', {}).get(name)
+        if not previous:
+            continue
+        p95_change = current['p95_ms'] / previous['p95_ms'] - 1 if previous['p95_ms'] else 0
+        throughput_change = current['throughput_rps'] / previous['throughput_rps'] - 1 if previous['throughput_rps'] else 0
+        comparison[name] = {
+            'p95_change': round(p95_change, 3),
+            'throughput_change': round(throughput_change, 3),
+        }
+        if p95_change > max_regression or throughput_change < -max_regression:
+            regressions.append(name)
+    return comparison, regressions
+
+
+def build_in_process_app(data_dir):
+    """Configure the app against throwaway databases and migrate them"""
+    os.environ['DATA_DIR'] = data_dir
+    os.environ.pop('HISTORY_DB_PATH', None)
+    os.environ.pop('USERS_DB_PATH', None)
+    # A few users sending every request would mostly measure 429s
+    os.environ.setdefault('RATE_LIMIT_ENABLED', 'false')
+    import app as backend
+
+    application = backend.create_app()
+    backend.migrate_databases()
+    return application
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', help='Base URL of a running server; omit to run the app in-process')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS), help='Comma separated subset of: ' + ', '.join(ENDPOINTS))
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint')
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--seed-submissions', type=int, default=20, help='Rule submissions created per user before measuring')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--cohere-latency', type=float, default=0.2, help='Fake Cohere base latency in seconds (in-process only)')
+    parser.add_argument('--cohere-jitter', type=float, default=0.1)
+    parser.add_argument('--cohere-error-rate', type=float, default=0.0)
+    parser.add_argument('--output', help='Also write the JSON report to this file')
+    parser.add_argument('--baseline', help='JSON report of an earlier run to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='Fail when p95 grows or throughput drops by more than this fraction')
+    args = parser.parse_args()
+
+    endpoints = [name.strip() for name in args.endpoints.split(',') if name.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+
+    fake_cohere = None
+    if args.target:
+        client = HttpClient(args.target)
+    else:
+        fake_cohere = FakeCohereServer(
+            latency=args.cohere_latency, jitter=args.cohere_jitter, error_rate=args.cohere_error_rate
+        ).start()
+        os.environ['COHERE_BASE_URL'] = fake_cohere.base_url
+        os.environ.setdefault('COHERE_API_KEY', 'load-test')
+        # Every AI request should reach the stub rather than the cache
+        os.environ['FEEDBACK_CACHE_SIZE'] = '0'
+        data_dir = tempfile.mkdtemp(prefix='load-test-')
+        client = InProcessClient(build_in_process_app(data_dir))
+
+    random.seed(args.seed)
+    scenario = Scenario(client, args.users, args.seed_submissions, args.seed)
+
+    results = {}
+    for name in endpoints:
+        results[name] = run_endpoint(getattr(scenario, name), args.requests, args.concurrency)
+
+    report = {
+        'config': {
+            'mode': 'http' if args.target else 'in_process',
+            'target': args.target,
+            'concurrency': args.concurrency,
+            'requests_per_endpoint': args.requests,
+            'users': args.users,
+            'seed_submissions': args.seed_submissions,
+            'cohere_latency': args.cohere_latency,
+            'cohere_jitter': args.cohere_jitter,
+            'cohere_error_rate': args.cohere_error_rate,
+            'python': sys.version.split()[0],
+        },
+        'endpoints': results,
+    }
+    if fake_cohere is not None:
+        report['config']['cohere_requests'] = fake_cohere.request_count
+        fake_cohere.stop()
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            comparison, regressions = compare(results, json.load(baseline_file), args.max_regression)
+        report['comparison'] = comparison
+        report['regressions'] = regressions
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+
+    if regressions:
+        raise SystemExit(f"Regressed beyond {args.max_regression:.0%}: {', '.join(regressions)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+import json
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from metrics import (
+    LLM_ATTEMPTS, LLM_GENERATIONS, LLM_GENERATION_DURATION, LLM_REQUEST_DURATION, LLM_TIME_TO_FIRST_TOKEN
+)
+
+PROVIDER = 'cohere'
+
+
+class CohereUnavailable(Exception):
+    """Raised when Cohere could not produce a generation within the retry budget"""
+
+
+class CircuitBreaker:
+    """Stops calling a failing upstream until a cool-down period has passed"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return True if a call may go through right now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                # Let exactly one trial call through to probe the upstream
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def release_trial(self):
+        """Give back a trial call that ended without a verdict, so the next call probes instead"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic() - self.reset_timeout
+
+
+class CohereClient:
+    """Cohere generate client with pooled keep-alive connections, timeouts and retries"""
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, api_key, base_url='https://api.cohere.ai/v1', connect_timeout=3.05,
+                 read_timeout=30, max_retries=2, backoff_base=0.5, backoff_max=4,
+                 deadline=45, pool_size=10, breaker=None, concurrency=None):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.deadline = deadline
+        self.breaker = breaker or CircuitBreaker()
+        # Optional rate_limit.ConcurrencyLimiter shared by every call from this process
+        self.concurrency = concurrency
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'Authorization': f'Bearer {api_key}',
+            'Content-Type': 'application/json'
+        })
+
+    def _backoff(self, attempt, response=None):
+        """Full-jitter exponential backoff, honouring Retry-After when given"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _acquire_slot(self):
+        """Wait for a concurrency slot, shedding the call when too many are already waiting"""
+        if self.concurrency is not None and not self.concurrency.acquire():
+            # Not the upstream's fault, so the circuit breaker is left alone
+            LLM_GENERATIONS.inc(PROVIDER, 'shed')
+            raise CohereUnavailable('Too many concurrent LLM requests')
+
+    def _release_slot(self):
+        if self.concurrency is not None:
+            self.concurrency.release()
+
+    def _post(self, data, stream=False):
+        """POST to /generate with retries, returning (first 200 response, start time)"""
+        if not self.breaker.allow():
+            LLM_GENERATIONS.inc(PROVIDER, 'circuit_open')
+            raise CohereUnavailable('Circuit breaker is open')
+
+        started = time.monotonic()
+        last_error = None
+
+        for attempt in range(self.max_retries + 1):
+            response = None
+            attempt_started = time.perf_counter()
+            try:
+                response = self.session.post(f"{self.base_url}/generate", json=data, timeout=self.timeout,
+                                             stream=stream)
+                LLM_REQUEST_DURATION.observe(time.perf_counter() - attempt_started, PROVIDER)
+                LLM_ATTEMPTS.inc(PROVIDER, str(response.status_code))
+                if response.status_code == 200:
+                    return response, started
+
+                last_error = f'Cohere returned HTTP {response.status_code}'
+                # A streamed body is not read, so release its connection now
+                response.close()
+                if response.status_code not in self.RETRY_STATUSES:
+                    break
+            except requests.RequestException as e:
+                # Every request error settles the breaker and becomes CohereUnavailable,
+                # but only connection problems and timeouts are worth retrying
+                LLM_REQUEST_DURATION.observe(time.perf_counter() - attempt_started, PROVIDER)
+                last_error = f'Cohere request failed: {e}'
+                if isinstance(e, requests.Timeout):
+                    LLM_ATTEMPTS.inc(PROVIDER, 'timeout')
+                elif isinstance(e, requests.ConnectionError):
+                    LLM_ATTEMPTS.inc(PROVIDER, 'connection_error')
+                else:
+                    LLM_ATTEMPTS.inc(PROVIDER, 'request_error')
+                    break
+
+            if attempt == self.max_retries:
+                break
+            delay = self._backoff(attempt, response)
+            # Never retry past the overall deadline
+            if time.monotonic() - started + delay >= self.deadline:
+                break
+            time.sleep(delay)
+
+        self._fail(started, last_error)
+
+    def _succeed(self, started):
+        self.breaker.record_success()
+        LLM_GENERATIONS.inc(PROVIDER, 'success')
+        LLM_GENERATION_DURATION.observe(time.monotonic() - started, PROVIDER)
+
+    def _fail(self, started, error):
+        self.breaker.record_failure()
+        LLM_GENERATIONS.inc(PROVIDER, 'error')
+        LLM_GENERATION_DURATION.observe(time.monotonic() - started, PROVIDER)
+        raise CohereUnavailable(error)
+
+    def generate(self, prompt, model='command-r-plus', max_tokens=500, temperature=0.7):
+        """Return the generated text, raising CohereUnavailable on failure"""
+        data = {
+            'model': model,
+            'prompt': prompt,
+            'max_tokens': max_tokens,
+            'temperature': temperature
+        }
+        self._acquire_slot()
+        try:
+            response, started = self._post(data)
+            try:
+                result = response.json()
+            except ValueError as e:
+                LLM_ATTEMPTS.inc(PROVIDER, 'invalid_json')
+                self._fail(started, f'Cohere returned invalid JSON: {e}')
+        finally:
+            self._release_slot()
+
+        self._succeed(started)
+        return result.get('generations', [{}])[0].get('text', '').strip()
+
+    def stream_generate(self, prompt, model='command-r-plus', max_tokens=500, temperature=0.7):
+        """Yield generated text chunks as they arrive, raising CohereUnavailable on failure"""
+        data = {
+            'model': model,
+            'prompt': prompt,
+            'max_tokens': max_tokens,
+            'temperature': temperature,
+            'stream': True
+        }
+        # The slot is held until the stream is closed, not just while connecting
+        self._acquire_slot()
+        try:
+            yield from self._stream(data)
+        finally:
+            self._release_slot()
+
+    def _stream(self, data):
+        # Retries only happen before the first chunk; once text has been
+        # relayed a failure ends the stream
+        response, started = self._post(data, stream=True)
+        error = None
+        first_chunk = True
+        settled = False
+        try:
+            # One JSON object per line; chunk_size=None hands over each
+            # chunk as soon as it arrives instead of filling a buffer
+            for line in response.iter_lines(chunk_size=None):
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event.get('is_finished'):
+                    if event.get('finish_reason') not in (None, 'COMPLETE', 'MAX_TOKENS'):
+                        error = f"Cohere stream ended with {event.get('finish_reason')}"
+                    break
+                text = event.get('text')
+                if text:
+                    if first_chunk:
+                        LLM_TIME_TO_FIRST_TOKEN.observe(time.monotonic() - started, PROVIDER)
+                        first_chunk = False
+                    yield text
+            else:
+                error = 'Cohere stream ended without a final event'
+            settled = True
+        except (requests.RequestException, ValueError) as e:
+            error = f'Cohere stream failed: {e}'
+            settled = True
+        except GeneratorExit:
+            # The caller stopped reading, usually because its client went away
+            LLM_GENERATIONS.inc(PROVIDER, 'cancelled')
+            raise
+        finally:
+            response.close()
+            # Cancelled or failed unexpectedly: if this was the circuit
+            # breaker's trial call, it would otherwise stay half open for good
+            if not settled:
+                self.breaker.release_trial()
+
+        if error:
+            self._fail(started, error)
+        self._succeed(started)
+
+    def close(self):
+        self.session.close()
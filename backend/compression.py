@@ -0,0 +1,57 @@
+"""
+gzip and deflate response compression negotiated through Accept-Encoding.
+
+Buffered responses are compressed in one call once they reach a minimum
+size. Streamed responses (the exports) are compressed chunk by chunk as
+they are sent, so they never need to be held in memory.
+"""
+import zlib
+
+ENCODINGS = ('gzip', 'deflate')
+
+# zlib window bits selecting the gzip or zlib ("deflate" in HTTP) container
+_WBITS = {'gzip': 31, 'deflate': 15}
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/csv', 'text/plain'}
+
+
+def negotiate_encoding(accept_encodings):
+    """Return the client's preferred supported encoding, or None for identity"""
+    return accept_encodings.best_match(ENCODINGS)
+
+
+def _compress_chunks(chunks, compressor):
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def compress_response(response, encoding, min_size, level=6):
+    """Compress response in place with encoding if it is worth it, returning True if it was"""
+    if (level <= 0
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return False
+
+    # The body depends on Accept-Encoding from here on, even when this
+    # particular client gets it uncompressed
+    response.vary.add('Accept-Encoding')
+    if encoding is None:
+        return False
+
+    compressor = zlib.compressobj(level, zlib.DEFLATED, _WBITS[encoding])
+    if response.is_streamed:
+        response.response = _compress_chunks(response.iter_encoded(), compressor)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < min_size:
+            return False
+        response.set_data(compressor.compress(data) + compressor.flush())
+
+    response.headers['Content-Encoding'] = encoding
+    return True
@@ -0,0 +1,126 @@
+import atexit
+import queue
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+
+# Pragmas applied to every pooled connection. WAL lets readers run alongside
+# a single writer, so long /history reads no longer block /feedback inserts.
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -16000,  # negative means KiB, so ~16 MB of page cache
+    'mmap_size': 134217728,  # 128 MB
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,
+    'foreign_keys': 'ON',
+}
+
+_live_pools = weakref.WeakSet()
+
+
+class ConnectionPool:
+    """Bounded pool of reusable SQLite connections shared between threads"""
+
+    def __init__(self, db_path, max_size=8, pragmas=None, cached_statements=128, timeout=30):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.pragmas = dict(DEFAULT_PRAGMAS)
+        if pragmas:
+            self.pragmas.update(pragmas)
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+
+        self._idle = queue.LifoQueue()
+        self._all = []
+        self._lock = threading.Lock()
+        self._closed = False
+        _live_pools.add(self)
+
+    def _connect(self):
+        """Open and configure a new connection"""
+        # Python's sqlite3 keeps a per-connection LRU of prepared statements,
+        # so reusing connections also reuses the compiled SQL.
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name}={value}')
+        return conn
+
+    def acquire(self):
+        """Take a connection from the pool, opening one if none is idle"""
+        if self._closed:
+            raise RuntimeError(f'Connection pool for {self.db_path} is closed')
+
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if len(self._all) < self.max_size:
+                conn = self._connect()
+                self._all.append(conn)
+                return conn
+
+        # Pool is at capacity, wait for another thread to give one back
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise RuntimeError(f'Timed out waiting for a connection to {self.db_path}')
+
+    def release(self, conn):
+        """Return a connection to the pool"""
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            conn.close()
+            return
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a with-block"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    @contextmanager
+    def transaction(self):
+        """Borrow a connection and commit on success or roll back on error"""
+        with self.connection() as conn:
+            with conn:
+                yield conn
+
+    def close(self):
+        """Close every connection owned by this pool"""
+        with self._lock:
+            self._closed = True
+            connections, self._all = self._all, []
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                # Connection is still in use by another thread
+                pass
+
+
+def close_all_pools():
+    """Close every live pool, used on interpreter shutdown"""
+    for pool in list(_live_pools):
+        pool.close()
+
+
+atexit.register(close_all_pools)
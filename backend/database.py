@@ -1,136 +1,577 @@
-import sqlite3
 import json
-from datetime import datetime
-import os
+import base64
+from datetime import datetime, timezone
+from connection_pool import ConnectionPool
+from group_commit import GroupCommitWriter, SYNCHRONOUS_LEVELS
+from migrations import run_migrations, require_current_schema, HISTORY_MIGRATIONS
+from rollups import rollup_rows, apply_rollups, rebuild_rollups, rollup_from_row
+from submission_scores import save_scores, load_scores, merge_topics
+from analytics import TopicSketches, rebuild_sketches
+from metrics import timed_operation
+from topic_catalog import fold_topic
+
+SUBMISSION_COLUMNS = 'id, timestamp, feedback, resources, summary_score, feedback_mode, status'
+PROGRESS_COLUMNS = 'id, timestamp, summary_score, feedback_mode'
+
+
+def encode_cursor(timestamp, submission_id):
+    """Encode a (timestamp, id) keyset position as an opaque cursor string"""
+    raw = f'{timestamp}|{submission_id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor, raising ValueError if malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, submission_id = base64.urlsafe_b64decode(padded).decode().rsplit('|', 1)
+        return timestamp, int(submission_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+INSERT_SUBMISSION_SQL = '''
+    INSERT INTO submissions (user_id, timestamp, feedback, resources, summary_score, feedback_mode, status)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+BUMP_USER_VERSION_SQL = '''
+    INSERT INTO user_versions (user_id, version, updated_at)
+    VALUES (?, 1, ?)
+    ON CONFLICT (user_id) DO UPDATE SET
+        version = version + 1,
+        updated_at = excluded.updated_at
+'''
+
+
+# Submission ids of shard N start at N * SHARD_ID_SPACE, so ids stay unique
+# across shards. Every row lives on the shard whose range holds its id:
+# AUTOINCREMENT continues from the largest id in the table, so a foreign id
+# would pull the shard's sequence into another shard's range. Resharding
+# therefore renumbers moved rows into their new shard's range. Well within
+# JavaScript's 2**53 safe integer range for thousands of shards.
+SHARD_ID_SPACE = 2 ** 40
+
+
+def current_timestamp():
+    """Return the current UTC time in the same format as SQLite's CURRENT_TIMESTAMP"""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _insert_params(user_id, scores, feedback, resources, feedback_mode, status, timestamp=None):
+    # Calculate summary score
+    summary_score = sum(scores) / len(scores) if scores else 0
+
+    return (
+        user_id,
+        timestamp or current_timestamp(),
+        feedback,
+        json.dumps(resources) if resources else None,
+        summary_score,
+        feedback_mode,
+        status
+    )
+
+
+def seed_submission_ids(conn, shard_index):
+    """Start an empty shard's AUTOINCREMENT ids in its own range, see SHARD_ID_SPACE"""
+    conn.execute('''
+        INSERT INTO sqlite_sequence (name, seq)
+        SELECT 'submissions', ? WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'submissions')
+    ''', (shard_index * SHARD_ID_SPACE,))
+
+
+def _bump_user_version(conn, user_id):
+    """Mark a user's submissions as changed, inside the caller's transaction"""
+    if user_id is not None:
+        conn.execute(BUMP_USER_VERSION_SQL, (user_id, current_timestamp()))
+
+
+def _rollups_for(submission_id, params, topics, scores):
+    """Rollup rows for a submission given its INSERT_SUBMISSION_SQL parameters"""
+    user_id, timestamp, _, _, summary_score, _, _ = params
+    return rollup_rows(user_id, submission_id, timestamp, topics, scores, summary_score)
+
+
+def _insert_submissions(conn, entries):
+    """Insert (params, topics, scores) entries in the caller's transaction and return their ids in order"""
+    conn.executemany(INSERT_SUBMISSION_SQL, [params for params, _, _ in entries])
+    # The write lock is held from the first insert until commit, so
+    # the AUTOINCREMENT ids of this batch are consecutive
+    last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+    ids = list(range(last_id - len(entries) + 1, last_id + 1))
+
+    stored_names = save_scores(conn, [
+        (submission_id, topics, scores)
+        for submission_id, (_, topics, scores) in zip(ids, entries)
+    ])
+
+    # Keep the progress rollups in step within the same transaction, under
+    # the spelling each topic was first stored with
+    rollups = []
+    for submission_id, (params, topics, scores) in zip(ids, entries):
+        topics = [stored_names[topic] for topic in topics]
+        rollups.extend(_rollups_for(submission_id, params, topics, scores))
+    apply_rollups(conn, rollups)
+
+    for user_id in dict.fromkeys(params[0] for params, _, _ in entries):
+        _bump_user_version(conn, user_id)
+    return ids
+
+
+def _submission_from_row(row, scores_by_id):
+    topics, scores = scores_by_id[row[0]]
+    return {
+        'id': row[0],
+        'timestamp': row[1],
+        'topics': topics,
+        'scores': scores,
+        'feedback': row[2],
+        'resources': json.loads(row[3]) if row[3] else None,
+        'summary_score': row[4],
+        'feedback_mode': row[5] if row[5] else 'ai',
+        'status': row[6]
+    }
+
+
+def _progress_from_row(row, scores_by_id):
+    topics, scores = scores_by_id[row[0]]
+    return {
+        'id': row[0],
+        'timestamp': row[1],
+        'topics': topics,
+        'scores': scores,
+        'summary_score': row[2],
+        'feedback_mode': row[3] if row[3] else 'ai'
+    }
+
+
+def _rows_with_scores(conn, rows):
+    """Load the topics and scores for a list of submission rows"""
+    return load_scores(conn, [row[0] for row in rows])
+
 
 class DatabaseManager:
-    def __init__(self, db_path='history.db'):
+    def __init__(self, db_path='history.db', pool_size=8, sketch_flush_interval=30, migrate=True,
+                 group_commit_interval=None, group_commit_batch=256, group_commit_synchronous='NORMAL',
+                 shard=(0, 1)):
         self.db_path = db_path
-        self.init_database()
-    
+        self.pool = ConnectionPool(db_path, max_size=pool_size)
+        # (shard index, shard count) this file is expected to hold
+        self.shard = tuple(shard)
+        # Servers pass migrate=False and rely on a separate migrate step,
+        # which also claims the file for its shard
+        if migrate:
+            self.init_database()
+            self.claim_shard_layout()
+        else:
+            self.check_schema()
+            self.check_shard_layout()
+        # Cohort histograms per topic, buffered in memory between flushes
+        self.sketches = TopicSketches(self.pool, flush_interval=sketch_flush_interval)
+
+        # Optional background writer that batches save_submission calls from
+        # all request threads into one transaction, on its own connection so
+        # its synchronous level sets the durability of those commits
+        self.writer = None
+        if group_commit_interval is not None:
+            synchronous = group_commit_synchronous.upper()
+            if synchronous not in SYNCHRONOUS_LEVELS:
+                raise ValueError(f"group_commit_synchronous must be one of {', '.join(SYNCHRONOUS_LEVELS)}")
+            self.writer = GroupCommitWriter(
+                ConnectionPool(db_path, max_size=1, pragmas={'synchronous': synchronous}),
+                _insert_submissions,
+                flush_interval=group_commit_interval,
+                max_batch=group_commit_batch,
+                name='history'
+            )
+
+    def close(self):
+        """Drain queued writes, flush pending topic sketches and close all pooled connections"""
+        if self.writer:
+            self.writer.close()
+        self.sketches.flush()
+        self.pool.close()
+
     def init_database(self):
-        """Initialize the database with required tables"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Create table with user_id column
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS submissions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                topics TEXT NOT NULL,
-                scores TEXT NOT NULL,
-                feedback TEXT NOT NULL,
-                resources TEXT,
-                summary_score REAL,
-                feedback_mode TEXT DEFAULT 'ai'
+        """Bring the database schema up to the latest version"""
+        with self.pool.connection() as conn:
+            run_migrations(conn, HISTORY_MIGRATIONS)
+
+    def check_schema(self):
+        """Fail fast if the schema has not been migrated to the latest version"""
+        with self.pool.connection() as conn:
+            require_current_schema(conn, HISTORY_MIGRATIONS)
+
+    def claim_shard_layout(self):
+        """Claim an unclaimed file for self.shard, or raise RuntimeError if it belongs to another layout"""
+        shard_index, shard_count = self.shard
+        with self.pool.transaction() as conn:
+            conn.execute(
+                'INSERT OR IGNORE INTO shard_layout (id, shard_index, shard_count) VALUES (0, ?, ?)',
+                (shard_index, shard_count)
+            )
+            self._require_layout(conn.execute('SELECT shard_index, shard_count FROM shard_layout').fetchone())
+            seed_submission_ids(conn, shard_index)
+
+    def check_shard_layout(self):
+        """Fail fast, without writing, if the file is not the shard it was opened as"""
+        with self.pool.connection() as conn:
+            layout = conn.execute('SELECT shard_index, shard_count FROM shard_layout').fetchone()
+        if layout is None:
+            raise RuntimeError(f'{self.db_path} has no shard layout yet, run "python manage.py migrate" first')
+        self._require_layout(layout)
+
+    def _require_layout(self, layout):
+        if tuple(layout) != self.shard:
+            raise RuntimeError(
+                f'{self.db_path} is shard {layout[0]} of {layout[1]} but was opened as shard '
+                f'{self.shard[0]} of {self.shard[1]}, run "python manage.py reshard" first'
             )
-        ''')
-        
-        # Check if user_id column exists, if not add it
-        cursor.execute("PRAGMA table_info(submissions)")
-        columns = [column[1] for column in cursor.fetchall()]
-        
-        if 'user_id' not in columns:
-            cursor.execute('ALTER TABLE submissions ADD COLUMN user_id INTEGER')
-        
-        if 'feedback_mode' not in columns:
-            cursor.execute('ALTER TABLE submissions ADD COLUMN feedback_mode TEXT DEFAULT "ai"')
-        
-        conn.commit()
-        conn.close()
-    
-    def save_submission(self, topics, scores, feedback, resources=None, feedback_mode='ai', user_id=None):
+
+    @timed_operation('history')
+    def save_submission(self, topics, scores, feedback, resources=None, feedback_mode='ai', user_id=None, status='complete'):
         """Save a new submission to the database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Calculate summary score
-        summary_score = sum(scores) / len(scores) if scores else 0
-        
-        cursor.execute('''
-            INSERT INTO submissions (user_id, topics, scores, feedback, resources, summary_score, feedback_mode)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            user_id,
-            json.dumps(topics),
-            json.dumps(scores),
-            feedback,
-            json.dumps(resources) if resources else None,
-            summary_score,
-            feedback_mode
-        ))
-        
-        conn.commit()
-        submission_id = cursor.lastrowid
-        conn.close()
-        
+        params = _insert_params(user_id, scores, feedback, resources, feedback_mode, status)
+
+        if self.writer:
+            # Returns once the shared transaction holding this row has committed
+            submission_id = self.writer.write((params, topics, scores))
+        else:
+            with self.pool.transaction() as conn:
+                submission_id = _insert_submissions(conn, [(params, topics, scores)])[0]
+
+        self.sketches.record(topics, scores)
         return submission_id
-    
+
+    @timed_operation('history')
+    def save_submissions(self, submissions, user_id=None):
+        """Save many submissions in one transaction and return their ids in order"""
+        if not submissions:
+            return []
+
+        rows = [
+            _insert_params(
+                user_id,
+                submission['scores'],
+                submission.get('feedback', ''),
+                submission.get('resources'),
+                submission.get('feedback_mode', 'ai'),
+                submission.get('status', 'complete'),
+                submission.get('timestamp')
+            )
+            for submission in submissions
+        ]
+
+        with self.pool.transaction() as conn:
+            ids = _insert_submissions(conn, [
+                (params, submission['topics'], submission['scores'])
+                for params, submission in zip(rows, submissions)
+            ])
+
+        self.sketches.record_many((submission['topics'], submission['scores']) for submission in submissions)
+        return ids
+
+    @timed_operation('history')
+    def complete_submission(self, submission_id, feedback, resources=None, status='complete', user_id=None):
+        """Store the generated feedback on a pending submission; user_id locates it in sharded storage"""
+        with self.pool.transaction() as conn:
+            conn.execute('''
+                UPDATE submissions SET feedback = ?, resources = ?, status = ?
+                WHERE id = ?
+            ''', (
+                feedback,
+                json.dumps(resources) if resources else None,
+                status,
+                submission_id
+            ))
+            row = conn.execute('SELECT user_id FROM submissions WHERE id = ?', (submission_id,)).fetchone()
+            if row:
+                _bump_user_version(conn, row[0])
+
+    def fail_stale_submissions(self, older_than, feedback):
+        """Mark submissions still pending since before the older_than timestamp failed, returning how many"""
+        with self.pool.transaction() as conn:
+            user_ids = [row[0] for row in conn.execute(
+                "SELECT DISTINCT user_id FROM submissions WHERE status = 'pending' AND timestamp < ?",
+                (older_than,)
+            )]
+            failed = conn.execute(
+                "UPDATE submissions SET feedback = ?, status = 'failed' WHERE status = 'pending' AND timestamp < ?",
+                (feedback, older_than)
+            ).rowcount
+            for user_id in user_ids:
+                _bump_user_version(conn, user_id)
+        return failed
+
+    @timed_operation('history')
+    def get_submission(self, submission_id, user_id):
+        """Get a single submission if it belongs to the user"""
+        with self.pool.connection() as conn:
+            row = conn.execute(f'''
+                SELECT {SUBMISSION_COLUMNS}
+                FROM submissions
+                WHERE id = ? AND user_id = ?
+            ''', (submission_id, user_id)).fetchone()
+            if not row:
+                return None
+            return _submission_from_row(row, _rows_with_scores(conn, [row]))
+
+    @timed_operation('history')
     def get_all_submissions(self, user_id=None):
         """Get all submissions from the database for a specific user"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        if user_id:
-            cursor.execute('''
-                SELECT id, timestamp, topics, scores, feedback, resources, summary_score, feedback_mode
-                FROM submissions
-                WHERE user_id = ?
-                ORDER BY timestamp DESC
-            ''', (user_id,))
-        else:
-            cursor.execute('''
-                SELECT id, timestamp, topics, scores, feedback, resources, summary_score, feedback_mode
-                FROM submissions
-                ORDER BY timestamp DESC
-            ''')
-        
-        submissions = []
-        for row in cursor.fetchall():
-            submissions.append({
-                'id': row[0],
-                'timestamp': row[1],
-                'topics': json.loads(row[2]),
-                'scores': json.loads(row[3]),
-                'feedback': row[4],
-                'resources': json.loads(row[5]) if row[5] else None,
-                'summary_score': row[6],
-                'feedback_mode': row[7] if row[7] else 'ai'
-            })
-        
-        conn.close()
-        return submissions
-    
+        with self.pool.connection() as conn:
+            if user_id:
+                cursor = conn.execute(f'''
+                    SELECT {SUBMISSION_COLUMNS}
+                    FROM submissions
+                    WHERE user_id = ?
+                    ORDER BY timestamp DESC
+                ''', (user_id,))
+            else:
+                cursor = conn.execute(f'''
+                    SELECT {SUBMISSION_COLUMNS}
+                    FROM submissions
+                    ORDER BY timestamp DESC
+                ''')
+            rows = cursor.fetchall()
+            scores_by_id = _rows_with_scores(conn, rows)
+
+        return [_submission_from_row(row, scores_by_id) for row in rows]
+
+    @timed_operation('history')
     def get_progress_data(self, user_id=None):
         """Get progress data for line chart for a specific user"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        if user_id:
-            cursor.execute('''
-                SELECT timestamp, topics, scores, summary_score, feedback_mode
+        with self.pool.connection() as conn:
+            if user_id:
+                cursor = conn.execute(f'''
+                    SELECT {PROGRESS_COLUMNS}
+                    FROM submissions
+                    WHERE user_id = ?
+                    ORDER BY timestamp ASC
+                ''', (user_id,))
+            else:
+                cursor = conn.execute(f'''
+                    SELECT {PROGRESS_COLUMNS}
+                    FROM submissions
+                    ORDER BY timestamp ASC
+                ''')
+            rows = cursor.fetchall()
+            scores_by_id = _rows_with_scores(conn, rows)
+
+        return [_progress_from_row(row, scores_by_id) for row in rows]
+
+    def _fetch_page(self, columns, user_id, limit, cursor, descending):
+        """Fetch up to limit rows after cursor in (timestamp, id) order, with their scores"""
+        order = 'DESC' if descending else 'ASC'
+        comparison = '<' if descending else '>'
+        params = [user_id]
+        where = 'user_id = ?'
+
+        if cursor:
+            where += f' AND (timestamp, id) {comparison} (?, ?)'
+            params.extend(decode_cursor(cursor))
+
+        # Ask for one extra row to learn whether another page exists
+        params.append(limit + 1)
+
+        with self.pool.connection() as conn:
+            rows = conn.execute(f'''
+                SELECT {columns}
                 FROM submissions
-                WHERE user_id = ?
-                ORDER BY timestamp ASC
-            ''', (user_id,))
-        else:
-            cursor.execute('''
-                SELECT timestamp, topics, scores, summary_score, feedback_mode
+                WHERE {where}
+                ORDER BY timestamp {order}, id {order}
+                LIMIT ?
+            ''', params).fetchall()
+
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+            scores_by_id = _rows_with_scores(conn, rows)
+
+        return rows, scores_by_id, next_cursor
+
+    def _fetch_since(self, columns, user_id, since_id, limit):
+        """Fetch up to limit rows with an id greater than since_id, oldest first, with their scores"""
+        with self.pool.connection() as conn:
+            rows = conn.execute(f'''
+                SELECT {columns}
+                FROM submissions
+                WHERE user_id = ? AND id > ?
+                ORDER BY id ASC
+                LIMIT ?
+            ''', (user_id, since_id, limit + 1)).fetchall()
+
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            scores_by_id = _rows_with_scores(conn, rows)
+
+        return rows, scores_by_id, has_more
+
+    @timed_operation('history')
+    def get_submissions_page(self, user_id, limit=50, cursor=None):
+        """Get one page of a user's submissions, newest first, plus the cursor for the next page"""
+        rows, scores_by_id, next_cursor = self._fetch_page(SUBMISSION_COLUMNS, user_id, limit, cursor, descending=True)
+        return [_submission_from_row(row, scores_by_id) for row in rows], next_cursor
+
+    @timed_operation('history')
+    def get_submissions_since(self, user_id, since_id, limit=50):
+        """Get a user's submissions created after since_id, oldest first"""
+        rows, scores_by_id, has_more = self._fetch_since(SUBMISSION_COLUMNS, user_id, since_id, limit)
+        return [_submission_from_row(row, scores_by_id) for row in rows], has_more
+
+    @timed_operation('history')
+    def get_progress_page(self, user_id, limit=500, cursor=None):
+        """Get one page of a user's progress data, oldest first, plus the cursor for the next page"""
+        rows, scores_by_id, next_cursor = self._fetch_page(PROGRESS_COLUMNS, user_id, limit, cursor, descending=False)
+        return [_progress_from_row(row, scores_by_id) for row in rows], next_cursor
+
+    @timed_operation('history')
+    def get_progress_since(self, user_id, since_id, limit=500):
+        """Get a user's progress data created after since_id, oldest first"""
+        rows, scores_by_id, has_more = self._fetch_since(PROGRESS_COLUMNS, user_id, since_id, limit)
+        return [_progress_from_row(row, scores_by_id) for row in rows], has_more
+
+    def iter_submissions(self, user_id, start=None, end=None, chunk_size=500):
+        """Yield a user's submissions newest first, reading chunk_size rows per query"""
+        where = 'user_id = ?'
+        base_params = [user_id]
+        if start:
+            where += ' AND timestamp >= ?'
+            base_params.append(start)
+        if end:
+            where += ' AND timestamp < ?'
+            base_params.append(end)
+
+        position = None
+        while True:
+            params = list(base_params)
+            keyset = ''
+            if position:
+                keyset = ' AND (timestamp, id) < (?, ?)'
+                params.extend(position)
+            params.append(chunk_size)
+
+            # Each chunk is its own short query, so a slow download never
+            # pins a pooled connection or an open read transaction.
+            rows, scores_by_id = self._fetch_export_chunk(where + keyset, params)
+
+            for row in rows:
+                yield _submission_from_row(row, scores_by_id)
+
+            if len(rows) < chunk_size:
+                return
+            position = (rows[-1][1], rows[-1][0])
+
+    @timed_operation('history')
+    def _fetch_export_chunk(self, where, params):
+        """Fetch one iter_submissions chunk, newest first, with its scores"""
+        with self.pool.connection() as conn:
+            rows = conn.execute(f'''
+                SELECT {SUBMISSION_COLUMNS}
                 FROM submissions
-                ORDER BY timestamp ASC
-            ''')
-        
-        progress_data = []
-        for row in cursor.fetchall():
-            progress_data.append({
-                'timestamp': row[0],
-                'topics': json.loads(row[1]),
-                'scores': json.loads(row[2]),
-                'summary_score': row[3],
-                'feedback_mode': row[4] if row[4] else 'ai'
-            })
-        
-        conn.close()
-        return progress_data
\ No newline at end of file
+                WHERE {where}
+                ORDER BY timestamp DESC, id DESC
+                LIMIT ?
+            ''', params).fetchall()
+            return rows, _rows_with_scores(conn, rows)
+
+    @timed_operation('history')
+    def get_user_version(self, user_id):
+        """Get (version, updated_at) for a user's submissions, (0, None) if they have none"""
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                'SELECT version, updated_at FROM user_versions WHERE user_id = ?', (user_id,)
+            ).fetchone()
+        return (row[0], row[1]) if row else (0, None)
+
+    @timed_operation('history')
+    def get_rollups(self, user_id, bucket='day', topic=None):
+        """Get a user's per-topic score rollups for day or week buckets, oldest first"""
+        params = [user_id, bucket]
+        where = 'user_id = ? AND bucket = ?'
+        if topic is not None:
+            # Rollups use the stored spelling; OVERALL_TOPIC has no topics row
+            where += ' AND topic = COALESCE((SELECT name FROM topics WHERE fold_key = ?), ?)'
+            params.extend([fold_topic(topic), topic])
+
+        with self.pool.connection() as conn:
+            rows = conn.execute(f'''
+                SELECT topic, bucket_start, count, score_sum, score_min, score_max, last_score
+                FROM progress_rollups
+                WHERE {where}
+                ORDER BY topic, bucket_start
+            ''', params).fetchall()
+
+        return [rollup_from_row(row) for row in rows]
+
+    @timed_operation('history')
+    def get_topic_stats(self, user_id, topic=None):
+        """Get a user's count, average, min and max score per topic across all submissions"""
+        params = [user_id]
+        where = 's.user_id = ?'
+        if topic is not None:
+            where += ' AND t.fold_key = ?'
+            params.append(fold_topic(topic))
+
+        with self.pool.connection() as conn:
+            rows = conn.execute(f'''
+                SELECT t.name, COUNT(*), AVG(ss.score), MIN(ss.score), MAX(ss.score)
+                FROM submissions s
+                JOIN submission_scores ss ON ss.submission_id = s.id
+                JOIN topics t ON t.id = ss.topic_id
+                WHERE {where}
+                GROUP BY t.name
+                ORDER BY t.name
+            ''', params).fetchall()
+
+        return [
+            {'topic': name, 'count': count, 'average': average, 'min': low, 'max': high}
+            for name, count, average, low, high in rows
+        ]
+
+    @timed_operation('history')
+    def get_latest_topic_score(self, user_id, topic):
+        """Get the user's most recent score for topic, or None if they never assessed it"""
+        with self.pool.connection() as conn:
+            row = conn.execute('''
+                SELECT ss.score
+                FROM submissions s
+                JOIN submission_scores ss ON ss.submission_id = s.id
+                JOIN topics t ON t.id = ss.topic_id
+                WHERE s.user_id = ? AND t.fold_key = ?
+                ORDER BY s.timestamp DESC, s.id DESC
+                LIMIT 1
+            ''', (user_id, fold_topic(topic))).fetchone()
+        return row[0] if row else None
+
+    @timed_operation('history')
+    def get_topic_distribution(self, topic):
+        """Get the cohort score histogram for topic across all users"""
+        return self.sketches.get(topic)
+
+    def backfill_sketches(self):
+        """Rebuild every topic histogram from submission_scores"""
+        self.sketches.discard_pending()
+        with self.pool.transaction() as conn:
+            return rebuild_sketches(conn)
+
+    def backfill_rollups(self):
+        """Rebuild all progress rollups from the submissions table"""
+        with self.pool.transaction() as conn:
+            return rebuild_rollups(conn)
+
+    def canonicalize_topics(self, canonical):
+        """Merge stored topics that canonical() maps to one name, returning the number merged"""
+        self.sketches.flush()
+        with self.pool.transaction() as conn:
+            merged = merge_topics(conn, canonical)
+            if merged:
+                # Histograms and rollups are keyed by topic, so both are
+                # recounted, and every user's cached responses go stale
+                rebuild_sketches(conn)
+                rebuild_rollups(conn)
+                conn.execute('UPDATE user_versions SET version = version + 1, updated_at = ?',
+                             (current_timestamp(),))
+        return merged
@@ -0,0 +1,86 @@
+import csv
+import io
+from datetime import datetime, timedelta
+
+from serialization import dumps
+
+CSV_HEADERS = ['ID', 'Timestamp', 'Topics', 'Scores', 'Summary Score', 'Feedback Mode', 'Feedback']
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Rows are buffered and flushed in groups so the response is sent in
+# reasonably sized chunks instead of one tiny write per row.
+ROWS_PER_CHUNK = 200
+
+
+def parse_date_filter(value, end=False):
+    """Turn a YYYY-MM-DD or ISO datetime query value into a timestamp bound"""
+    if not value:
+        return None
+
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Invalid date: {value}')
+
+    # A bare date used as the end bound includes that whole day
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+
+    return parsed.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def truncate_feedback(feedback):
+    return feedback[:100] + '...' if len(feedback) > 100 else feedback
+
+
+def csv_chunks(submissions):
+    """Yield CSV text for an iterable of submissions, a chunk at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADERS)
+
+    rows = 0
+    for submission in submissions:
+        writer.writerow([
+            submission['id'],
+            submission['timestamp'],
+            ', '.join(submission['topics']),
+            ', '.join(map(str, submission['scores'])),
+            submission['summary_score'],
+            submission.get('feedback_mode', 'ai'),
+            truncate_feedback(submission['feedback'])
+        ])
+        rows += 1
+
+        if rows % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    remainder = buffer.getvalue()
+    if remainder:
+        yield remainder
+
+
+def ndjson_chunks(submissions):
+    """Yield newline-delimited JSON for an iterable of submissions, a chunk at a time"""
+    lines = []
+    for submission in submissions:
+        lines.append(dumps(submission))
+
+        if len(lines) == ROWS_PER_CHUNK:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+EXPORT_WRITERS = {
+    'csv': csv_chunks,
+    'ndjson': ndjson_chunks,
+}
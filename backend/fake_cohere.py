@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Cohere generate API, for development, tests and load runs.
+
+Requests with "stream": true get the text back as chunked JSON lines, one
+word per line, the way Cohere streams generations.
+
+Point the backend at it with COHERE_BASE_URL:
+    python fake_cohere.py --port 8765 --latency 0.5 --error-rate 0.1 --token-interval 0.05
+    COHERE_BASE_URL=http://localhost:8765 python app.py
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SAMPLE_TEXT = (
+    "You have a solid foundation to build on. Focus first on your lowest scoring "
+    "topics, practise a little every day and revisit your strong areas to keep them fresh. "
+    "Keep going, steady effort pays off!"
+)
+
+
+class FakeCohereHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, payload):
+        line = json.dumps(payload).encode() + b'\n'
+        self.wfile.write(f'{len(line):X}\r\n'.encode() + line + b'\r\n')
+        self.wfile.flush()
+
+    def _send_stream(self, interval):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/stream+json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        try:
+            for index, word in enumerate(SAMPLE_TEXT.split(' ')):
+                if index and interval:
+                    time.sleep(interval)
+                self._write_chunk({'text': word if index == 0 else ' ' + word, 'is_finished': False})
+            self._write_chunk({
+                'is_finished': True,
+                'finish_reason': 'COMPLETE',
+                'response': {'id': 'fake-generation', 'generations': [{'id': 'fake', 'text': SAMPLE_TEXT}]}
+            })
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading mid-stream
+            self.close_connection = True
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+
+        server = self.server
+        server.record_request()
+
+        delay = server.latency + random.uniform(0, server.jitter)
+        if delay:
+            time.sleep(delay)
+
+        if self.path.rstrip('/') != '/generate':
+            self._send_json(404, {'message': 'not found'})
+            return
+
+        if random.random() < server.error_rate:
+            self._send_json(server.error_status, {'message': 'simulated upstream error'},
+                            headers={'Retry-After': '1'} if server.error_status == 429 else None)
+            return
+
+        if request.get('stream'):
+            self._send_stream(server.token_interval)
+            return
+
+        self._send_json(200, {
+            'id': 'fake-generation',
+            'generations': [{'id': 'fake', 'text': SAMPLE_TEXT}],
+            'meta': {'model': request.get('model')}
+        })
+
+
+class FakeCohereServer(ThreadingHTTPServer):
+    """Threaded stub server with tunable latency and error injection"""
+
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0,
+                 error_rate=0.0, error_status=503, token_interval=0.0, verbose=False):
+        super().__init__((host, port), FakeCohereHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.token_interval = token_interval
+        self.verbose = verbose
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def record_request(self):
+        with self._count_lock:
+            self.request_count += 1
+
+    def start(self):
+        """Serve on a daemon thread and return self"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake Cohere API server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='Base response delay in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Extra random delay of up to this many seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests that fail (0-1)')
+    parser.add_argument('--error-status', type=int, default=503, help='HTTP status used for failures')
+    parser.add_argument('--token-interval', type=float, default=0.0,
+                        help='Delay between streamed words in seconds')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    server = FakeCohereServer(args.host, args.port, args.latency, args.jitter,
+                              args.error_rate, args.error_status, args.token_interval, args.verbose)
+    print(f"Fake Cohere listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,40 @@
 import os
-import requests
 from dotenv import load_dotenv
+from cohere_client import CohereClient, CohereUnavailable
+from rate_limit import ConcurrencyLimiter
+from feedback_cache import make_cache_key
+from rule_feedback import RuleFeedbackEngine
+from topic_catalog import STUDY_GUIDE, default_catalog
 
 load_dotenv()
 
 class FeedbackAgent:
-    def __init__(self):
+    def __init__(self, client=None, fallback_engine=None, cache=None, catalog=None):
         self.api_key = os.getenv('COHERE_API_KEY')
-        self.base_url = "https://api.cohere.ai/v1"
-    
-    def generate_feedback(self, topics, scores):
-        """Generate AI feedback based on topics and scores"""
-        try:
-            # Create prompt for Cohere
-            prompt = f"""
+        self.base_url = os.getenv('COHERE_BASE_URL', "https://api.cohere.ai/v1")
+        self.model = 'command-r-plus'
+        self.client = client or CohereClient(
+            self.api_key,
+            self.base_url,
+            connect_timeout=float(os.getenv('COHERE_CONNECT_TIMEOUT', '3.05')),
+            read_timeout=float(os.getenv('COHERE_READ_TIMEOUT', '30')),
+            max_retries=int(os.getenv('COHERE_MAX_RETRIES', '2')),
+            # Upstream calls in flight per process, across jobs, streams and batches
+            concurrency=ConcurrencyLimiter(
+                int(os.getenv('LLM_MAX_CONCURRENCY', '8')),
+                max_waiting=int(os.getenv('LLM_MAX_WAITING', '16')),
+                timeout=float(os.getenv('LLM_QUEUE_TIMEOUT', '10'))
+            )
+        )
+        # Used whenever Cohere is down or the circuit breaker is open
+        self.fallback_engine = fallback_engine or RuleFeedbackEngine()
+        # Optional FeedbackCache shared by identical assessments
+        self.cache = cache
+        self.catalog = catalog or default_catalog()
+
+    def build_prompt(self, topics, scores):
+        """Create prompt for Cohere"""
+        return f"""
             You are an AI learning assistant. A student has self-assessed their knowledge on the following topics:
             
             Topics and Scores (out of 10):
@@ -27,54 +48,87 @@ class FeedbackAgent:
             
             Keep the feedback concise but helpful.
             """
-            
-            headers = {
-                'Authorization': f'Bearer {self.api_key}',
-                'Content-Type': 'application/json'
-            }
-            
-            data = {
-                'model': 'command-r-plus',
-                'prompt': prompt,
-                'max_tokens': 500,
-                'temperature': 0.7
-            }
-            
-            response = requests.post(f"{self.base_url}/generate", headers=headers, json=data)
-            
-            if response.status_code == 200:
-                result = response.json()
-                feedback = result.get('generations', [{}])[0].get('text', '').strip()
-                
-                # Generate some sample resources
-                resources = self.generate_resources(topics, scores)
-                
-                return {
-                    'feedback': feedback,
-                    'resources': resources
-                }
-            else:
-                return {
-                    'feedback': 'Unable to generate feedback at this time. Please try again.',
-                    'resources': []
-                }
-        
-        except Exception as e:
-            return {
-                'feedback': f'Error generating feedback: {str(e)}',
-                'resources': []
-            }
-    
+
+    def generate_feedback(self, topics, scores):
+        """Generate AI feedback based on topics and scores"""
+        if self.cache is None:
+            return self._generate_uncached(topics, scores)
+
+        # Fallback output is not cached, so the next call retries the AI
+        return self.cache.get_or_compute(
+            make_cache_key(topics, scores, self.model),
+            lambda: self._generate_uncached(topics, scores),
+            should_cache=lambda response: not response.get('fallback')
+        )
+
+    def _generate_uncached(self, topics, scores):
+        """Call Cohere, falling back to rule-based feedback if it is unavailable"""
+        try:
+            feedback = self.client.generate(
+                self.build_prompt(topics, scores),
+                model=self.model,
+                max_tokens=500,
+                temperature=0.7
+            )
+        except CohereUnavailable:
+            return self.fallback_feedback(topics, scores)
+
+        # Generate some sample resources
+        resources = self.generate_resources(topics, scores)
+
+        return {
+            'feedback': feedback,
+            'resources': resources
+        }
+
+    def stream_feedback(self, topics, scores):
+        """Yield ('token', text) as Cohere generates, then ('done', response) with the final feedback"""
+        key = make_cache_key(topics, scores, self.model)
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is not None:
+            yield 'token', cached['feedback']
+            yield 'done', cached
+            return
+
+        # Only the generated text is kept, at most max_tokens worth
+        chunks = []
+        try:
+            for text in self.client.stream_generate(
+                self.build_prompt(topics, scores),
+                model=self.model,
+                max_tokens=500,
+                temperature=0.7
+            ):
+                chunks.append(text)
+                yield 'token', text
+        except CohereUnavailable:
+            # The final response replaces any partial text already sent
+            response = self.fallback_feedback(topics, scores)
+            if not chunks:
+                yield 'token', response['feedback']
+            yield 'done', response
+            return
+
+        response = {
+            'feedback': ''.join(chunks).strip(),
+            'resources': self.generate_resources(topics, scores)
+        }
+        if self.cache is not None:
+            self.cache.set(key, response)
+        yield 'done', response
+
+    def fallback_feedback(self, topics, scores):
+        """Rule-based feedback served while the AI provider is unavailable"""
+        response = self.fallback_engine.generate_feedback(topics, scores)
+        response['fallback'] = True
+        return response
+
     def generate_resources(self, topics, scores):
         """Generate sample learning resources"""
         resources = []
-        
+
         for topic, score in zip(topics, scores):
             if score < 7:  # Suggest resources for topics with lower scores
-                resources.append({
-                    'title': f"Study Guide: {topic}",
-                    'description': f"Comprehensive guide to improve your understanding of {topic}",
-                    'url': f"https://www.example.com/study-guide/{topic.lower().replace(' ', '-')}"
-                })
-        
-        return resources[:3]  # Return max 3 resources
\ No newline at end of file
+                resources.append(self.catalog.resource(topic, STUDY_GUIDE))
+
+        return resources[:3]  # Return max 3 resources
@@ -0,0 +1,198 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from connection_pool import ConnectionPool
+
+# Bump when the prompt or resource rules change so stale entries are not reused
+PROMPT_VERSION = 2
+
+
+def make_cache_key(topics, scores, model, prompt_version=PROMPT_VERSION):
+    """Normalize an assessment into a stable cache key"""
+    # Topic case and surrounding whitespace do not change the feedback we
+    # want to serve, and 70 and 70.0 are the same score
+    normalized = {
+        'topics': [' '.join(str(topic).split()).lower() for topic in topics],
+        'scores': [float(score) for score in scores],
+        'model': model,
+        'prompt_version': prompt_version,
+    }
+    raw = json.dumps(normalized, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class SqliteCacheTier:
+    """Optional persistent cache tier shared by every worker on the host"""
+
+    def __init__(self, db_path, ttl):
+        self.ttl = ttl
+        self.pool = ConnectionPool(db_path, max_size=4)
+        with self.pool.transaction() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS feedback_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+
+    def get(self, key):
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                'SELECT value FROM feedback_cache WHERE cache_key = ? AND expires_at > ?',
+                (key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value):
+        with self.pool.transaction() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO feedback_cache (cache_key, value, expires_at) VALUES (?, ?, ?)',
+                (key, json.dumps(value), time.time() + self.ttl)
+            )
+
+    def purge_expired(self):
+        with self.pool.transaction() as conn:
+            return conn.execute('DELETE FROM feedback_cache WHERE expires_at <= ?', (time.time(),)).rowcount
+
+    def close(self):
+        self.pool.close()
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class FeedbackCache:
+    """In-memory LRU with TTL, an optional SQLite tier and single-flight coalescing"""
+
+    def __init__(self, max_entries=1024, ttl=3600, db_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.persistent = SqliteCacheTier(db_path, ttl) if db_path else None
+
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'persistent_hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'evictions': 0,
+            'expirations': 0,
+        }
+
+    def _get_local(self, key):
+        """Look up the in-memory tier, caller must hold the lock"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self._stats['expirations'] += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set_local(self, key, value):
+        """Store in the in-memory tier, caller must hold the lock"""
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def get_or_compute(self, key, compute, should_cache=None):
+        """Return the cached value for key, or compute it once for all concurrent callers"""
+        with self._lock:
+            value = self._get_local(key)
+            if value is not None:
+                self._stats['hits'] += 1
+                return value
+
+            flight = self._in_flight.get(key)
+            if flight is not None:
+                self._stats['coalesced'] += 1
+                leader = False
+            else:
+                flight = _InFlight()
+                self._in_flight[key] = flight
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value = self.persistent.get(key) if self.persistent else None
+            if value is not None:
+                with self._lock:
+                    self._stats['persistent_hits'] += 1
+                    self._set_local(key, value)
+            else:
+                with self._lock:
+                    self._stats['misses'] += 1
+                value = compute()
+                if should_cache is None or should_cache(value):
+                    with self._lock:
+                        self._set_local(key, value)
+                    if self.persistent:
+                        self.persistent.set(key, value)
+            flight.value = value
+            return value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            flight.done.set()
+
+    def get(self, key):
+        """Return the cached value for key from either tier, or None"""
+        with self._lock:
+            value = self._get_local(key)
+            if value is not None:
+                self._stats['hits'] += 1
+                return value
+
+        value = self.persistent.get(key) if self.persistent else None
+        with self._lock:
+            if value is not None:
+                self._stats['persistent_hits'] += 1
+                self._set_local(key, value)
+            else:
+                self._stats['misses'] += 1
+        return value
+
+    def set(self, key, value):
+        """Store value in both tiers"""
+        with self._lock:
+            self._set_local(key, value)
+        if self.persistent:
+            self.persistent.set(key, value)
+
+    def stats(self):
+        """Return hit, miss and eviction counters plus the current size"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+            stats['in_flight'] = len(self._in_flight)
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def close(self):
+        if self.persistent:
+            self.persistent.close()
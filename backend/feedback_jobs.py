@@ -0,0 +1,89 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class FeedbackJobQueue:
+    """Bounded worker pool that runs slow feedback generation off the request thread"""
+
+    def __init__(self, max_workers=4, max_queue=100):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='feedback-job')
+        # One permit per running or queued job; ThreadPoolExecutor's own
+        # queue is unbounded, so this is what caps queue depth.
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._events = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def reserve(self):
+        """Claim a queue slot without blocking, returning False when the queue is full"""
+        if self._closed:
+            return False
+        return self._slots.acquire(blocking=False)
+
+    def release(self):
+        """Give back a slot claimed with reserve() that will not be submitted"""
+        self._slots.release()
+
+    def submit(self, job_id, fn, *args, on_error=None):
+        """Run fn(*args) on a worker using a previously reserved slot"""
+        done = threading.Event()
+        with self._lock:
+            self._events[job_id] = done
+
+        try:
+            self._executor.submit(self._run, job_id, done, fn, args, on_error)
+        except RuntimeError:
+            # Executor already shut down
+            self._finish(job_id, done)
+            raise
+
+    def _run(self, job_id, done, fn, args, on_error):
+        try:
+            fn(*args)
+        except Exception as e:
+            logger.exception('Feedback job %s failed', job_id)
+            if on_error:
+                try:
+                    on_error(job_id, e)
+                except Exception:
+                    logger.exception('Error handler for feedback job %s failed', job_id)
+        finally:
+            self._finish(job_id, done)
+
+    def _finish(self, job_id, done):
+        with self._lock:
+            self._events.pop(job_id, None)
+        done.set()
+        self._slots.release()
+
+    def is_running(self, job_id):
+        """Return True if the job is queued or running in this process"""
+        with self._lock:
+            return job_id in self._events
+
+    def wait(self, job_id, timeout):
+        """Block until the job finishes or timeout elapses, returning True if it is not running"""
+        with self._lock:
+            done = self._events.get(job_id)
+        if done is None:
+            return True
+        return done.wait(timeout)
+
+    def stats(self):
+        with self._lock:
+            in_flight = len(self._events)
+        return {
+            'in_flight': in_flight,
+            'max_workers': self.max_workers,
+            'max_queue': self.max_queue,
+        }
+
+    def shutdown(self, wait=True):
+        """Stop accepting jobs and optionally wait for queued ones to finish"""
+        self._closed = True
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,102 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from metrics import DB_GROUP_COMMIT_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+SYNCHRONOUS_LEVELS = ('OFF', 'NORMAL', 'FULL')
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """Background thread that applies queued writes from many threads in shared transactions"""
+
+    def __init__(self, pool, write_batch, flush_interval=0.0, max_batch=256, name='writer', timeout=30):
+        # write_batch(conn, items) runs inside an open transaction and returns
+        # one result per item, in order. flush_interval is how long to wait
+        # for more items after the first; with 0 a batch is whatever queued
+        # up while the previous transaction was committing.
+        self.pool = pool
+        self.write_batch = write_batch
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.name = name
+        self.timeout = timeout
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        # Daemon so a forgotten close() cannot hang interpreter exit; close()
+        # is what drains the queue
+        self._thread = threading.Thread(target=self._run, name=f'group-commit-{name}', daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        """Queue item for the next transaction and return a Future for its result"""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(f'Group commit writer {self.name} is closed')
+            self._queue.put((item, future))
+        return future
+
+    def write(self, item):
+        """Queue item and block until its transaction has committed, returning its result"""
+        return self.submit(item).result(timeout=self.timeout)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            entry = self._queue.get()
+            if entry is _STOP:
+                break
+            batch = [entry]
+
+            # Gather whatever else arrives within the interval, up to max_batch
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+
+            self._commit(batch)
+
+    def _commit(self, batch):
+        DB_GROUP_COMMIT_BATCH_SIZE.observe(len(batch), self.name)
+        try:
+            with self.pool.transaction() as conn:
+                results = self.write_batch(conn, [item for item, _ in batch])
+        except Exception as e:
+            if len(batch) > 1:
+                # Retry one at a time so a bad item only fails its own caller
+                logger.warning('Group commit of %d %s writes failed, retrying individually: %s',
+                               len(batch), self.name, e)
+                for entry in batch:
+                    self._commit([entry])
+                return
+            batch[0][1].set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def close(self):
+        """Stop accepting writes, commit everything already queued and stop the thread"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+        self.pool.close()
@@ -0,0 +1,28 @@
+"""
+Gunicorn settings for the backend, overridable through the environment.
+
+WEB_CONCURRENCY sets the number of worker processes (default: one per CPU)
+and GUNICORN_THREADS the request threads in each of them. The app reads
+GUNICORN_THREADS too, to leave a thread free of feedback streams and long-polls.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY') or multiprocessing.cpu_count())
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = 5
+accesslog = '-'
+
+# Workers import the app themselves unless preloading is asked for
+preload_app = os.getenv('GUNICORN_PRELOAD', 'false').lower() in ('1', 'true', 'yes')
+
+
+def on_starting(server):
+    # Apply schema migrations once in the master, before any worker starts.
+    # Workers build their services lazily after fork, so preloading is safe.
+    from app import migrate_databases
+    migrate_databases()
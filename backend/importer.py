@@ -0,0 +1,214 @@
+"""
+Bulk import of submission history.
+
+Reads the CSV and NDJSON layouts that export.py writes, a line at a time, so
+an upload of any size is parsed in constant memory. Valid rows are saved in
+batches through save_submissions, one transaction and one executemany per
+batch, and invalid rows are skipped and reported by line number. Batches
+commit as they go: a failure part way through keeps the batches before it.
+"""
+import csv
+import time
+from datetime import datetime, timezone
+
+from export import CSV_HEADERS, truncate_feedback
+from serialization import loads
+from validation import FEEDBACK_MODES, canonicalize_topics, validate_assessment
+
+IMPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+IMPORT_EXTENSIONS = {
+    '.csv': 'csv',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+}
+
+# Only the first errors are listed in the result, the rest are counted
+MAX_REPORTED_ERRORS = 100
+
+CSV_FIELDS = {
+    'Timestamp': 'timestamp',
+    'Topics': 'topics',
+    'Scores': 'scores',
+    'Feedback Mode': 'feedback_mode',
+    'Feedback': 'feedback',
+}
+
+
+def detect_format(mimetype=None, filename=None):
+    """Return the import format for an upload's content type or file name, or None"""
+    for import_format, format_mimetype in IMPORT_FORMATS.items():
+        if mimetype == format_mimetype:
+            return import_format
+    if filename:
+        for extension, import_format in IMPORT_EXTENSIONS.items():
+            if filename.lower().endswith(extension):
+                return import_format
+    return None
+
+
+def _parse_score(value):
+    value = value.strip()
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            raise ValueError(f'Invalid score: {value!r}')
+
+
+def _parse_timestamp(value):
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'Invalid timestamp: {value!r}')
+    # Exported timestamps are already in the stored format
+    if len(value) == 19 and value[10] == ' ':
+        return value
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc)
+    return parsed.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def parse_submission(fields):
+    """Validate one imported record and return it as a save_submissions item, or raise ValueError"""
+    topics = fields.get('topics')
+    scores = fields.get('scores')
+    # CSV cells hold the export's comma-separated lists
+    if isinstance(topics, str):
+        topics = [topic.strip() for topic in topics.split(',')]
+    if isinstance(scores, str):
+        scores = [_parse_score(score) for score in scores.split(',')]
+
+    error = validate_assessment(topics, scores)
+    if error:
+        raise ValueError(error)
+
+    # Rows without a mode get rule feedback rather than none
+    feedback_mode = fields.get('feedback_mode') or 'rule'
+    if feedback_mode not in FEEDBACK_MODES:
+        raise ValueError('feedback_mode must be ai or rule')
+
+    feedback = fields.get('feedback') or ''
+    resources = fields.get('resources') or None
+    if not isinstance(feedback, str) or not isinstance(resources, (list, type(None))):
+        raise ValueError('feedback must be text and resources a list')
+
+    return {
+        'topics': topics,
+        'scores': scores,
+        'timestamp': _parse_timestamp(fields.get('timestamp')),
+        'feedback_mode': feedback_mode,
+        'feedback': feedback,
+        'resources': resources,
+    }
+
+
+def csv_rows(lines):
+    """Yield (line_number, submission, error) for each row of an export_csv file"""
+    reader = csv.reader(lines)
+    header = next(reader, None) or []
+    columns = {CSV_FIELDS[name]: index for index, name in enumerate(header) if name in CSV_FIELDS}
+    if 'topics' not in columns or 'scores' not in columns:
+        raise ValueError(f'CSV header must include Topics and Scores, as in: {", ".join(CSV_HEADERS)}')
+
+    for row in reader:
+        if not row:
+            continue
+        try:
+            yield reader.line_num, parse_submission({
+                field: row[index] for field, index in columns.items() if index < len(row)
+            }), None
+        except ValueError as e:
+            yield reader.line_num, None, str(e)
+
+
+def ndjson_rows(lines):
+    """Yield (line_number, submission, error) for each line of an export_ndjson file"""
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = loads(line)
+            if not isinstance(record, dict):
+                raise ValueError('Each line must be a JSON object')
+            yield line_number, parse_submission(record), None
+        except ValueError as e:
+            yield line_number, None, str(e)
+
+
+IMPORT_READERS = {
+    'csv': csv_rows,
+    'ndjson': ndjson_rows,
+}
+
+
+def regenerate_rule_feedback(batch, rule_engine):
+    """Fill in rule feedback missing from imported rows, returning how many were filled"""
+    # The CSV export truncates feedback, so a truncated rule row is
+    # replaced with the full text when that text truncates to the same
+    missing = [
+        item for item in batch
+        if item['feedback_mode'] == 'rule' and (not item['feedback'] or item['feedback'].endswith('...'))
+    ]
+
+    # Rows sharing a topic list are scored as one vectorized matrix
+    groups = {}
+    for item in missing:
+        groups.setdefault(tuple(item['topics']), []).append(item)
+
+    regenerated = 0
+    for topics, items in groups.items():
+        generated = rule_engine.generate_feedback_batch(list(topics), [item['scores'] for item in items])
+        for item, feedback_response in zip(items, generated):
+            feedback = feedback_response.get('feedback', '')
+            if item['feedback'] and truncate_feedback(feedback) != item['feedback']:
+                continue
+            item['feedback'] = feedback
+            item['resources'] = item['resources'] or feedback_response.get('resources', [])
+            regenerated += 1
+    return regenerated
+
+
+def import_submissions(db, rows, user_id, rule_engine, batch_size=5000, on_progress=None, catalog=None):
+    """Save parsed (line_number, submission, error) rows for user_id in batches and return the totals
+
+    With a TopicCatalog, topics are stored under their canonical names.
+    """
+    result = {'imported': 0, 'skipped': 0, 'regenerated': 0, 'batches': 0, 'errors': []}
+    started = time.perf_counter()
+
+    def save(batch):
+        result['regenerated'] += regenerate_rule_feedback(batch, rule_engine)
+        db.save_submissions(batch, user_id=user_id)
+        result['imported'] += len(batch)
+        result['batches'] += 1
+        result['seconds'] = round(time.perf_counter() - started, 2)
+        if on_progress:
+            on_progress(result)
+
+    batch = []
+    for line_number, submission, error in rows:
+        if error is None and catalog is not None:
+            submission['topics'], error = canonicalize_topics(submission['topics'], catalog)
+        if error:
+            result['skipped'] += 1
+            if len(result['errors']) < MAX_REPORTED_ERRORS:
+                result['errors'].append({'line': line_number, 'error': error})
+            continue
+
+        batch.append(submission)
+        if len(batch) >= batch_size:
+            save(batch)
+            batch = []
+    if batch:
+        save(batch)
+
+    result['seconds'] = round(time.perf_counter() - started, 2)
+    return result
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Maintenance commands for the backend databases.
+
+Database paths, the shard count and the topic catalog default to the same
+DATA_DIR, HISTORY_DB_PATH, USERS_DB_PATH, HISTORY_SHARDS and
+TOPIC_CATALOG_PATH environment variables the server uses.
+
+Usage:
+    python manage.py [--history-db PATH] [--users-db PATH] [--history-shards N] migrate
+    python manage.py [--history-db PATH] [--history-shards N] backfill-rollups
+    python manage.py [--history-db PATH] [--history-shards N] backfill-sketches
+    python manage.py [--history-db PATH] [--history-shards N] canonicalize-topics
+    python manage.py [--history-db PATH] reshard --shards N
+    python manage.py [--history-db PATH] [--users-db PATH] import-history --username NAME FILE
+    python manage.py [--users-db PATH] purge-sessions
+"""
+
+import argparse
+import os
+import sys
+import time
+from auth import SimpleAuth
+from database import DatabaseManager
+from importer import IMPORT_FORMATS, IMPORT_READERS, detect_format, import_submissions
+from migrations import get_schema_version
+from sharding import ShardedDatabaseManager, reshard, shard_paths
+from topic_catalog import default_catalog
+
+
+def default_db_path(variable, filename):
+    return os.getenv(variable, os.path.join(os.getenv('DATA_DIR', '.'), filename))
+
+
+def open_history(args):
+    if args.history_shards > 1:
+        return ShardedDatabaseManager(args.history_db, args.history_shards)
+    return DatabaseManager(args.history_db)
+
+
+def migrate(args):
+    databases = [
+        (path, lambda path, index=index: DatabaseManager(path, shard=(index, args.history_shards)))
+        for index, path in enumerate(shard_paths(args.history_db, args.history_shards))
+    ]
+    databases.append((args.users_db, SimpleAuth))
+    for path, open_database in databases:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        database = open_database(path)
+        with database.pool.connection() as conn:
+            version = get_schema_version(conn)
+        database.close()
+        print(f"{path}: schema version {version}")
+
+
+def backfill_rollups(args):
+    db = open_history(args)
+    started = time.perf_counter()
+    processed = db.backfill_rollups()
+    elapsed = time.perf_counter() - started
+    print(f"Rebuilt progress rollups from {processed} submissions in {elapsed:.2f}s")
+    db.close()
+
+
+def backfill_sketches(args):
+    db = open_history(args)
+    started = time.perf_counter()
+    processed = db.backfill_sketches()
+    elapsed = time.perf_counter() - started
+    print(f"Rebuilt topic sketches from {processed} scores in {elapsed:.2f}s")
+    db.close()
+
+
+def canonicalize_topics(args):
+    db = open_history(args)
+    started = time.perf_counter()
+    merged = db.canonicalize_topics(default_catalog().canonical)
+    elapsed = time.perf_counter() - started
+    print(f"Merged {merged} topic spellings into their canonical names in {elapsed:.2f}s")
+    db.close()
+
+
+def reshard_history(args):
+    os.makedirs(os.path.dirname(args.history_db) or '.', exist_ok=True)
+    started = time.perf_counter()
+    stats = reshard(args.history_db, args.shards)
+    elapsed = time.perf_counter() - started
+    print(f"Resharded {stats['old_shards']} -> {stats['new_shards']} shards: moved {stats['users_moved']} users "
+          f"and {stats['submissions_moved']} submissions ({stats['submissions_renumbered']} renumbered) "
+          f"in {elapsed:.2f}s")
+    print(f"Set HISTORY_SHARDS={args.shards} before starting the servers")
+
+
+def import_history(args):
+    import_format = args.format or detect_format(filename=args.file)
+    if import_format is None:
+        sys.exit(f"Cannot tell the format of {args.file}, pass --format {' or '.join(IMPORT_FORMATS)}")
+
+    auth = SimpleAuth(args.users_db)
+    user_id = auth.get_user_id(args.username)
+    auth.close()
+    if user_id is None:
+        sys.exit(f"No user named {args.username}")
+
+    from rule_feedback import RuleFeedbackEngine
+
+    def report(result):
+        rate = result['imported'] / result['seconds'] if result['seconds'] else 0
+        print(f"{result['imported']} imported, {result['skipped']} skipped ({rate:,.0f} rows/s)")
+
+    db = open_history(args)
+    try:
+        with open(args.file, encoding='utf-8-sig', newline='') as lines:
+            result = import_submissions(db, IMPORT_READERS[import_format](lines), user_id, RuleFeedbackEngine(),
+                                        batch_size=args.batch_size, on_progress=report,
+                                        catalog=default_catalog())
+    finally:
+        db.close()
+
+    for error in result['errors']:
+        print(f"line {error['line']}: {error['error']}")
+    print(f"Imported {result['imported']} submissions for {args.username} in {result['seconds']:.2f}s: "
+          f"{result['skipped']} rows skipped, {result['regenerated']} rule feedbacks regenerated")
+
+
+def purge_sessions(args):
+    auth = SimpleAuth(args.users_db)
+    started = time.perf_counter()
+    removed = auth.purge_expired_sessions()
+    elapsed = time.perf_counter() - started
+    print(f"Removed {removed} expired sessions and the expired revoked tokens in {elapsed:.2f}s")
+    auth.close()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='AI Learning Platform maintenance commands')
+    parser.add_argument('--history-db', default=default_db_path('HISTORY_DB_PATH', 'history.db'),
+                        help='Path to the submissions database')
+    parser.add_argument('--users-db', default=default_db_path('USERS_DB_PATH', 'users.db'),
+                        help='Path to the users database')
+    parser.add_argument('--history-shards', type=int, default=int(os.getenv('HISTORY_SHARDS', '1')),
+                        help='Number of submission database shards')
+
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    migrate_parser = subparsers.add_parser('migrate', help='Apply pending schema migrations to both databases')
+    migrate_parser.set_defaults(func=migrate)
+
+    backfill = subparsers.add_parser('backfill-rollups', help='Rebuild progress rollups from existing submissions')
+    backfill.set_defaults(func=backfill_rollups)
+
+    sketches = subparsers.add_parser('backfill-sketches', help='Rebuild per-topic cohort histograms from existing scores')
+    sketches.set_defaults(func=backfill_sketches)
+
+    canonicalize = subparsers.add_parser('canonicalize-topics',
+                                         help='Merge stored topic spellings into their canonical catalog names')
+    canonicalize.set_defaults(func=canonicalize_topics)
+
+    resharding = subparsers.add_parser('reshard', help='Move users between submission shards; stop the servers first')
+    resharding.add_argument('--shards', type=int, required=True, help='New number of shards')
+    resharding.set_defaults(func=reshard_history)
+
+    importing = subparsers.add_parser('import-history', help='Import a CSV or NDJSON history export for a user')
+    importing.add_argument('file', help='CSV or NDJSON file in the /export layout')
+    importing.add_argument('--username', required=True, help='User the submissions are imported for')
+    importing.add_argument('--format', choices=sorted(IMPORT_FORMATS), help='Defaults to the file extension')
+    importing.add_argument('--batch-size', type=int, default=int(os.getenv('IMPORT_BATCH_SIZE', '5000')),
+                           help='Submissions saved per transaction')
+    importing.set_defaults(func=import_history)
+
+    purging = subparsers.add_parser('purge-sessions',
+                                    help='Delete expired sessions and revoked tokens, e.g. from cron')
+    purging.set_defaults(func=purge_sessions)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
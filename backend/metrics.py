@@ -0,0 +1,260 @@
+"""
+In-process metrics exposed in the Prometheus text format.
+
+Counters, gauges and histograms keep their values in plain dicts keyed by
+label values behind a lock, so recording a sample costs a dict lookup and
+a few additions. Each process keeps its own registry; under gunicorn every
+worker reports only the requests it served.
+"""
+import functools
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Database operations slower than this are logged
+SLOW_QUERY_SECONDS = float(os.getenv('SLOW_QUERY_MS', '100')) / 1000
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    """Ordered set of metrics plus callbacks that report values at scrape time"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        """Add a callable returning (name, type, help, [(labels dict, value)]) tuples"""
+        with self._lock:
+            self._collectors.append(collector)
+        return collector
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collector in collectors:
+            try:
+                families = collector()
+            except Exception:
+                logger.exception('Metrics collector failed')
+                continue
+            for name, metric_type, help_text, samples in families:
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {metric_type}')
+                for labels, value in samples:
+                    lines.append(f'{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    metric_type = None
+
+    def __init__(self, name, help_text, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _header(self):
+        return [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.metric_type}']
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+        lines = self._header()
+        for labels, value in sorted(values.items()):
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}')
+        return lines
+
+
+class Counter(_Metric):
+    metric_type = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    metric_type = 'gauge'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    metric_type = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help_text, labelnames, registry)
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # Per-bucket counts (last one is +Inf), then sum and count
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def time(self, *labels):
+        """Context manager that observes the duration of its block"""
+        return _Timer(self, labels)
+
+    def render(self):
+        with self._lock:
+            values = {labels: (list(state[0]), state[1], state[2]) for labels, state in self._values.items()}
+        lines = self._header()
+        bounds = self.buckets + (float('inf'),)
+        for labels, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels(self.labelnames, labels, f'le="{_format_value(bound)}"')
+                lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{label_text} {_format_value(total)}')
+            lines.append(f'{self.name}_count{label_text} {count}')
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.perf_counter() - self.started
+        self.histogram.observe(self.elapsed, *self.labels)
+        return False
+
+
+# --- HTTP ---
+
+HTTP_REQUESTS = Counter('http_requests_total', 'HTTP requests by route, method and status',
+                        ('route', 'method', 'status'))
+HTTP_REQUEST_DURATION = Histogram('http_request_duration_seconds', 'Time spent in the request handler',
+                                  ('route', 'method'))
+HTTP_IN_FLIGHT = Gauge('http_requests_in_flight', 'Requests currently being handled')
+RATE_LIMITED_REQUESTS = Counter('rate_limited_requests_total', 'Requests refused with 429, by route and exhausted bucket',
+                                ('route', 'scope'))
+
+# --- SQLite ---
+
+DB_OPERATION_DURATION = Histogram('db_operation_duration_seconds', 'Duration of database operations',
+                                  ('database', 'operation'))
+DB_SLOW_OPERATIONS = Counter('db_slow_operations_total', 'Database operations slower than SLOW_QUERY_MS',
+                             ('database', 'operation'))
+DB_OPERATION_ERRORS = Counter('db_operation_errors_total', 'Database operations that raised',
+                              ('database', 'operation'))
+DB_GROUP_COMMIT_BATCH_SIZE = Histogram('db_group_commit_batch_size', 'Writes committed per group-commit transaction',
+                                       ('database',), buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512))
+
+# --- Upstream LLM ---
+
+LLM_REQUEST_DURATION = Histogram('llm_request_duration_seconds', 'Duration of one HTTP attempt to the LLM provider',
+                                 ('provider',))
+LLM_ATTEMPTS = Counter('llm_attempts_total', 'HTTP attempts to the LLM provider by result',
+                       ('provider', 'result'))
+LLM_GENERATIONS = Counter('llm_generations_total', 'Generate calls by outcome, after retries',
+                          ('provider', 'outcome'))
+LLM_GENERATION_DURATION = Histogram('llm_generation_duration_seconds', 'Duration of generate calls including retries',
+                                    ('provider',))
+LLM_TIME_TO_FIRST_TOKEN = Histogram('llm_time_to_first_token_seconds', 'Time until a streamed generation yields text',
+                                    ('provider',))
+
+# --- Feedback engines ---
+
+RULE_FEEDBACK_DURATION = Histogram('rule_feedback_duration_seconds', 'Rule-based feedback rendering time',
+                                   ('mode',))
+
+
+def timed(histogram, *labels):
+    """Decorator observing each call's duration in histogram"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started, *labels)
+        return wrapper
+    return decorator
+
+
+def timed_operation(database):
+    """Decorator recording a method's duration, errors and slow calls under database/operation"""
+    def decorator(method):
+        operation = method.__name__
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            except Exception:
+                DB_OPERATION_ERRORS.inc(database, operation)
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                DB_OPERATION_DURATION.observe(elapsed, database, operation)
+                if elapsed >= SLOW_QUERY_SECONDS:
+                    DB_SLOW_OPERATIONS.inc(database, operation)
+                    logger.warning('Slow %s operation %s took %.1fms', database, operation, elapsed * 1000)
+        return wrapper
+    return decorator
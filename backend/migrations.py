@@ -0,0 +1,373 @@
+"""
+Versioned schema migrations tracked with SQLite's PRAGMA user_version.
+
+Each database has an ordered list of migration functions. Migration N moves
+the schema from version N-1 to N and is applied at most once per file.
+Never edit or reorder a migration that has shipped, append a new one instead.
+"""
+import json
+from analytics import rebuild_sketches
+from rollups import apply_rollups, rebuild_rollups, rollup_rows
+from topic_catalog import fold_topic
+
+
+def get_schema_version(conn):
+    """Return the schema version recorded in the database file"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def run_migrations(conn, migrations):
+    """Apply every pending migration in order and return the final version"""
+    target = len(migrations)
+    version = get_schema_version(conn)
+
+    while version < target:
+        # BEGIN IMMEDIATE takes the write lock up front, so two processes
+        # starting at the same time cannot both apply the same step.
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            version = get_schema_version(conn)
+            if version >= target:
+                conn.rollback()
+                break
+            migrations[version](conn)
+            conn.execute(f'PRAGMA user_version = {version + 1}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        version += 1
+
+    return version
+
+
+def require_current_schema(conn, migrations):
+    """Raise RuntimeError if the database still has migrations to apply"""
+    version = get_schema_version(conn)
+    if version < len(migrations):
+        raise RuntimeError(
+            f'Database schema is at version {version} but {len(migrations)} is required, '
+            'run "python manage.py migrate" first'
+        )
+    return version
+
+
+# --- history.db ---
+
+def _history_create_submissions(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS submissions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            topics TEXT NOT NULL,
+            scores TEXT NOT NULL,
+            feedback TEXT NOT NULL,
+            resources TEXT,
+            summary_score REAL,
+            feedback_mode TEXT DEFAULT 'ai'
+        )
+    ''')
+
+    # Databases created before migrations existed may lack these columns
+    columns = [column[1] for column in conn.execute('PRAGMA table_info(submissions)')]
+
+    if 'user_id' not in columns:
+        conn.execute('ALTER TABLE submissions ADD COLUMN user_id INTEGER')
+
+    if 'feedback_mode' not in columns:
+        conn.execute("ALTER TABLE submissions ADD COLUMN feedback_mode TEXT DEFAULT 'ai'")
+
+
+def _history_index_user_timestamp(conn):
+    # Serves every "WHERE user_id = ? ORDER BY timestamp" query from the index
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_submissions_user_timestamp
+        ON submissions (user_id, timestamp)
+    ''')
+
+
+def _history_index_user_id(conn):
+    # Index entries are ordered by (user_id, rowid), which serves the
+    # since_id delta query "WHERE user_id = ? AND id > ? ORDER BY id"
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_submissions_user_id
+        ON submissions (user_id)
+    ''')
+
+
+def _history_create_progress_rollups(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS progress_rollups (
+            user_id INTEGER NOT NULL,
+            bucket TEXT NOT NULL,
+            topic TEXT NOT NULL,
+            bucket_start TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            score_sum REAL NOT NULL,
+            score_min REAL NOT NULL,
+            score_max REAL NOT NULL,
+            last_score REAL NOT NULL,
+            last_timestamp TEXT NOT NULL,
+            last_submission_id INTEGER NOT NULL,
+            PRIMARY KEY (user_id, bucket, topic, bucket_start)
+        ) WITHOUT ROWID
+    ''')
+
+    # Backfill from the submissions that already exist
+    _rebuild_rollups_from_json(conn)
+
+
+def _rebuild_rollups_from_json(conn, chunk_size=5000):
+    # rebuild_rollups as migration 4 shipped it, reading the JSON topics and
+    # scores columns. The current one reads submission_scores, which does
+    # not exist until migration 6, and migrations must keep working on the
+    # schema they were written for.
+    conn.execute('DELETE FROM progress_rollups')
+    last_id = 0
+    while True:
+        rows = conn.execute('''
+            SELECT id, user_id, timestamp, topics, scores, summary_score
+            FROM submissions
+            WHERE id > ?
+            ORDER BY id
+            LIMIT ?
+        ''', (last_id, chunk_size)).fetchall()
+        if not rows:
+            break
+
+        upserts = []
+        for submission_id, user_id, timestamp, topics, scores, summary_score in rows:
+            upserts.extend(rollup_rows(
+                user_id, submission_id, timestamp, json.loads(topics), json.loads(scores), summary_score
+            ))
+        apply_rollups(conn, upserts)
+        last_id = rows[-1][0]
+
+
+def _history_add_submission_status(conn):
+    # 'pending' while AI feedback is generated in the background, then
+    # 'complete' or 'failed'. Existing rows already have their feedback.
+    conn.execute("ALTER TABLE submissions ADD COLUMN status TEXT NOT NULL DEFAULT 'complete'")
+
+
+def _history_normalize_scores(conn, chunk_size=5000):
+    # Move the JSON encoded topics and scores columns into an interned
+    # topics table plus one submission_scores row per topic
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS topics (
+            id INTEGER PRIMARY KEY,
+            name TEXT UNIQUE NOT NULL
+        )
+    ''')
+    # NUMERIC affinity keeps integer scores as integers, like the JSON did
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS submission_scores (
+            submission_id INTEGER NOT NULL REFERENCES submissions (id),
+            position INTEGER NOT NULL,
+            topic_id INTEGER NOT NULL REFERENCES topics (id),
+            score NUMERIC NOT NULL,
+            PRIMARY KEY (submission_id, position)
+        ) WITHOUT ROWID
+    ''')
+    # Per-topic filters and aggregates start from the topic
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_submission_scores_topic
+        ON submission_scores (topic_id, score)
+    ''')
+
+    last_id = 0
+    while True:
+        rows = conn.execute('''
+            SELECT id, topics, scores FROM submissions
+            WHERE id > ?
+            ORDER BY id
+            LIMIT ?
+        ''', (last_id, chunk_size)).fetchall()
+        if not rows:
+            break
+        # Rows saved before topics were validated may hold numbers or null,
+        # which the TEXT name column would intern under their string form
+        _save_scores_by_name(conn, [
+            (submission_id, [str(topic) for topic in json.loads(topics)], json.loads(scores))
+            for submission_id, topics, scores in rows
+        ])
+        last_id = rows[-1][0]
+
+    conn.execute('ALTER TABLE submissions DROP COLUMN topics')
+    conn.execute('ALTER TABLE submissions DROP COLUMN scores')
+
+    # Backfill the rollups from the normalized scores
+    rebuild_rollups(conn)
+
+
+def _save_scores_by_name(conn, entries, chunk_size=500):
+    # save_scores as migration 6 shipped it, interning topics by exact name.
+    # The current one also fills topics.fold_key, added by migration 10.
+    names = list(dict.fromkeys(topic for _, topics, _ in entries for topic in topics))
+    conn.executemany('INSERT OR IGNORE INTO topics (name) VALUES (?)', [(name,) for name in names])
+
+    topic_ids = {}
+    for start in range(0, len(names), chunk_size):
+        chunk = names[start:start + chunk_size]
+        placeholders = ', '.join('?' * len(chunk))
+        topic_ids.update(conn.execute(
+            f'SELECT name, id FROM topics WHERE name IN ({placeholders})', chunk
+        ).fetchall())
+
+    conn.executemany('''
+        INSERT INTO submission_scores (submission_id, position, topic_id, score)
+        VALUES (?, ?, ?, ?)
+    ''', [
+        (submission_id, position, topic_ids[topic], score)
+        for submission_id, topics, scores in entries
+        for position, (topic, score) in enumerate(zip(topics, scores))
+    ])
+
+
+def _history_create_topic_sketches(conn):
+    # Cohort histogram per topic, one row per non-empty score bin
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS topic_sketch_bins (
+            topic_id INTEGER NOT NULL REFERENCES topics (id),
+            bin INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            score_sum REAL NOT NULL,
+            PRIMARY KEY (topic_id, bin)
+        ) WITHOUT ROWID
+    ''')
+
+    rebuild_sketches(conn)
+
+
+def _history_create_user_versions(conn):
+    # Bumped whenever a user's submissions change, so conditional GETs can
+    # be answered from one primary key lookup
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS user_versions (
+            user_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    ''')
+    conn.execute('''
+        INSERT OR IGNORE INTO user_versions (user_id, version, updated_at)
+        SELECT user_id, COUNT(*), MAX(timestamp)
+        FROM submissions
+        WHERE user_id IS NOT NULL
+        GROUP BY user_id
+    ''')
+
+
+def _history_create_shard_layout(conn):
+    # Which shard of how many this file is, so a server configured with a
+    # different shard count refuses to start instead of misrouting users.
+    # A file that already holds submissions is the single unsharded shard;
+    # an empty one is claimed by whichever layout opens it first.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS shard_layout (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            shard_index INTEGER NOT NULL,
+            shard_count INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('''
+        INSERT OR IGNORE INTO shard_layout (id, shard_index, shard_count)
+        SELECT 0, 0, 1 WHERE EXISTS (SELECT 1 FROM submissions)
+    ''')
+
+
+def _history_add_topic_fold_keys(conn):
+    # Look topics up by their fold_topic() key, so spellings that differ only
+    # in case or separators share one row. Topics already stored under
+    # several spellings are merged into the first one stored.
+    conn.execute('ALTER TABLE topics ADD COLUMN fold_key TEXT')
+
+    # Keys come from the live fold_topic() so they match what intern_topics looks up
+    first_ids = {}
+    merged = []
+    for topic_id, name in conn.execute('SELECT id, name FROM topics ORDER BY id').fetchall():
+        key = fold_topic(name)
+        if key in first_ids:
+            merged.append((first_ids[key], topic_id))
+        else:
+            first_ids[key] = topic_id
+
+    conn.executemany('UPDATE topics SET fold_key = ? WHERE id = ?', first_ids.items())
+    conn.executemany('UPDATE submission_scores SET topic_id = ? WHERE topic_id = ?', merged)
+    conn.executemany('DELETE FROM topic_sketch_bins WHERE topic_id = ?', [(topic_id,) for _, topic_id in merged])
+    conn.executemany('DELETE FROM topics WHERE id = ?', [(topic_id,) for _, topic_id in merged])
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_topics_fold_key ON topics (fold_key)')
+
+    if merged:
+        # Histograms and rollups are keyed by topic, and cached responses go stale
+        rebuild_sketches(conn)
+        rebuild_rollups(conn)
+        conn.execute('UPDATE user_versions SET version = version + 1')
+
+
+HISTORY_MIGRATIONS = [
+    _history_create_submissions,
+    _history_index_user_timestamp,
+    _history_index_user_id,
+    _history_create_progress_rollups,
+    _history_add_submission_status,
+    _history_normalize_scores,
+    _history_create_topic_sketches,
+    _history_create_user_versions,
+    _history_create_shard_layout,
+    _history_add_topic_fold_keys,
+]
+
+
+# --- users.db ---
+
+def _users_create_tables(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            session_token TEXT UNIQUE NOT NULL,
+            expires_at DATETIME NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+
+def _users_index_session_expiry(conn):
+    # Lets the expired-session sweeper find stale rows without a full scan
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sessions_expires_at
+        ON sessions (expires_at)
+    ''')
+
+
+def _users_create_revoked_tokens(conn):
+    # Deny-list for signed session tokens revoked before they expire
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS revoked_tokens (
+            token_id TEXT PRIMARY KEY,
+            expires_at DATETIME NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires_at
+        ON revoked_tokens (expires_at)
+    ''')
+
+
+USERS_MIGRATIONS = [
+    _users_create_tables,
+    _users_index_session_expiry,
+    _users_create_revoked_tokens,
+]
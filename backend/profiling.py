@@ -0,0 +1,75 @@
+"""
+Per-request sampling profiler.
+
+While active, a background thread records the stack of the request thread
+every interval seconds. Stacks are written in the collapsed format used by
+flamegraph.pl and speedscope ("outer;inner;leaf count" per line).
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f'{os.path.basename(code.co_filename)}:{code.co_name}'
+
+
+class SamplingProfiler:
+    """Samples one thread's stack until stopped"""
+
+    def __init__(self, thread_id=None, interval=0.005, max_depth=64):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop sampling and return the collected stack counts"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.samples
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            self.samples[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return '\n'.join(f'{stack} {count}' for stack, count in self.samples.most_common())
+
+
+def save_profile(profiler, directory, name):
+    """Write collapsed stacks under directory, or log the hottest ones if it is unset"""
+    if not profiler.samples:
+        return None
+    if not directory:
+        for stack, count in profiler.samples.most_common(5):
+            logger.info('profile %s: %d samples in %s', name, count, stack)
+        return None
+
+    os.makedirs(directory, exist_ok=True)
+    safe_name = ''.join(character if character.isalnum() else '_' for character in name).strip('_')
+    path = os.path.join(directory, f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-{safe_name}.folded')
+    with open(path, 'w') as profile_file:
+        profile_file.write(profiler.collapsed() + '\n')
+    return path
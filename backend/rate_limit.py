@@ -0,0 +1,182 @@
+"""
+Token-bucket rate limiting and admission control.
+
+A bucket holds up to `burst` tokens and refills at `rate` tokens per second.
+Each request takes one token, and a request that finds the bucket empty is
+refused with the time until the next token. Buckets live in a store:
+MemoryBucketStore keeps them in this process, SqliteBucketStore in a file
+shared by every worker on the host, so a limit holds however many processes
+serve requests.
+
+ConcurrencyLimiter caps calls in flight, such as upstream LLM requests, and
+turns callers away at once when too many are already waiting.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from connection_pool import ConnectionPool
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600}
+
+# Refill, then take a token if a whole one is there. SET expressions all
+# see the old row, so one statement reads and updates the bucket atomically
+# even with several processes sharing the file.
+TAKE_TOKEN_SQL = '''
+    INSERT INTO rate_limit_buckets (bucket_key, tokens, updated_at, allowed)
+    VALUES (:key, :burst - 1, :now, 1)
+    ON CONFLICT (bucket_key) DO UPDATE SET
+        allowed = MIN(:burst, tokens + MAX(:now - updated_at, 0) * :rate) >= 1,
+        tokens = MIN(:burst, tokens + MAX(:now - updated_at, 0) * :rate)
+                 - (MIN(:burst, tokens + MAX(:now - updated_at, 0) * :rate) >= 1),
+        updated_at = :now
+    RETURNING allowed, tokens
+'''
+
+
+def parse_limit(value):
+    """Parse a limit such as '30/m' into (tokens per second, burst), or None when it is empty or 'off'"""
+    value = (value or '').strip().lower()
+    if value in ('', 'off', 'none', '0'):
+        return None
+    try:
+        count, period = value.split('/')
+        count = int(count)
+        seconds = PERIODS[period.strip()[:1]]
+    except (KeyError, ValueError):
+        raise ValueError(f"Invalid rate limit {value!r}, expected a count per s, m or h such as '30/m'")
+    if count <= 0:
+        return None
+    return count / seconds, count
+
+
+def parse_route_limits(value):
+    """Parse 'endpoint=30/m,other=5/s' into {endpoint: (rate, burst)}"""
+    limits = {}
+    for item in (value or '').split(','):
+        if not item.strip():
+            continue
+        endpoint, _, limit = item.partition('=')
+        limits[endpoint.strip()] = parse_limit(limit)
+    return limits
+
+
+def take_token(tokens, updated, now, rate, burst):
+    """Refill a bucket up to now and take a token, returning (allowed, tokens left, retry_after)"""
+    tokens = min(burst, tokens + max(now - updated, 0) * rate)
+    if tokens >= 1:
+        return True, tokens - 1, 0.0
+    return False, tokens, (1 - tokens) / rate
+
+
+class MemoryBucketStore:
+    """Buckets for this process only; the least recently used are forgotten past max_buckets"""
+
+    def __init__(self, max_buckets=100000):
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        """Take a token from the bucket at key, returning (allowed, retry_after seconds)"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            allowed, tokens, retry_after = take_token(tokens, updated, now, rate, burst)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_buckets:
+                # A forgotten bucket comes back full, which only ever errs towards allowing
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+    def close(self):
+        pass
+
+
+class SqliteBucketStore:
+    """Buckets in a SQLite file shared by every worker on the host"""
+
+    def __init__(self, db_path):
+        self.pool = ConnectionPool(db_path, max_size=4)
+        with self.pool.transaction() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                    bucket_key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    allowed INTEGER NOT NULL
+                ) WITHOUT ROWID
+            ''')
+
+    def take(self, key, rate, burst):
+        """Take a token from the bucket at key, returning (allowed, retry_after seconds)"""
+        with self.pool.transaction() as conn:
+            allowed, tokens = conn.execute(
+                TAKE_TOKEN_SQL, {'key': key, 'rate': rate, 'burst': burst, 'now': time.time()}
+            ).fetchone()
+        return bool(allowed), 0.0 if allowed else (1 - tokens) / rate
+
+    def close(self):
+        self.pool.close()
+
+
+class RateLimiter:
+    """Per-user token buckets: one across all routes, plus one for each route given a limit"""
+
+    def __init__(self, store, user_limit=None, route_limits=None):
+        # Limits are (rate, burst) pairs as returned by parse_limit
+        self.store = store
+        self.user_limit = user_limit
+        self.route_limits = route_limits or {}
+
+    def check(self, user_id, route):
+        """Take the tokens for one request, returning ('route' or 'user', retry_after) if refused, else None"""
+        # The narrower route bucket goes first, so a refused request does
+        # not also use up the user's overall allowance
+        buckets = []
+        if self.route_limits.get(route):
+            buckets.append(('route', f'{user_id}:{route}', self.route_limits[route]))
+        if self.user_limit:
+            buckets.append(('user', str(user_id), self.user_limit))
+
+        for scope, key, (rate, burst) in buckets:
+            allowed, retry_after = self.store.take(key, rate, burst)
+            if not allowed:
+                return scope, retry_after
+        return None
+
+    def close(self):
+        self.store.close()
+
+
+class ConcurrencyLimiter:
+    """Caps concurrent calls; a caller is turned away when max_waiting others wait or after timeout"""
+
+    def __init__(self, max_concurrent, max_waiting=0, timeout=None):
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._waiting = 0
+
+    def acquire(self):
+        """Take a slot, returning False instead of queueing behind too many callers"""
+        if self._slots.acquire(blocking=False):
+            return True
+        with self._lock:
+            if self._waiting >= self.max_waiting:
+                return False
+            self._waiting += 1
+        try:
+            return self._slots.acquire(timeout=self.timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def release(self):
+        self._slots.release()
+
+    @property
+    def waiting(self):
+        return self._waiting
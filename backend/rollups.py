@@ -0,0 +1,140 @@
+"""
+Per-user, per-topic progress rollups.
+
+Every submission adds its scores to one row per (topic, bucket) in the
+progress_rollups table, so progress charts read O(buckets) rows instead of
+decoding every submission. The overall summary score is rolled up under the
+reserved OVERALL_TOPIC name.
+"""
+from datetime import date, timedelta
+from functools import lru_cache
+from submission_scores import load_scores
+
+BUCKETS = ('day', 'week')
+OVERALL_TOPIC = '__overall__'
+
+UPSERT_ROLLUP_SQL = '''
+    INSERT INTO progress_rollups (
+        user_id, bucket, topic, bucket_start, count, score_sum, score_min, score_max,
+        last_score, last_timestamp, last_submission_id
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (user_id, bucket, topic, bucket_start) DO UPDATE SET
+        count = count + excluded.count,
+        score_sum = score_sum + excluded.score_sum,
+        score_min = MIN(score_min, excluded.score_min),
+        score_max = MAX(score_max, excluded.score_max),
+        last_score = CASE
+            WHEN (excluded.last_timestamp, excluded.last_submission_id) > (last_timestamp, last_submission_id)
+            THEN excluded.last_score ELSE last_score END,
+        last_submission_id = CASE
+            WHEN (excluded.last_timestamp, excluded.last_submission_id) > (last_timestamp, last_submission_id)
+            THEN excluded.last_submission_id ELSE last_submission_id END,
+        last_timestamp = MAX(last_timestamp, excluded.last_timestamp)
+'''
+
+
+def bucket_start(timestamp, bucket):
+    """Return the YYYY-MM-DD start of the day or ISO week containing timestamp"""
+    return _day_bucket_start(timestamp[:10], bucket)
+
+
+@lru_cache(maxsize=4096)
+def _day_bucket_start(day, bucket):
+    # Cached: batches and backfills see the same few days over and over
+    start = date.fromisoformat(day)
+    if bucket == 'week':
+        start -= timedelta(days=start.weekday())
+    return start.isoformat()
+
+
+def rollup_rows(user_id, submission_id, timestamp, topics, scores, summary_score):
+    """Build the upsert parameters that fold one submission into the rollups"""
+    if user_id is None:
+        return []
+
+    starts = {bucket: bucket_start(timestamp, bucket) for bucket in BUCKETS}
+    entries = list(zip(topics, scores))
+    entries.append((OVERALL_TOPIC, summary_score))
+
+    rows = []
+    for bucket, start in starts.items():
+        for topic, score in entries:
+            rows.append((
+                user_id, bucket, topic, start,
+                1, score, score, score,
+                score, timestamp, submission_id
+            ))
+    return rows
+
+
+def combine_rollups(rows):
+    """Fold rollup rows sharing a (user, bucket, topic, start) key into one, the way the upsert would"""
+    combined = {}
+    for row in rows:
+        key = row[:4]
+        entry = combined.get(key)
+        if entry is None:
+            combined[key] = list(row)
+            continue
+        entry[4] += row[4]
+        entry[5] += row[5]
+        if row[6] < entry[6]:
+            entry[6] = row[6]
+        if row[7] > entry[7]:
+            entry[7] = row[7]
+        if (row[9], row[10]) > (entry[9], entry[10]):
+            entry[8:] = row[8:]
+    return list(combined.values())
+
+
+def apply_rollups(conn, rows):
+    """Upsert rollup rows on a connection that is already inside a transaction"""
+    # A batch often holds many submissions for the same user and day, and
+    # one upsert per key is much cheaper than one per submission
+    if rows:
+        conn.executemany(UPSERT_ROLLUP_SQL, combine_rollups(rows))
+
+
+def rebuild_rollups(conn, chunk_size=5000):
+    """Recompute every rollup from the submissions table, returning the submission count"""
+    conn.execute('DELETE FROM progress_rollups')
+
+    processed = 0
+    last_id = 0
+    while True:
+        rows = conn.execute('''
+            SELECT id, user_id, timestamp, summary_score
+            FROM submissions
+            WHERE id > ?
+            ORDER BY id
+            LIMIT ?
+        ''', (last_id, chunk_size)).fetchall()
+        if not rows:
+            break
+
+        scores_by_id = load_scores(conn, [row[0] for row in rows])
+        upserts = []
+        for submission_id, user_id, timestamp, summary_score in rows:
+            topics, scores = scores_by_id[submission_id]
+            upserts.extend(rollup_rows(
+                user_id, submission_id, timestamp, topics, scores, summary_score
+            ))
+        apply_rollups(conn, upserts)
+
+        processed += len(rows)
+        last_id = rows[-1][0]
+
+    return processed
+
+
+def rollup_from_row(row):
+    return {
+        'topic': row[0],
+        'bucket_start': row[1],
+        'count': row[2],
+        'average': row[3] / row[2],
+        'min': row[4],
+        'max': row[5],
+        'last_score': row[6]
+    }
@@ -1,5 +1,55 @@
+import sys
+from bisect import bisect_right
+from metrics import RULE_FEEDBACK_DURATION, timed
+from topic_catalog import BEGINNER, PRACTICE, default_catalog
+
+# Fixed feedback text blocks, joined once instead of on every call
+RECOMMENDATIONS_WEAK = [
+    "• Focus on your weakest areas first for maximum impact",
+    "• Set specific, measurable goals for improvement",
+    "• Practice regularly and track your progress",
+]
+RECOMMENDATIONS_STRONG = [
+    "• Leverage your strengths to build confidence",
+    "• Consider helping others in your strong areas",
+]
+STUDY_PLANS = [
+    [
+        "• Dedicate 1-2 hours daily to your weakest topics",
+        "• Start with basic concepts and build gradually",
+        "• Seek additional help from instructors or peers",
+    ],
+    [
+        "• Spend 30-60 minutes daily on improvement areas",
+        "• Practice with varied examples and scenarios",
+        "• Review and reinforce your existing knowledge",
+    ],
+    [
+        "• Focus on advanced topics and real-world applications",
+        "• Share your knowledge through teaching or mentoring",
+        "• Challenge yourself with complex projects",
+    ],
+]
+# Overall score thresholds choosing STUDY_PLANS[0], [1] or [2]
+STUDY_PLAN_EDGES = [60, 80]
+
+# Fewest rows generate_feedback_batch vectorizes; below it numpy's per-call
+# overhead outweighs the work it saves and rows go through generate_feedback.
+# Until a process has imported numpy its ~90ms import must be paid back too.
+MIN_VECTORIZED_ROWS = 8
+MIN_VECTORIZED_ROWS_COLD = 15000
+
+STUDY_TECHNIQUES_RESOURCE = {
+    'title': "Study Techniques Guide",
+    'description': "Effective study methods and techniques for better learning",
+    'url': "https://www.example.com/study-techniques"
+}
+
+
 class RuleFeedbackEngine:
-    def __init__(self):
+    def __init__(self, catalog=None):
+        # Resources come from the catalog's per-topic index
+        self.catalog = catalog or default_catalog()
         self.score_categories = {
             'excellent': (80, 100),
             'good': (60, 79),
@@ -52,128 +102,181 @@ class RuleFeedbackEngine:
                 "Dedicate regular, focused study time to this area"
             ]
         }
-    
+
+        self._compile_templates()
+
+    def _compile_templates(self):
+        """Precompute bin edges and template strings used on every call"""
+        # Categories ordered by their lower bound; a score falls in the last
+        # category whose lower bound it reaches
+        ordered = sorted(self.score_categories.items(), key=lambda item: item[1][0])
+        self.category_names = [name for name, _ in ordered]
+        self.category_edges = [bounds[0] for _, bounds in ordered[1:]]
+
+        self._weak_indexes = {self.category_names.index(name) for name in ('poor', 'average')}
+        self._strong_index = self.category_names.index('excellent')
+        self._topic_suffixes = [
+            f"/100): {self.feedback_templates[name][0]}" for name in self.category_names
+        ]
+        self._study_plans = ['\n'.join(plan) for plan in STUDY_PLANS]
+        self._recommendations_weak = '\n'.join(RECOMMENDATIONS_WEAK)
+        self._recommendations_strong = '\n'.join(RECOMMENDATIONS_STRONG)
+
     def categorize_score(self, score):
-        for category, (min_score, max_score) in self.score_categories.items():
-            if min_score <= score <= max_score:
-                return category
-        return 'poor'
-    
+        return self.category_names[bisect_right(self.category_edges, score)]
+
+    def _topic_parts(self, topics):
+        """Per-topic strings that do not depend on the score"""
+        return (
+            [f"• {topic} (" for topic in topics],
+            [f"• {topic} - You excel in this area!" for topic in topics],
+            [f"• {topic} - Requires focused attention" for topic in topics],
+        )
+
+    @timed(RULE_FEEDBACK_DURATION, 'single')
     def generate_feedback(self, topics, scores):
         if not topics or not scores or len(topics) != len(scores):
             return {
                 'feedback': 'Invalid input data. Please provide valid topics and scores.',
                 'resources': []
             }
-        
+
         overall_score = sum(scores) / len(scores)
-        overall_category = self.categorize_score(overall_score)
-        
-        # Generate individual topic feedback
-        topic_feedback = []
+        edges = self.category_edges
+        categories = [bisect_right(edges, score) for score in scores]
+
+        return {
+            'feedback': self._render(
+                self._topic_parts(topics), scores, categories,
+                overall_score, bisect_right(edges, overall_score)
+            ),
+            'resources': self.generate_resources(topics, scores)
+        }
+
+    def _render(self, topic_parts, scores, categories, overall_score, overall_category):
+        """Assemble the feedback text for one student from category indexes"""
+        prefixes, strong_lines, weak_lines = topic_parts
+        suffixes = self._topic_suffixes
+        weak_indexes = self._weak_indexes
+        strong_index = self._strong_index
+
+        # Overall assessment and individual topic analysis
+        feedback_parts = [
+            f"📊 Overall Performance: {overall_score:.1f}/100",
+            f"Your overall performance is {self.category_names[overall_category]}.",
+            "",
+            "📝 Topic Analysis:",
+        ]
+
         weak_areas = []
         strong_areas = []
-        
-        for topic, score in zip(topics, scores):
-            category = self.categorize_score(score)
-            
-            if category in ['poor', 'average']:
-                weak_areas.append((topic, score))
-            elif category == 'excellent':
-                strong_areas.append((topic, score))
-            
-            feedback_template = self.feedback_templates[category][0]
-            topic_feedback.append(f"• {topic} ({score}/100): {feedback_template}")
-        
-        # Generate overall feedback
-        feedback_parts = []
-        
-        # Overall assessment
-        feedback_parts.append(f"📊 Overall Performance: {overall_score:.1f}/100")
-        feedback_parts.append(f"Your overall performance is {overall_category}.")
-        feedback_parts.append("")
-        
-        # Individual topic analysis
-        feedback_parts.append("📝 Topic Analysis:")
-        feedback_parts.extend(topic_feedback)
+        for index, category in enumerate(categories):
+            if category in weak_indexes:
+                weak_areas.append(index)
+            elif category == strong_index:
+                strong_areas.append(index)
+            feedback_parts.append(f"{prefixes[index]}{scores[index]}{suffixes[category]}")
         feedback_parts.append("")
-        
+
         # Strengths
         if strong_areas:
             feedback_parts.append("💪 Your Strengths:")
-            for topic, score in strong_areas:
-                feedback_parts.append(f"• {topic} - You excel in this area!")
+            feedback_parts.extend(strong_lines[index] for index in strong_areas)
             feedback_parts.append("")
-        
+
         # Areas for improvement
         if weak_areas:
             feedback_parts.append("🎯 Priority Areas for Improvement:")
-            for topic, score in sorted(weak_areas, key=lambda x: x[1]):
-                feedback_parts.append(f"• {topic} - Requires focused attention")
+            weak_areas.sort(key=lambda index: scores[index])
+            feedback_parts.extend(weak_lines[index] for index in weak_areas)
             feedback_parts.append("")
-        
+
         # Recommendations
         feedback_parts.append("🚀 Recommendations:")
         if weak_areas:
-            feedback_parts.append("• Focus on your weakest areas first for maximum impact")
-            feedback_parts.append("• Set specific, measurable goals for improvement")
-            feedback_parts.append("• Practice regularly and track your progress")
-        
+            feedback_parts.append(self._recommendations_weak)
         if strong_areas:
-            feedback_parts.append("• Leverage your strengths to build confidence")
-            feedback_parts.append("• Consider helping others in your strong areas")
-        
+            feedback_parts.append(self._recommendations_strong)
+
         # Study plan
         feedback_parts.append("")
         feedback_parts.append("📅 Suggested Study Plan:")
-        
-        if overall_score < 60:
-            feedback_parts.append("• Dedicate 1-2 hours daily to your weakest topics")
-            feedback_parts.append("• Start with basic concepts and build gradually")
-            feedback_parts.append("• Seek additional help from instructors or peers")
-        elif overall_score < 80:
-            feedback_parts.append("• Spend 30-60 minutes daily on improvement areas")
-            feedback_parts.append("• Practice with varied examples and scenarios")
-            feedback_parts.append("• Review and reinforce your existing knowledge")
-        else:
-            feedback_parts.append("• Focus on advanced topics and real-world applications")
-            feedback_parts.append("• Share your knowledge through teaching or mentoring")
-            feedback_parts.append("• Challenge yourself with complex projects")
-        
-        # Generate resources
-        resources = self.generate_resources(topics, scores)
-        
-        return {
-            'feedback': '\n'.join(feedback_parts),
-            'resources': resources
-        }
-    
+        feedback_parts.append(self._study_plans[bisect_right(STUDY_PLAN_EDGES, overall_score)])
+
+        return '\n'.join(feedback_parts)
+
+    @timed(RULE_FEEDBACK_DURATION, 'batch')
+    def generate_feedback_batch(self, topics, score_matrix):
+        """Generate feedback for a students x topics score matrix, one result per row"""
+        if not topics:
+            return []
+
+        min_rows = MIN_VECTORIZED_ROWS if 'numpy' in sys.modules else MIN_VECTORIZED_ROWS_COLD
+        if len(score_matrix) < min_rows:
+            return [self.generate_feedback(topics, list(row)) for row in score_matrix]
+
+        try:
+            import numpy as np
+        except ImportError:
+            # Same results without vectorization
+            return [self.generate_feedback(topics, list(row)) for row in score_matrix]
+
+        scores = np.asarray(score_matrix)
+        if scores.ndim != 2 or scores.shape[1] != len(topics):
+            raise ValueError('score_matrix must have one column per topic')
+
+        # Categorize every cell and every overall score with one searchsorted each
+        edges = np.asarray(self.category_edges)
+        overall_scores = scores.mean(axis=1)
+        cell_categories = np.searchsorted(edges, scores, side='right').tolist()
+        overall_categories = np.searchsorted(edges, overall_scores, side='right').tolist()
+
+        # Resource bands follow raw score thresholds: 2 beginner, 1 practice, 0 none
+        bands = ((scores < 40).astype(np.int8) + (scores < 60)).tolist()
+        needs_study_guide = (scores < 70).any(axis=1).tolist()
+
+        # Everything that depends only on the topic is built once for the cohort.
+        # Resource dicts are shared between results and must not be mutated.
+        topic_parts = self._topic_parts(topics)
+        band_resources = [
+            [None, self.catalog.resource(topic, PRACTICE), self.catalog.resource(topic, BEGINNER)]
+            for topic in topics
+        ]
+
+        # Render from the caller's values, the matrix may have promoted ints to floats
+        row_scores = [list(row) for row in score_matrix]
+        overall_list = overall_scores.tolist()
+        results = []
+        for row in range(len(row_scores)):
+            resources = [
+                band_resources[index][band]
+                for index, band in enumerate(bands[row]) if band
+            ]
+            if needs_study_guide[row]:
+                resources.append(STUDY_TECHNIQUES_RESOURCE)
+
+            results.append({
+                'feedback': self._render(
+                    topic_parts, row_scores[row], cell_categories[row],
+                    overall_list[row], overall_categories[row]
+                ),
+                'resources': resources[:5]
+            })
+
+        return results
+
     def generate_resources(self, topics, scores):
         resources = []
-        
+
         # Add resources based on weak areas
-        weak_topics = [(topic, score) for topic, score in zip(topics, scores) if score < 60]
-        
-        for topic, score in weak_topics:
+        for topic, score in zip(topics, scores):
             if score < 40:
-                resources.append({
-                    'title': f"Beginner's Guide to {topic}",
-                    'description': f"Start with fundamental concepts and basic principles of {topic}",
-                    'url': f"https://www.example.com/beginners-guide/{topic.lower().replace(' ', '-')}"
-                })
-            else:
-                resources.append({
-                    'title': f"Intermediate {topic} Practice",
-                    'description': f"Practice exercises and examples to improve your {topic} skills",
-                    'url': f"https://www.example.com/practice/{topic.lower().replace(' ', '-')}"
-                })
-        
+                resources.append(self.catalog.resource(topic, BEGINNER))
+            elif score < 60:
+                resources.append(self.catalog.resource(topic, PRACTICE))
+
         # Add general study resources
         if any(score < 70 for score in scores):
-            resources.append({
-                'title': "Study Techniques Guide",
-                'description': "Effective study methods and techniques for better learning",
-                'url': "https://www.example.com/study-techniques"
-            })
-        
-        return resources[:5]  # Return max 5 resources
\ No newline at end of file
+            resources.append(dict(STUDY_TECHNIQUES_RESOURCE))
+
+        return resources[:5]  # Return max 5 resources
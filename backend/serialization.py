@@ -0,0 +1,74 @@
+"""
+JSON encoding for API responses and exports.
+
+orjson is used when it is installed; it encodes the history and export
+payloads several times faster than the standard library and returns bytes,
+so responses skip a str round trip. Without it, the standard library is
+used with compact separators. Keys keep their insertion order either way.
+"""
+import json
+
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+try:
+    import orjson
+except ImportError:
+    # Optional speedup, see requirements.txt
+    orjson = None
+
+if orjson is not None:
+    # Dates go through Flask's default hook so they keep its HTTP date format
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Flask's provider with compact, unsorted output"""
+
+    # ASCII escapes are kept: the feedback text contains non-ASCII bullets,
+    # and encoding the resulting str to UTF-8 costs more than escaping them
+    sort_keys = False
+    compact = True
+
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider backed by orjson"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=DefaultJSONProvider.default, option=ORJSON_OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=DefaultJSONProvider.default, option=ORJSON_OPTIONS)
+        return self._app.response_class(body, mimetype='application/json')
+
+
+JSON_PROVIDERS = {'stdlib': StdlibJSONProvider}
+if orjson is not None:
+    JSON_PROVIDERS['orjson'] = OrjsonProvider
+
+
+def json_provider_class(name='auto'):
+    """Return the provider for a JSON_SERIALIZER setting: auto, orjson or stdlib"""
+    if name == 'auto':
+        return OrjsonProvider if orjson is not None else StdlibJSONProvider
+    if name not in JSON_PROVIDERS:
+        available = ', '.join(['auto'] + sorted(JSON_PROVIDERS))
+        raise ValueError(f'Unknown or unavailable JSON serializer {name!r}, expected one of: {available}')
+    return JSON_PROVIDERS[name]
+
+
+def dumps(obj):
+    """Encode obj as a compact JSON string with the fastest available encoder"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=DefaultJSONProvider.default, option=ORJSON_OPTIONS).decode()
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=DefaultJSONProvider.default)
+
+
+def loads(s):
+    """Decode JSON text or bytes with the fastest available decoder"""
+    if orjson is not None:
+        return orjson.loads(s)
+    return json.loads(s)
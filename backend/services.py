@@ -0,0 +1,45 @@
+import os
+import threading
+
+
+class LazyService:
+    """Proxy that builds its object on first use, and again in a forked child process"""
+
+    def __init__(self, name, factory):
+        self.name = name
+        self.factory = factory
+        self._instance = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return the object for the current process, building it if needed"""
+        # Connections and threads inherited through fork are unusable in the
+        # child, so a pid mismatch means this process needs its own object
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._instance = self.factory()
+                    self._pid = os.getpid()
+        return self._instance
+
+    @property
+    def is_built(self):
+        """True if the object exists in the current process"""
+        return self._pid == os.getpid()
+
+    def reset(self, close=None):
+        """Forget the current object, passing it to close first if it was built here"""
+        with self._lock:
+            instance, built_here = self._instance, self._pid == os.getpid()
+            self._instance = None
+            self._pid = None
+        if close and built_here and instance is not None:
+            close(instance)
+
+    def __getattr__(self, attribute):
+        return getattr(self.get(), attribute)
+
+    def __repr__(self):
+        state = 'built' if self.is_built else 'not built'
+        return f'<LazyService {self.name} ({state})>'
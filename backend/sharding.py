@@ -0,0 +1,315 @@
+"""
+User-sharded submission storage.
+
+Each user's submissions, rollups and data version live in exactly one of N
+history databases, chosen by a jump consistent hash of the user id, so N
+files give N independent SQLite write locks. Per-user queries go to one
+shard; cross-user queries run on every shard in parallel and are merged.
+
+Shard 0 is the original history.db, shard i is history.shard<i>.db next to
+it. Changing the shard count needs `python manage.py reshard`, which moves
+only the users whose shard changes.
+"""
+import hashlib
+import heapq
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+from analytics import rebuild_sketches
+from connection_pool import ConnectionPool
+from database import SHARD_ID_SPACE, DatabaseManager, seed_submission_ids
+from migrations import HISTORY_MIGRATIONS, run_migrations
+from submission_scores import MAX_IDS_PER_QUERY, load_scores, save_scores
+
+
+def jump_hash(key, buckets):
+    """Map a 64-bit integer key to one of buckets, moving few keys when buckets grows"""
+    # Lamping and Veach, "A Fast, Minimal Memory, Consistent Hash Algorithm"
+    bucket, candidate = -1, 0
+    while candidate < buckets:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        candidate = int((bucket + 1) * (2 ** 31 / ((key >> 33) + 1)))
+    return bucket
+
+
+def shard_index(user_id, shard_count):
+    """Return the shard holding user_id's data; submissions without a user live on shard 0"""
+    if user_id is None or shard_count == 1:
+        return 0
+    # A fixed digest rather than hash(), which differs between processes
+    key = struct.unpack('<Q', hashlib.blake2b(str(user_id).encode(), digest_size=8).digest())[0]
+    return jump_hash(key, shard_count)
+
+
+def shard_paths(base_path, shard_count):
+    """Database file of every shard, keeping base_path itself as shard 0"""
+    root, extension = os.path.splitext(base_path)
+    return [base_path] + [f'{root}.shard{index}{extension}' for index in range(1, shard_count)]
+
+
+class ShardedDatabaseManager:
+    """DatabaseManager interface over one DatabaseManager per shard"""
+
+    def __init__(self, base_path, shard_count, **options):
+        self.base_path = base_path
+        self.shards = [
+            DatabaseManager(path, shard=(index, shard_count), **options)
+            for index, path in enumerate(shard_paths(base_path, shard_count))
+        ]
+        self._executor = ThreadPoolExecutor(max_workers=shard_count, thread_name_prefix='shard-query')
+
+    def close(self):
+        self._executor.shutdown()
+        for shard in self.shards:
+            shard.close()
+
+    def shard_for(self, user_id):
+        return self.shards[shard_index(user_id, len(self.shards))]
+
+    def _fan_out(self, method, *args):
+        """Call method on every shard in parallel and return the results in shard order"""
+        return list(self._executor.map(lambda shard: getattr(shard, method)(*args), self.shards))
+
+    # --- Per-user operations, each on the user's own shard ---
+
+    def save_submission(self, topics, scores, feedback, resources=None, feedback_mode='ai', user_id=None,
+                        status='complete'):
+        return self.shard_for(user_id).save_submission(
+            topics, scores, feedback, resources, feedback_mode, user_id, status
+        )
+
+    def save_submissions(self, submissions, user_id=None):
+        return self.shard_for(user_id).save_submissions(submissions, user_id)
+
+    def complete_submission(self, submission_id, feedback, resources=None, status='complete', user_id=None):
+        return self.shard_for(user_id).complete_submission(submission_id, feedback, resources, status)
+
+    def get_submission(self, submission_id, user_id):
+        return self.shard_for(user_id).get_submission(submission_id, user_id)
+
+    def get_submissions_page(self, user_id, limit=50, cursor=None):
+        return self.shard_for(user_id).get_submissions_page(user_id, limit, cursor)
+
+    def get_submissions_since(self, user_id, since_id, limit=50):
+        return self.shard_for(user_id).get_submissions_since(user_id, since_id, limit)
+
+    def get_progress_page(self, user_id, limit=500, cursor=None):
+        return self.shard_for(user_id).get_progress_page(user_id, limit, cursor)
+
+    def get_progress_since(self, user_id, since_id, limit=500):
+        return self.shard_for(user_id).get_progress_since(user_id, since_id, limit)
+
+    def iter_submissions(self, user_id, start=None, end=None, chunk_size=500):
+        return self.shard_for(user_id).iter_submissions(user_id, start, end, chunk_size)
+
+    def get_user_version(self, user_id):
+        return self.shard_for(user_id).get_user_version(user_id)
+
+    def get_rollups(self, user_id, bucket='day', topic=None):
+        return self.shard_for(user_id).get_rollups(user_id, bucket, topic)
+
+    def get_topic_stats(self, user_id, topic=None):
+        return self.shard_for(user_id).get_topic_stats(user_id, topic)
+
+    def get_latest_topic_score(self, user_id, topic):
+        return self.shard_for(user_id).get_latest_topic_score(user_id, topic)
+
+    # --- Operations that read one user's shard, or all shards when user_id is None ---
+
+    def get_all_submissions(self, user_id=None):
+        if user_id:
+            return self.shard_for(user_id).get_all_submissions(user_id)
+        # Every shard returns newest first, so a merge keeps that order
+        return list(heapq.merge(*self._fan_out('get_all_submissions'),
+                                key=lambda submission: submission['timestamp'], reverse=True))
+
+    def get_progress_data(self, user_id=None):
+        if user_id:
+            return self.shard_for(user_id).get_progress_data(user_id)
+        return list(heapq.merge(*self._fan_out('get_progress_data'), key=lambda point: point['timestamp']))
+
+    # --- Cross-user analytics and maintenance ---
+
+    def get_topic_distribution(self, topic):
+        histograms = self._fan_out('get_topic_distribution', topic)
+        merged = histograms[0]
+        for histogram in histograms[1:]:
+            merged.merge(histogram)
+        return merged
+
+    def backfill_sketches(self):
+        return sum(self._fan_out('backfill_sketches'))
+
+    def backfill_rollups(self):
+        return sum(self._fan_out('backfill_rollups'))
+
+    def canonicalize_topics(self, canonical):
+        return sum(self._fan_out('canonicalize_topics', canonical))
+
+    def fail_stale_submissions(self, older_than, feedback):
+        return sum(self._fan_out('fail_stale_submissions', older_than, feedback))
+
+
+# --- Resharding ---
+
+def read_shard_count(base_path):
+    """Shard count recorded in shard 0, or None if the layout has not been claimed yet"""
+    pool = ConnectionPool(base_path, max_size=1)
+    try:
+        with pool.connection() as conn:
+            run_migrations(conn, HISTORY_MIGRATIONS)
+            row = conn.execute('SELECT shard_count FROM shard_layout').fetchone()
+    finally:
+        pool.close()
+    return row[0] if row else None
+
+
+def _chunks(items, size=MAX_IDS_PER_QUERY):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _copy_user(source, target, user_id, target_index):
+    """Copy a user's rows into target's open transaction, returning (copied, renumbered) submission counts
+
+    Rows keep their ids when those are in the target's id range and free
+    there. The rest get new ids in that range, see SHARD_ID_SPACE.
+    """
+    cursor = source.execute('SELECT * FROM submissions WHERE user_id = ? ORDER BY id', (user_id,))
+    columns = [description[0] for description in cursor.description]
+    rows = cursor.fetchall()
+    ids = [row[0] for row in rows]
+    scores_by_id = load_scores(source, ids)
+
+    # Whatever an interrupted earlier run left on the target is replaced, so
+    # ids still taken there belong to other users and need a new one
+    _delete_user(target, user_id)
+    start = target_index * SHARD_ID_SPACE
+    in_range = [submission_id for submission_id in ids if start <= submission_id < start + SHARD_ID_SPACE]
+    taken = set()
+    for chunk in _chunks(in_range):
+        placeholders = ', '.join('?' * len(chunk))
+        taken.update(row[0] for row in target.execute(
+            f'SELECT id FROM submissions WHERE id IN ({placeholders})', chunk
+        ))
+    keep = set(in_range) - taken
+
+    # Kept ids go in first, so the renumbered rows are numbered after them
+    insert_columns = ', '.join(columns)
+    without_id = ', '.join(columns[1:])
+    new_ids = {}
+    for row in rows:
+        if row[0] in keep:
+            target.execute(f'INSERT INTO submissions ({insert_columns}) VALUES ({", ".join("?" * len(columns))})', row)
+            new_ids[row[0]] = row[0]
+    for row in rows:
+        if row[0] not in keep:
+            new_ids[row[0]] = target.execute(
+                f'INSERT INTO submissions ({without_id}) VALUES ({", ".join("?" * (len(columns) - 1))})', row[1:]
+            ).lastrowid
+    stored_names = save_scores(
+        target, [(new_ids[submission_id],) + scores_by_id[submission_id] for submission_id in ids]
+    )
+
+    # Rollups move under the target's spelling of each topic, which may be
+    # another user's first spelling there
+    cursor = source.execute('SELECT * FROM progress_rollups WHERE user_id = ?', (user_id,))
+    columns = [description[0] for description in cursor.description]
+    topic_column = columns.index('topic')
+    last_id = columns.index('last_submission_id')
+    rollups = []
+    for row in cursor:
+        row = list(row)
+        row[topic_column] = stored_names.get(row[topic_column], row[topic_column])
+        row[last_id] = new_ids.get(row[last_id], row[last_id])
+        rollups.append(row)
+    target.executemany(
+        f'INSERT OR REPLACE INTO progress_rollups ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})',
+        rollups
+    )
+
+    # A new version makes clients refetch instead of trusting cached ETags
+    version = source.execute('SELECT version, updated_at FROM user_versions WHERE user_id = ?', (user_id,)).fetchone()
+    if version:
+        target.execute('INSERT INTO user_versions (user_id, version, updated_at) VALUES (?, ?, ?)',
+                       (user_id, version[0] + 1, version[1]))
+    return len(ids), len(ids) - len(keep)
+
+
+def _delete_user(conn, user_id):
+    ids = [row[0] for row in conn.execute('SELECT id FROM submissions WHERE user_id = ?', (user_id,))]
+    for chunk in _chunks(ids):
+        placeholders = ', '.join('?' * len(chunk))
+        conn.execute(f'DELETE FROM submission_scores WHERE submission_id IN ({placeholders})', chunk)
+    conn.execute('DELETE FROM submissions WHERE user_id = ?', (user_id,))
+    conn.execute('DELETE FROM progress_rollups WHERE user_id = ?', (user_id,))
+    conn.execute('DELETE FROM user_versions WHERE user_id = ?', (user_id,))
+
+
+def reshard(base_path, new_count, log=print):
+    """Move every user to their shard under new_count shards; run with the servers stopped
+
+    Each user is committed on the new shard before being deleted from the
+    old one, so an interrupted run can simply be started again. Moved
+    submissions get ids in their new shard's range.
+    """
+    if new_count < 1:
+        raise ValueError('new_count must be at least 1')
+    old_count = read_shard_count(base_path) or 1
+    old_paths = shard_paths(base_path, old_count)
+    new_paths = shard_paths(base_path, new_count)
+
+    pools = {}
+    for path in dict.fromkeys(old_paths + new_paths):
+        pools[path] = ConnectionPool(path, max_size=1)
+        with pools[path].connection() as conn:
+            run_migrations(conn, HISTORY_MIGRATIONS)
+    for index, path in enumerate(new_paths):
+        with pools[path].transaction() as conn:
+            seed_submission_ids(conn, index)
+
+    stats = {'old_shards': old_count, 'new_shards': new_count, 'users_moved': 0,
+             'submissions_moved': 0, 'submissions_renumbered': 0}
+    try:
+        for old_index, path in enumerate(old_paths):
+            with pools[path].connection() as source:
+                user_ids = [row[0] for row in source.execute(
+                    'SELECT DISTINCT user_id FROM submissions WHERE user_id IS NOT NULL '
+                    'UNION SELECT user_id FROM user_versions'
+                )]
+
+            for user_id in user_ids:
+                new_index = shard_index(user_id, new_count)
+                if new_index == old_index:
+                    continue
+                with pools[path].connection() as source, pools[new_paths[new_index]].transaction() as target:
+                    copied, renumbered = _copy_user(source, target, user_id, new_index)
+                with pools[path].transaction() as source:
+                    _delete_user(source, user_id)
+
+                stats['users_moved'] += 1
+                stats['submissions_moved'] += copied
+                stats['submissions_renumbered'] += renumbered
+            log(f'{path}: checked {len(user_ids)} users')
+
+        # Topic histograms are per file, so recount them from the scores each shard now holds
+        if stats['users_moved']:
+            for path in new_paths:
+                with pools[path].transaction() as conn:
+                    rebuild_sketches(conn)
+
+        # Record the new layout last, so servers refuse to start until the move is done
+        for index, path in enumerate(new_paths):
+            with pools[path].transaction() as conn:
+                conn.execute('INSERT OR REPLACE INTO shard_layout (id, shard_index, shard_count) VALUES (0, ?, ?)',
+                             (index, new_count))
+        for path in old_paths[new_count:]:
+            with pools[path].transaction() as conn:
+                conn.execute('DELETE FROM shard_layout')
+            log(f'{path} is no longer used and can be removed')
+    finally:
+        for pool in pools.values():
+            pool.close()
+    return stats
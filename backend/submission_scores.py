@@ -0,0 +1,116 @@
+"""
+Normalized per-topic scores.
+
+Each submission stores one submission_scores row per assessed topic, keyed
+by (submission_id, position) so the original topic order survives. Topic
+names are interned once in the topics table, which lets SQLite filter and
+aggregate by topic without decoding anything in Python.
+
+Each topic row also holds its fold_topic() key, unique across the table, so
+'Web security' and 'Web Security' share the row of whichever was stored
+first and every later submission is saved under that first spelling.
+"""
+from topic_catalog import fold_topic
+
+INSERT_SCORE_SQL = '''
+    INSERT INTO submission_scores (submission_id, position, topic_id, score)
+    VALUES (?, ?, ?, ?)
+'''
+
+# Stay well under SQLite's bound parameter limit for IN (...) lists
+MAX_IDS_PER_QUERY = 500
+
+
+def intern_topic_rows(conn, names):
+    """Return {name: (topic_id, stored name)} for names, adding any topic not seen under another spelling"""
+    keys = {name: fold_topic(name) for name in names}
+    if not keys:
+        return {}
+
+    # The fold_key index makes this skip names whose topic is already stored
+    conn.executemany('INSERT OR IGNORE INTO topics (name, fold_key) VALUES (?, ?)', keys.items())
+
+    stored = {}
+    unique = list(dict.fromkeys(keys.values()))
+    for start in range(0, len(unique), MAX_IDS_PER_QUERY):
+        chunk = unique[start:start + MAX_IDS_PER_QUERY]
+        placeholders = ', '.join('?' * len(chunk))
+        for key, topic_id, name in conn.execute(
+            f'SELECT fold_key, id, name FROM topics WHERE fold_key IN ({placeholders})', chunk
+        ):
+            stored[key] = (topic_id, name)
+    return {name: stored[key] for name, key in keys.items()}
+
+
+def intern_topics(conn, names):
+    """Return {name: topic_id} for names, adding any topic not seen before"""
+    return {name: topic_id for name, (topic_id, _) in intern_topic_rows(conn, names).items()}
+
+
+def save_scores(conn, entries):
+    """Insert scores for (submission_id, topics, scores) entries inside the caller's transaction
+
+    Returns {topic: stored name} for every topic in entries.
+    """
+    topics = intern_topic_rows(conn, [topic for _, topics, _ in entries for topic in topics])
+
+    rows = []
+    for submission_id, names, scores in entries:
+        for position, (topic, score) in enumerate(zip(names, scores)):
+            rows.append((submission_id, position, topics[topic][0], score))
+
+    if rows:
+        conn.executemany(INSERT_SCORE_SQL, rows)
+    return {name: stored_name for name, (_, stored_name) in topics.items()}
+
+
+def load_scores(conn, submission_ids):
+    """Return {submission_id: (topics, scores)} in each submission's original topic order"""
+    loaded = {submission_id: ([], []) for submission_id in submission_ids}
+    ids = list(loaded)
+
+    for start in range(0, len(ids), MAX_IDS_PER_QUERY):
+        chunk = ids[start:start + MAX_IDS_PER_QUERY]
+        placeholders = ', '.join('?' * len(chunk))
+        rows = conn.execute(f'''
+            SELECT ss.submission_id, t.name, ss.score
+            FROM submission_scores ss
+            JOIN topics t ON t.id = ss.topic_id
+            WHERE ss.submission_id IN ({placeholders})
+            ORDER BY ss.submission_id, ss.position
+        ''', chunk).fetchall()
+
+        for submission_id, topic, score in rows:
+            topics, scores = loaded[submission_id]
+            topics.append(topic)
+            scores.append(score)
+
+    return loaded
+
+
+def merge_topics(conn, canonical):
+    """Point every score at canonical(name) of its topic and drop the merged names, returning how many"""
+    topic_ids = dict(conn.execute('SELECT name, id FROM topics').fetchall())
+    renames = {}
+    for name in topic_ids:
+        target = canonical(name)
+        if target != name:
+            renames[name] = target
+    if not renames:
+        return 0
+
+    # A target with the same fold key as a stored topic resolves to that
+    # row, which takes the canonical spelling; 'python' becomes 'Python'
+    # in place rather than being merged into itself
+    target_ids = intern_topics(conn, list(renames.values()))
+    conn.executemany('UPDATE topics SET name = ? WHERE id = ?', [
+        (target, target_ids[target]) for target in set(renames.values())
+    ])
+    merged = [
+        (target_ids[target], topic_ids[name]) for name, target in renames.items()
+        if target_ids[target] != topic_ids[name]
+    ]
+    conn.executemany('UPDATE submission_scores SET topic_id = ? WHERE topic_id = ?', merged)
+    conn.executemany('DELETE FROM topic_sketch_bins WHERE topic_id = ?', [(topic_id,) for _, topic_id in merged])
+    conn.executemany('DELETE FROM topics WHERE id = ?', [(topic_id,) for _, topic_id in merged])
+    return len(renames)
@@ -0,0 +1,71 @@
+import time
+
+import pytest
+import requests
+
+from cohere_client import CircuitBreaker, CohereClient, CohereUnavailable
+
+
+class FakeResponse:
+    """Stands in for a streamed or plain requests.Response from /generate"""
+
+    def __init__(self, lines=(), payload=None):
+        self.status_code = 200
+        self.headers = {}
+        self.lines = lines
+        self.payload = payload
+        self.closed = False
+
+    def iter_lines(self, chunk_size=None):
+        return iter(self.lines)
+
+    def json(self):
+        return self.payload
+
+    def close(self):
+        self.closed = True
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def make_client(post):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    client = CohereClient('key', base_url='http://cohere.invalid', max_retries=0, breaker=breaker)
+    client.session.post = post
+    return client
+
+
+def test_closing_a_half_open_stream_lets_the_breaker_recover():
+    responses = [
+        FakeResponse(lines=[b'{"text": "Hello"}', b'{"text": " there"}']),
+        FakeResponse(payload={'generations': [{'text': 'Recovered'}]}),
+    ]
+    client = make_client(lambda *args, **kwargs: responses.pop(0))
+    open_breaker(client.breaker)
+    time.sleep(0.06)
+
+    stream = client.stream_generate('prompt')
+    assert next(stream) == 'Hello'
+    assert client.breaker.state == CircuitBreaker.HALF_OPEN
+    stream.close()
+
+    assert client.breaker.state != CircuitBreaker.HALF_OPEN
+    assert client.generate('prompt') == 'Recovered'
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_unexpected_request_error_in_half_open_trial_reopens_the_breaker():
+    def post(*args, **kwargs):
+        raise requests.exceptions.TooManyRedirects('redirect loop')
+
+    client = make_client(post)
+    open_breaker(client.breaker)
+    time.sleep(0.06)
+
+    with pytest.raises(CohereUnavailable):
+        client.generate('prompt')
+    assert client.breaker.state == CircuitBreaker.OPEN
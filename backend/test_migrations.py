@@ -0,0 +1,60 @@
+import sqlite3
+
+from migrations import HISTORY_MIGRATIONS, get_schema_version, run_migrations
+from submission_scores import load_scores
+
+# Schema version before topics and scores moved out of their JSON columns
+JSON_COLUMNS_VERSION = 5
+
+
+def test_normalizing_scores_keeps_legacy_non_string_topics(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'history.db'))
+    run_migrations(conn, HISTORY_MIGRATIONS[:JSON_COLUMNS_VERSION])
+    legacy_rows = [
+        (1, '["Python", "SQL"]', '[40, 60]'),
+        (1, '[5]', '[70]'),
+        (2, '[3.5, null]', '[10, 20]'),
+    ]
+    conn.executemany(
+        "INSERT INTO submissions (user_id, topics, scores, feedback, summary_score, feedback_mode) "
+        "VALUES (?, ?, ?, 'Feedback', 50, 'rule')",
+        legacy_rows
+    )
+    conn.commit()
+
+    run_migrations(conn, HISTORY_MIGRATIONS)
+
+    assert get_schema_version(conn) == len(HISTORY_MIGRATIONS)
+    assert list(load_scores(conn, [1, 2, 3]).values()) == [
+        (['Python', 'SQL'], [40, 60]),
+        (['5'], [70]),
+        (['3.5', 'None'], [10, 20]),
+    ]
+    rollup_topics = {row[0] for row in conn.execute("SELECT topic FROM progress_rollups WHERE bucket = 'day'")}
+    assert {'Python', 'SQL', '5', '3.5', 'None'} <= rollup_topics
+    conn.close()
+
+
+def test_topics_stored_under_several_spellings_are_merged_into_the_first(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'history.db'))
+    run_migrations(conn, HISTORY_MIGRATIONS[:JSON_COLUMNS_VERSION])
+    conn.executemany(
+        "INSERT INTO submissions (user_id, topics, scores, feedback, summary_score, feedback_mode) "
+        "VALUES (?, ?, ?, 'Feedback', 50, 'rule')",
+        [(1, '["Web Security"]', '[40]'), (2, '["web security", "GraphQL"]', '[60, 80]'), (2, '["Graphql"]', '[90]')]
+    )
+    conn.commit()
+
+    run_migrations(conn, HISTORY_MIGRATIONS)
+
+    assert list(load_scores(conn, [1, 2, 3]).values()) == [
+        (['Web Security'], [40]),
+        (['Web Security', 'GraphQL'], [60, 80]),
+        (['GraphQL'], [90]),
+    ]
+    assert conn.execute('SELECT name, fold_key FROM topics ORDER BY id').fetchall() == [
+        ('Web Security', 'web security'), ('GraphQL', 'graphql')
+    ]
+    rollup_topics = {row[0] for row in conn.execute("SELECT topic FROM progress_rollups WHERE bucket = 'day'")}
+    assert rollup_topics == {'Web Security', 'GraphQL', '__overall__'}
+    conn.close()
@@ -0,0 +1,52 @@
+from database import SHARD_ID_SPACE, DatabaseManager
+from sharding import ShardedDatabaseManager, reshard, shard_paths
+
+USERS = range(1, 41)
+
+
+def create_shards(base_path, shard_count):
+    for index, path in enumerate(shard_paths(base_path, shard_count)):
+        DatabaseManager(path, shard=(index, shard_count)).close()
+
+
+def save_one_each(base_path, shard_count):
+    """Save a submission for every user, returning {user_id: new submission id}"""
+    db = ShardedDatabaseManager(base_path, shard_count)
+    try:
+        return {
+            user_id: db.save_submission(['Python'], [50], 'Feedback', [], 'rule', user_id=user_id)
+            for user_id in USERS
+        }
+    finally:
+        db.close()
+
+
+def all_ids(base_path, shard_count):
+    db = ShardedDatabaseManager(base_path, shard_count)
+    try:
+        return [submission['id'] for submission in db.get_all_submissions()]
+    finally:
+        db.close()
+
+
+def test_ids_stay_disjoint_after_resharding_down_and_up(tmp_path):
+    base_path = str(tmp_path / 'history.db')
+    create_shards(base_path, 4)
+    save_one_each(base_path, 4)
+
+    reshard(base_path, 2, log=lambda message: None)
+    new_ids = save_one_each(base_path, 2)
+    ids = all_ids(base_path, 2)
+    assert len(ids) == len(set(ids)) == 2 * len(USERS)
+
+    # New rows are numbered in the range of the shard that now holds them
+    sharded = ShardedDatabaseManager(base_path, 2)
+    for user_id, submission_id in new_ids.items():
+        index = sharded.shards.index(sharded.shard_for(user_id))
+        assert submission_id // SHARD_ID_SPACE == index
+    sharded.close()
+
+    reshard(base_path, 4, log=lambda message: None)
+    save_one_each(base_path, 4)
+    ids = all_ids(base_path, 4)
+    assert len(ids) == len(set(ids)) == 3 * len(USERS)
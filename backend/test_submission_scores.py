@@ -0,0 +1,34 @@
+from database import DatabaseManager
+
+
+def test_later_spellings_of_a_topic_are_saved_under_the_first(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'history.db'))
+    try:
+        first = db.save_submission(['Web Security'], [40], 'Feedback', [], 'rule', user_id=1)
+        second = db.save_submission(['Web security'], [60], 'Feedback', [], 'rule', user_id=1)
+
+        assert db.get_submission(first, 1)['topics'] == ['Web Security']
+        assert db.get_submission(second, 1)['topics'] == ['Web Security']
+        assert db.get_topic_stats(1, 'WEB_SECURITY') == [
+            {'topic': 'Web Security', 'count': 2, 'average': 50.0, 'min': 40, 'max': 60}
+        ]
+        assert {rollup['topic'] for rollup in db.get_rollups(1, topic='web security')} == {'Web Security'}
+        assert db.get_latest_topic_score(1, 'web security') == 60
+        assert db.get_topic_distribution('web  Security').total == 2
+    finally:
+        db.close()
+
+
+def test_canonicalizing_renames_a_topic_in_place_and_merges_aliases(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'history.db'))
+    try:
+        first = db.save_submission(['python'], [40], 'Feedback', [], 'rule', user_id=1)
+        second = db.save_submission(['py'], [60], 'Feedback', [], 'rule', user_id=1)
+
+        assert db.canonicalize_topics({'python': 'Python', 'py': 'Python'}.get) == 2
+
+        assert db.get_submission(first, 1)['topics'] == ['Python']
+        assert db.get_submission(second, 1)['topics'] == ['Python']
+        assert db.get_topic_distribution('Python').total == 2
+    finally:
+        db.close()
@@ -0,0 +1,18 @@
+from topic_catalog import TopicCatalog
+from validation import DUPLICATE_TOPIC_ERROR, canonicalize_topics, validate_assessment
+
+
+def test_topics_differing_only_in_case_or_spacing_are_rejected():
+    assert validate_assessment(['Python', 'python '], [20, 80]) == DUPLICATE_TOPIC_ERROR
+    assert validate_assessment(['Python', 'SQL'], [20, 80]) is None
+
+
+def test_topics_must_be_non_empty_strings():
+    for topic in (5, None, ['Python'], '', '   '):
+        assert validate_assessment([topic, 'SQL'], [20, 80]) == 'Topics must be non-empty names'
+
+
+def test_aliases_of_one_catalog_topic_are_rejected():
+    catalog = TopicCatalog()
+    assert canonicalize_topics(['py', 'Python'], catalog) == (['Python', 'Python'], DUPLICATE_TOPIC_ERROR)
+    assert canonicalize_topics(['py', 'sql'], catalog) == (['Python', 'SQL'], None)
@@ -0,0 +1,65 @@
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import time
+
+TOKEN_PREFIX = 'v1.'
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def is_signed_token(token):
+    """Return True if the token uses the signed format rather than an opaque DB token"""
+    return token.startswith(TOKEN_PREFIX)
+
+
+class TokenSigner:
+    """Issues and verifies HMAC-signed session tokens that carry their own claims"""
+
+    def __init__(self, secret):
+        if not secret:
+            raise ValueError('A non-empty secret is required to sign session tokens')
+        self.key = secret.encode() if isinstance(secret, str) else secret
+
+    def _signature(self, signing_input):
+        digest = hmac.new(self.key, signing_input.encode(), hashlib.sha256).digest()
+        return _b64encode(digest)
+
+    def sign(self, user_id, username, expires_at):
+        """Create a token for the user that expires at the given Unix timestamp"""
+        claims = {
+            'uid': user_id,
+            'usr': username,
+            'exp': int(expires_at),
+            'jti': secrets.token_urlsafe(12),
+        }
+        payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode())
+        signing_input = TOKEN_PREFIX + payload
+        return f'{signing_input}.{self._signature(signing_input)}'
+
+    def verify(self, token):
+        """Return the token's claims, or None if it is malformed, forged or expired"""
+        if not is_signed_token(token):
+            return None
+
+        signing_input, _, signature = token.rpartition('.')
+        if not signing_input or not hmac.compare_digest(signature, self._signature(signing_input)):
+            return None
+
+        try:
+            claims = json.loads(_b64decode(signing_input[len(TOKEN_PREFIX):]))
+        except ValueError:
+            return None
+
+        if claims.get('exp', 0) <= time.time():
+            return None
+
+        return claims
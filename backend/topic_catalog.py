@@ -0,0 +1,212 @@
+"""
+Topic catalog: canonical topic names, their aliases and learning resources.
+
+Topics arrive as free text, so 'python', 'Python ' and 'PYTHON' would
+otherwise be stored, aggregated and cached as three different topics. Every
+name and alias is folded to a key that ignores case, separators and extra
+whitespace, and each key maps to one canonical name, so canonicalizing a
+topic is a single dict lookup, linear in the length of the topic.
+
+A trie over the same keys answers autocomplete. Every node keeps the best
+ranked topics beneath it, so a suggestion costs the length of the prefix
+however large the catalog grows.
+
+Resources for each catalog topic and difficulty band are built once when the
+catalog loads and shared by both feedback engines. They must not be mutated.
+"""
+import json
+import os
+from functools import lru_cache
+
+# Difficulty bands, used as indexes into a topic's resources
+BEGINNER, PRACTICE, STUDY_GUIDE = range(3)
+
+# Most suggestions kept on a trie node, and so the most one request can get
+MAX_SUGGESTIONS = 10
+
+# Built-in catalog as (canonical name, aliases), best ranked first
+CATALOG_TOPICS = [
+    ('Python', ['py', 'python3', 'python 3']),
+    ('JavaScript', ['js', 'ecmascript', 'es6']),
+    ('SQL', ['structured query language']),
+    ('Machine Learning', ['ml']),
+    ('Data Structures', ['data structure', 'ds']),
+    ('Algorithms', ['algorithm', 'algo', 'algos']),
+    ('Java', []),
+    ('TypeScript', ['ts']),
+    ('HTML', ['html5']),
+    ('CSS', ['css3']),
+    ('React', ['reactjs', 'react.js']),
+    ('Node.js', ['node', 'nodejs']),
+    ('C', []),
+    ('C++', ['cpp', 'cplusplus']),
+    ('C#', ['csharp', 'c sharp']),
+    ('Go', ['golang']),
+    ('Rust', []),
+    ('Git', ['version control']),
+    ('Linux', []),
+    ('Docker', []),
+    ('Databases', ['database', 'dbms']),
+    ('Object-Oriented Programming', ['oop']),
+    ('Data Science', []),
+    ('Deep Learning', ['dl']),
+    ('Artificial Intelligence', ['ai']),
+    ('Natural Language Processing', ['nlp']),
+    ('Statistics', ['stats']),
+    ('Probability', []),
+    ('Linear Algebra', []),
+    ('Calculus', []),
+    ('Discrete Mathematics', ['discrete math']),
+    ('Computer Networks', ['networking']),
+    ('Operating Systems', ['os']),
+    ('Web Development', ['web dev']),
+    ('Cloud Computing', ['cloud']),
+    ('Cybersecurity', ['cyber security', 'security']),
+    ('Software Testing', ['testing']),
+    ('System Design', []),
+    ('APIs', ['api', 'rest api']),
+]
+
+# Words left in lower case when tidying a topic that is not in the catalog
+MINOR_WORDS = {'a', 'an', 'and', 'for', 'in', 'of', 'on', 'or', 'the', 'to', 'with'}
+
+_SEPARATORS = str.maketrans('-_', '  ')
+
+
+def fold_topic(name):
+    """Lookup key for a topic: case, '-', '_' and runs of whitespace are ignored"""
+    return ' '.join(name.translate(_SEPARATORS).split()).casefold()
+
+
+def tidy_topic(name):
+    """Display form of a topic outside the catalog, so its spellings still agree"""
+    words = name.split()
+    # Deliberate mixed case such as 'GraphQL' is kept, as are short
+    # acronyms; all lower or all upper case text becomes title case
+    if not words or not (name.islower() or (name.isupper() and len(name) > 4)):
+        return ' '.join(words)
+    return ' '.join(
+        word.lower() if index and word.lower() in MINOR_WORDS else word[:1].upper() + word[1:].lower()
+        for index, word in enumerate(words)
+    )
+
+
+def topic_slug(topic):
+    """URL slug for a topic"""
+    return topic.lower().replace(' ', '-')
+
+
+def build_resources(topic):
+    """Resources for topic, indexed by BEGINNER, PRACTICE and STUDY_GUIDE"""
+    slug = topic_slug(topic)
+    return (
+        {
+            'title': f"Beginner's Guide to {topic}",
+            'description': f"Start with fundamental concepts and basic principles of {topic}",
+            'url': f"https://www.example.com/beginners-guide/{slug}"
+        },
+        {
+            'title': f"Intermediate {topic} Practice",
+            'description': f"Practice exercises and examples to improve your {topic} skills",
+            'url': f"https://www.example.com/practice/{slug}"
+        },
+        {
+            'title': f"Study Guide: {topic}",
+            'description': f"Comprehensive guide to improve your understanding of {topic}",
+            'url': f"https://www.example.com/study-guide/{slug}"
+        },
+    )
+
+
+class _TrieNode:
+    __slots__ = ('children', 'top')
+
+    def __init__(self):
+        self.children = {}
+        # Indexes of the best ranked topics under this node
+        self.top = []
+
+
+class TopicCatalog:
+    """Canonical names, aliases, prefix suggestions and resources for known topics"""
+
+    def __init__(self, topics=CATALOG_TOPICS):
+        # topics is a list of (canonical name, aliases), best ranked first
+        self.names = []
+        self._resources = []
+        self._index = {}
+        self._root = _TrieNode()
+        for name, aliases in topics:
+            self.add(name, aliases)
+        # Topics outside the catalog recur too, so their resources are kept for a while
+        self._extra_resources = lru_cache(maxsize=4096)(build_resources)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name, aliases=()):
+        """Add a topic, or more aliases for one already in the catalog"""
+        name = ' '.join(name.split())
+        index = self._index.get(fold_topic(name))
+        if index is None:
+            index = len(self.names)
+            self.names.append(name)
+            self._resources.append(build_resources(name))
+        for key in {fold_topic(spelling) for spelling in [name, *aliases]} - {''}:
+            self._index.setdefault(key, index)
+            self._insert(key, index)
+
+    def _insert(self, key, index):
+        node = self._root
+        for char in key:
+            if index not in node.top and len(node.top) < MAX_SUGGESTIONS:
+                node.top.append(index)
+            node = node.children.setdefault(char, _TrieNode())
+        if index not in node.top and len(node.top) < MAX_SUGGESTIONS:
+            node.top.append(index)
+
+    def lookup(self, topic):
+        """Canonical name of a catalog topic, or None if it is not in the catalog"""
+        index = self._index.get(fold_topic(topic))
+        return None if index is None else self.names[index]
+
+    def canonical(self, topic):
+        """Canonical name for any topic, tidying the ones outside the catalog"""
+        index = self._index.get(fold_topic(topic))
+        return tidy_topic(topic) if index is None else self.names[index]
+
+    def canonical_topics(self, topics):
+        """Canonicalize a list of topic names"""
+        return [self.canonical(topic) for topic in topics]
+
+    def suggest(self, prefix, limit=MAX_SUGGESTIONS):
+        """Best ranked canonical names with a name or alias starting with prefix"""
+        node = self._root
+        for char in fold_topic(prefix):
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return [self.names[index] for index in node.top[:limit]]
+
+    def resource(self, topic, band):
+        """The BEGINNER, PRACTICE or STUDY_GUIDE resource for topic, shared and read-only"""
+        index = self._index.get(fold_topic(topic))
+        if index is None:
+            return self._extra_resources(tidy_topic(topic))[band]
+        return self._resources[index][band]
+
+
+def load_catalog(path=None):
+    """The built-in catalog, extended by a JSON file of {canonical name: [aliases]} if path is given"""
+    catalog = TopicCatalog()
+    if path:
+        with open(path, encoding='utf-8') as f:
+            for name, aliases in json.load(f).items():
+                catalog.add(name, aliases)
+    return catalog
+
+
+@lru_cache(maxsize=None)
+def default_catalog():
+    """Process-wide catalog for engines created without one, extended by TOPIC_CATALOG_PATH if set"""
+    return load_catalog(os.getenv('TOPIC_CATALOG_PATH'))
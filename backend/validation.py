@@ -0,0 +1,46 @@
+from topic_catalog import fold_topic
+
+FEEDBACK_MODES = ('ai', 'rule')
+
+DUPLICATE_TOPIC_ERROR = 'Each topic can only be listed once'
+
+
+def _has_duplicates(keys):
+    seen = set()
+    for key in keys:
+        if key in seen:
+            return True
+        seen.add(key)
+    return False
+
+
+def validate_assessment(topics, scores):
+    """Return an error message for invalid topics/scores, or None if they are valid"""
+    if not isinstance(topics, list) or not isinstance(scores, list):
+        return 'Invalid topics or scores'
+
+    if not topics or not scores or len(topics) != len(scores):
+        return 'Invalid topics or scores'
+
+    # Validate scores are between 0-100
+    for score in scores:
+        if not isinstance(score, (int, float)) or isinstance(score, bool) or not 0 <= score <= 100:
+            return 'Scores must be between 0 and 100'
+
+    if not all(isinstance(topic, str) and topic.strip() for topic in topics):
+        return 'Topics must be non-empty names'
+
+    # One score per topic: 'Python' and 'python ' are the same topic, and
+    # storage, rollups and analytics all expect it only once per submission
+    if _has_duplicates(fold_topic(topic) for topic in topics):
+        return DUPLICATE_TOPIC_ERROR
+
+    return None
+
+
+def canonicalize_topics(topics, catalog):
+    """Return (topics under their catalog names, error) for validated topics, rejecting aliases of one topic"""
+    topics = catalog.canonical_topics(topics)
+    if _has_duplicates(topics):
+        return topics, DUPLICATE_TOPIC_ERROR
+    return topics, None
@@ -6,8 +6,16 @@ import Feedback from './components/Feedback';
 import HistoryViewer from './components/HistoryViewer';
 import ProgressChart from './components/ProgressChart';
 import DarkModeToggle from './components/DarkModeToggle';
+import { clearSubmissionCache } from './submissionCache';
+import { clearETagCache, fetchWithETag } from './config/api';
+import { readEventStream } from './feedbackStream';
 import './App.css';
 
+// Shortest gap between polls for a queued AI job, and how long to keep polling
+// (a little past the server's FEEDBACK_JOB_TIMEOUT, which fails lost jobs)
+const FEEDBACK_POLL_INTERVAL_MS = 1000;
+const FEEDBACK_POLL_LIMIT_MS = 6 * 60 * 1000;
+
 function App() {
   const [isAuthenticated, setIsAuthenticated] = useState(false);
   const [sessionToken, setSessionToken] = useState(null);
@@ -19,6 +27,7 @@ function App() {
   const [summaryScore, setSummaryScore] = useState(0);
   const [feedbackMode, setFeedbackMode] = useState('ai');
   const [isLoading, setIsLoading] = useState(false);
+  const [isStreaming, setIsStreaming] = useState(false);
   const [activeTab, setActiveTab] = useState('assessment');
   const [darkMode, setDarkMode] = useState(false);
 
@@ -86,6 +95,8 @@ function App() {
 
     localStorage.removeItem('session_token');
     localStorage.removeItem('username');
+    clearSubmissionCache();
+    clearETagCache();
     setSessionToken(null);
     setCurrentUser(null);
     setIsAuthenticated(false);
@@ -130,12 +141,109 @@ function App() {
     return response;
   };
 
+  // 429 responses say in Retry-After how long to wait before trying again
+  const responseError = (response) => {
+    const error = new Error(`HTTP error! status: ${response.status}`);
+    if (response.status === 429) {
+      error.retryAfter = Number(response.headers.get('Retry-After')) || 1;
+    }
+    return error;
+  };
+
+  // Topic names from the server's catalog, for autocomplete in ScoreForm
+  const suggestTopics = async (prefix) => {
+    const response = await makeAuthenticatedRequest(
+      `http://localhost:5000/topics/suggest?q=${encodeURIComponent(prefix)}`
+    );
+    if (!response || !response.ok) return [];
+    const data = await response.json();
+    return data.suggestions;
+  };
+
+  // AI feedback is generated in the background; long-poll its status
+  // endpoint until the submission is no longer pending
+  // Polls for a queued AI job's result. The server answers at once when it
+  // has no long-poll slot free, so each round also waits a little, and the
+  // client gives up after FEEDBACK_POLL_LIMIT_MS rather than polling forever.
+  const waitForFeedback = async (submissionId) => {
+    const giveUpAt = Date.now() + FEEDBACK_POLL_LIMIT_MS;
+    let data;
+    do {
+      if (Date.now() > giveUpAt) {
+        const error = new Error('Timed out waiting for feedback');
+        error.timedOut = true;
+        throw error;
+      }
+
+      const polledAt = Date.now();
+      const response = await makeAuthenticatedRequest(`http://localhost:5000/feedback/${submissionId}?wait=10`);
+      if (!response) return null;
+
+      if (!response.ok) {
+        throw responseError(response);
+      }
+
+      data = await response.json();
+      const elapsed = Date.now() - polledAt;
+      if (data.status === 'pending' && elapsed < FEEDBACK_POLL_INTERVAL_MS) {
+        await new Promise(resolve => setTimeout(resolve, FEEDBACK_POLL_INTERVAL_MS - elapsed));
+      }
+    } while (data.status === 'pending');
+
+    return data;
+  };
+
+  // AI feedback is streamed token by token so text appears as soon as the
+  // model produces it. Returns false when streaming is unavailable and the
+  // queued endpoint should be used instead.
+  const streamAIFeedback = async (topicsData, scoresData) => {
+    const response = await makeAuthenticatedRequest('http://localhost:5000/feedback/stream', {
+      method: 'POST',
+      body: JSON.stringify({ topics: topicsData, scores: scoresData }),
+    });
+    if (!response) return true;
+    if (response.status === 404 || response.status === 503) return false;
+    if (!response.ok) {
+      throw responseError(response);
+    }
+
+    setTopics(topicsData);
+    setScores(scoresData);
+    setFeedback('');
+    setResources([]);
+    setIsStreaming(true);
+
+    try {
+      await readEventStream(response, (event, data) => {
+        if (event === 'start') {
+          setSummaryScore(data.summary_score);
+        } else if (event === 'token') {
+          setIsLoading(false);
+          setFeedback(previous => previous + data.text);
+        } else if (event === 'done') {
+          // The final text replaces the streamed one, e.g. after a fallback
+          setFeedback(data.feedback);
+          setResources(data.resources || []);
+        } else if (event === 'error') {
+          throw new Error(data.error);
+        }
+      });
+    } finally {
+      setIsStreaming(false);
+    }
+    return true;
+  };
+
   const handleSubmit = async (topicsData, scoresData, feedbackModeData) => {
     console.log('Submitting feedback request:', { topicsData, scoresData, feedbackModeData });
     setIsLoading(true);
     setFeedbackMode(feedbackModeData);
     
     try {
+      if (feedbackModeData === 'ai' && await streamAIFeedback(topicsData, scoresData)) {
+        return;
+      }
+
       const response = await makeAuthenticatedRequest('http://localhost:5000/feedback', {
         method: 'POST',
         body: JSON.stringify({
@@ -151,10 +259,16 @@ function App() {
       }
 
       if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`);
+        throw responseError(response);
+      }
+
+      let data = await response.json();
+
+      if (response.status === 202) {
+        data = await waitForFeedback(data.id);
+        if (!data) return;
       }
 
-      const data = await response.json();
       console.log('Feedback response:', data);
       setFeedback(data.feedback);
       setResources(data.resources || []);
@@ -163,7 +277,13 @@ function App() {
       setScores(scoresData);
     } catch (error) {
       console.error('Error getting feedback:', error);
-      setFeedback('Error generating feedback. Please try again.');
+      if (error.retryAfter) {
+        setFeedback(`Too many requests. Please try again in ${error.retryAfter} seconds.`);
+      } else if (error.timedOut) {
+        setFeedback('Feedback is taking too long. Check your history later or try again.');
+      } else {
+        setFeedback('Error generating feedback. Please try again.');
+      }
     } finally {
       setIsLoading(false);
     }
@@ -171,10 +291,11 @@ function App() {
 
   const exportCSV = async () => {
     try {
-      const response = await makeAuthenticatedRequest('http://localhost:5000/export/csv');
-      if (!response) return;
+      const blob = await fetchWithETag(
+        makeAuthenticatedRequest, 'http://localhost:5000/export/csv', response => response.blob()
+      );
+      if (!blob) return;
 
-      const blob = await response.blob();
       const url = window.URL.createObjectURL(blob);
       const a = document.createElement('a');
       a.href = url;
@@ -273,6 +394,7 @@ function App() {
                   scores={scores}
                   onSubmit={handleSubmit}
                   isLoading={isLoading}
+                  suggestTopics={suggestTopics}
                 />
               </div>
 
@@ -319,7 +441,7 @@ function App() {
                       {feedbackMode === 'ai' ? 'AI Agent' : 'Rule-based'} Feedback
                     </h3>
                   </div>
-                  <Feedback feedback={feedback} resources={resources} />
+                  <Feedback feedback={feedback} resources={resources} isStreaming={isStreaming} />
                 </div>
               )}
             </div>
@@ -1,6 +1,6 @@
 import React, { useState } from 'react';
 
-const Feedback = ({ feedback, resources, feedbackMode, onExportPDF }) => {
+const Feedback = ({ feedback, resources, feedbackMode, onExportPDF, isStreaming = false }) => {
   const [showResources, setShowResources] = useState(false);
 
   const getModeIcon = (mode) => {
@@ -31,8 +31,16 @@ const Feedback = ({ feedback, resources, feedbackMode, onExportPDF }) => {
       {/* Feedback Content */}
       <div className="prose dark:prose-invert max-w-none">
         <div className="bg-gray-50 dark:bg-gray-700 rounded-lg p-4 border-l-4 border-blue-500">
-          <div className="whitespace-pre-wrap text-gray-700 dark:text-gray-300 leading-relaxed">
+          <div
+            className="whitespace-pre-wrap text-gray-700 dark:text-gray-300 leading-relaxed"
+            aria-live="polite"
+            aria-busy={isStreaming}
+          >
             {feedback}
+            {/* Cursor shown while AI tokens are still arriving */}
+            {isStreaming && (
+              <span className="inline-block w-2 h-4 ml-0.5 align-middle bg-blue-500 animate-pulse" />
+            )}
           </div>
         </div>
       </div>
@@ -1,18 +1,62 @@
 import React, { useState, useEffect, useCallback } from 'react';
 import { Bar } from 'react-chartjs-2';
+import {
+  getCachedHistory,
+  setCachedHistory,
+  fetchSince,
+  maxId,
+} from '../submissionCache';
+import { fetchWithETag } from '../config/api';
+
+const HISTORY_URL = 'http://localhost:5000/history';
+const PAGE_SIZE = 20;
 
 const HistoryViewer = ({ makeAuthenticatedRequest }) => {
   const [submissions, setSubmissions] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [expandedId, setExpandedId] = useState(null);
 
+  const updateHistory = (history) => {
+    setCachedHistory(history);
+    setSubmissions(history.submissions);
+    setNextCursor(history.nextCursor);
+  };
+
   const fetchHistory = useCallback(async () => {
     try {
-      const response = await makeAuthenticatedRequest('http://localhost:5000/history');
-      if (!response) return;
+      const cached = getCachedHistory();
+      // Pending AI submissions change in place, so reload rather than
+      // trusting a cache that only picks up new ids
+      const hasPending = cached && cached.submissions.some(submission => submission.status === 'pending');
+      if (cached && !hasPending) {
+        // Show what we already have, then fetch only newer submissions
+        setSubmissions(cached.submissions);
+        setNextCursor(cached.nextCursor);
+        setLoading(false);
 
-      const data = await response.json();
-      setSubmissions(data.submissions || []);
+        const delta = await fetchSince(makeAuthenticatedRequest, HISTORY_URL, 'submissions', cached.latestId);
+        if (!delta || delta.items.length === 0) return;
+
+        // Deltas arrive oldest first, the list is shown newest first
+        updateHistory({
+          submissions: [...delta.items.reverse(), ...cached.submissions],
+          nextCursor: cached.nextCursor,
+          latestId: delta.latestId,
+        });
+        return;
+      }
+
+      const data = await fetchWithETag(makeAuthenticatedRequest, `${HISTORY_URL}?limit=${PAGE_SIZE}`);
+      if (!data) return;
+
+      const page = data.submissions || [];
+      updateHistory({
+        submissions: page,
+        nextCursor: data.next_cursor,
+        latestId: maxId(page),
+      });
     } catch (error) {
       console.error('Error fetching history:', error);
     } finally {
@@ -20,6 +64,31 @@ const HistoryViewer = ({ makeAuthenticatedRequest }) => {
     }
   }, [makeAuthenticatedRequest]);
 
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+
+    try {
+      const response = await makeAuthenticatedRequest(
+        `${HISTORY_URL}?limit=${PAGE_SIZE}&cursor=${encodeURIComponent(nextCursor)}`
+      );
+      if (!response) return;
+
+      const data = await response.json();
+      const page = data.submissions || [];
+      const cached = getCachedHistory();
+      updateHistory({
+        submissions: [...submissions, ...page],
+        nextCursor: data.next_cursor,
+        latestId: maxId(page, cached ? cached.latestId : 0),
+      });
+    } catch (error) {
+      console.error('Error loading more history:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     fetchHistory();
   }, [fetchHistory]);
@@ -229,6 +298,7 @@ const HistoryViewer = ({ makeAuthenticatedRequest }) => {
                   </h4>
                   <div className="bg-gray-50 dark:bg-gray-700 p-4 rounded-lg">
                     <p className="text-sm text-gray-700 dark:text-gray-300 whitespace-pre-wrap">
+                      {submission.status === 'pending' && 'Feedback is still being generated...'}
                       {submission.feedback.length > 500 
                         ? submission.feedback.substring(0, 500) + '...' 
                         : submission.feedback}
@@ -240,6 +310,18 @@ const HistoryViewer = ({ makeAuthenticatedRequest }) => {
           </div>
         </div>
       ))}
+
+      {nextCursor && (
+        <div className="flex justify-center">
+          <button
+            onClick={loadMore}
+            disabled={loadingMore}
+            className="px-6 py-2 bg-blue-500 text-white rounded-lg hover:bg-blue-600 disabled:opacity-50 transition-colors"
+          >
+            {loadingMore ? 'Loading...' : 'Load more'}
+          </button>
+        </div>
+      )}
     </div>
   );
 };
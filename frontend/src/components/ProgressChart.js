@@ -10,6 +10,7 @@ import {
   Tooltip,
   Legend,
 } from 'chart.js';
+import { fetchWithETag } from '../config/api';
 
 ChartJS.register(
   CategoryScale,
@@ -21,87 +22,81 @@ ChartJS.register(
   Legend
 );
 
+const PROGRESS_URL = 'http://localhost:5000/progress';
+
 const ProgressChart = ({ makeAuthenticatedRequest }) => {
-  const [progressData, setProgressData] = useState([]);
+  const [rollups, setRollups] = useState([]);
+  const [overallTopic, setOverallTopic] = useState('__overall__');
+  const [bucket, setBucket] = useState('day');
   const [loading, setLoading] = useState(true);
   const [selectedTopic, setSelectedTopic] = useState('summary');
 
   const fetchProgressData = useCallback(async () => {
     try {
-      const response = await makeAuthenticatedRequest('http://localhost:5000/progress');
-      if (!response) return;
+      // Rollups are pre-aggregated per topic and day/week on the server,
+      // so this is O(buckets) no matter how many assessments exist
+      const data = await fetchWithETag(makeAuthenticatedRequest, `${PROGRESS_URL}?bucket=${bucket}`);
+      if (!data) return;
 
-      const data = await response.json();
-      setProgressData(data.progress || []);
+      setRollups(data.rollups || []);
+      if (data.overall_topic) setOverallTopic(data.overall_topic);
     } catch (error) {
       console.error('Error fetching progress data:', error);
     } finally {
       setLoading(false);
     }
-  }, [makeAuthenticatedRequest]);
+  }, [makeAuthenticatedRequest, bucket]);
 
   useEffect(() => {
     fetchProgressData();
   }, [fetchProgressData]);
 
+  const overallSeries = rollups.filter(entry => entry.topic === overallTopic);
+
   const getAllTopics = () => {
     const topics = new Set();
-    progressData.forEach(entry => {
-      entry.topics.forEach(topic => topics.add(topic));
+    rollups.forEach(entry => {
+      if (entry.topic !== overallTopic) topics.add(entry.topic);
     });
     return Array.from(topics);
   };
 
+  const getSelectedSeries = () => (
+    selectedTopic === 'summary'
+      ? overallSeries
+      : rollups.filter(entry => entry.topic === selectedTopic)
+  );
+
   const createChartData = () => {
-    if (progressData.length === 0) return { labels: [], datasets: [] };
+    const series = getSelectedSeries();
+    if (series.length === 0) return { labels: [], datasets: [] };
 
-    const labels = progressData.map(entry => 
-      new Date(entry.timestamp).toLocaleDateString('en-US', { 
-        month: 'short', 
-        day: 'numeric' 
+    const labels = series.map(entry =>
+      new Date(`${entry.bucket_start}T00:00:00`).toLocaleDateString('en-US', {
+        month: 'short',
+        day: 'numeric'
       })
     );
 
-    if (selectedTopic === 'summary') {
-      return {
-        labels,
-        datasets: [
-          {
-            label: 'Overall Score',
-            data: progressData.map(entry => entry.summary_score),
-            borderColor: 'rgb(59, 130, 246)',
-            backgroundColor: 'rgba(59, 130, 246, 0.1)',
-            tension: 0.4,
-            pointRadius: 6,
-            pointHoverRadius: 8,
-            pointBackgroundColor: 'rgb(59, 130, 246)',
-            pointBorderColor: 'white',
-            pointBorderWidth: 2,
-          },
-        ],
-      };
-    } else {
-      return {
-        labels,
-        datasets: [
-          {
-            label: selectedTopic,
-            data: progressData.map(entry => {
-              const topicIndex = entry.topics.indexOf(selectedTopic);
-              return topicIndex !== -1 ? entry.scores[topicIndex] : null;
-            }),
-            borderColor: 'rgb(168, 85, 247)',
-            backgroundColor: 'rgba(168, 85, 247, 0.1)',
-            tension: 0.4,
-            pointRadius: 6,
-            pointHoverRadius: 8,
-            pointBackgroundColor: 'rgb(168, 85, 247)',
-            pointBorderColor: 'white',
-            pointBorderWidth: 2,
-          },
-        ],
-      };
-    }
+    const color = selectedTopic === 'summary' ? '59, 130, 246' : '168, 85, 247';
+
+    return {
+      labels,
+      datasets: [
+        {
+          label: selectedTopic === 'summary' ? 'Overall Score' : selectedTopic,
+          data: series.map(entry => entry.average),
+          borderColor: `rgb(${color})`,
+          backgroundColor: `rgba(${color}, 0.1)`,
+          tension: 0.4,
+          pointRadius: 6,
+          pointHoverRadius: 8,
+          pointBackgroundColor: `rgb(${color})`,
+          pointBorderColor: 'white',
+          pointBorderWidth: 2,
+        },
+      ],
+    };
   };
 
   const chartOptions = {
@@ -152,15 +147,7 @@ const ProgressChart = ({ makeAuthenticatedRequest }) => {
   };
 
   const calculateTrend = () => {
-    if (progressData.length < 2) return null;
-
-    const data = selectedTopic === 'summary' 
-      ? progressData.map(entry => entry.summary_score)
-      : progressData.map(entry => {
-          const topicIndex = entry.topics.indexOf(selectedTopic);
-          return topicIndex !== -1 ? entry.scores[topicIndex] : null;
-        }).filter(score => score !== null);
-
+    const data = getSelectedSeries().map(entry => entry.average);
     if (data.length < 2) return null;
 
     const firstScore = data[0];
@@ -185,7 +172,7 @@ const ProgressChart = ({ makeAuthenticatedRequest }) => {
     );
   }
 
-  if (progressData.length === 0) {
+  if (overallSeries.length === 0) {
     return (
       <div className="text-center py-12">
         <div className="text-6xl mb-4">📈</div>
@@ -201,9 +188,29 @@ const ProgressChart = ({ makeAuthenticatedRequest }) => {
 
   const trend = calculateTrend();
   const allTopics = getAllTopics();
+  const totalAssessments = overallSeries.reduce((sum, entry) => sum + entry.count, 0);
+  const bestScore = Math.max(...overallSeries.map(entry => entry.max));
+  const averageScore = overallSeries.reduce((sum, entry) => sum + entry.average * entry.count, 0) / totalAssessments;
 
   return (
     <div className="space-y-6">
+      {/* Bucket Selector */}
+      <div className="flex gap-2">
+        {['day', 'week'].map(option => (
+          <button
+            key={option}
+            onClick={() => setBucket(option)}
+            className={`px-3 py-1 rounded-lg text-sm font-medium transition-colors ${
+              bucket === option
+                ? 'bg-gray-800 dark:bg-gray-200 text-white dark:text-gray-900'
+                : 'bg-gray-200 dark:bg-gray-700 text-gray-700 dark:text-gray-300 hover:bg-gray-300 dark:hover:bg-gray-600'
+            }`}
+          >
+            {option === 'day' ? 'Daily' : 'Weekly'}
+          </button>
+        ))}
+      </div>
+
       {/* Topic Selector */}
       <div className="flex flex-wrap gap-2">
         <button
@@ -262,7 +269,7 @@ const ProgressChart = ({ makeAuthenticatedRequest }) => {
             Total Assessments
           </div>
           <div className="text-2xl font-bold text-blue-800 dark:text-blue-300">
-            {progressData.length}
+            {totalAssessments}
           </div>
         </div>
         
@@ -271,7 +278,7 @@ const ProgressChart = ({ makeAuthenticatedRequest }) => {
             Best Score
           </div>
           <div className="text-2xl font-bold text-green-800 dark:text-green-300">
-            {Math.max(...progressData.map(p => p.summary_score)).toFixed(1)}/100
+            {bestScore.toFixed(1)}/100
           </div>
         </div>
         
@@ -280,7 +287,7 @@ const ProgressChart = ({ makeAuthenticatedRequest }) => {
             Average Score
           </div>
           <div className="text-2xl font-bold text-purple-800 dark:text-purple-300">
-            {(progressData.reduce((sum, p) => sum + p.summary_score, 0) / progressData.length).toFixed(1)}/100
+            {averageScore.toFixed(1)}/100
           </div>
         </div>
       </div>
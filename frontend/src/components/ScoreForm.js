@@ -1,14 +1,34 @@
-import React, { useState } from 'react';
+import React, { useRef, useState } from 'react';
 
-const ScoreForm = ({ topics, scores, onSubmit, isLoading }) => {
+const ScoreForm = ({ topics, scores, onSubmit, isLoading, suggestTopics }) => {
   const [localTopics, setLocalTopics] = useState(topics);
   const [localScores, setLocalScores] = useState(scores);
   const [feedbackMode, setFeedbackMode] = useState('ai');
+  const [topicSuggestions, setTopicSuggestions] = useState([]);
+  const latestPrefix = useRef('');
 
   const handleTopicChange = (index, value) => {
     const newTopics = [...localTopics];
     newTopics[index] = value;
     setLocalTopics(newTopics);
+    updateSuggestions(value);
+  };
+
+  const updateSuggestions = async (prefix) => {
+    latestPrefix.current = prefix;
+    if (!suggestTopics || !prefix.trim()) {
+      setTopicSuggestions([]);
+      return;
+    }
+    try {
+      const suggestions = await suggestTopics(prefix);
+      // Answers can arrive out of order; only the latest keystroke counts
+      if (latestPrefix.current === prefix) {
+        setTopicSuggestions(suggestions);
+      }
+    } catch (error) {
+      console.error('Error fetching topic suggestions:', error);
+    }
   };
 
   const handleScoreChange = (index, value) => {
@@ -106,6 +126,7 @@ const ScoreForm = ({ topics, scores, onSubmit, isLoading }) => {
               value={topic}
               onChange={(e) => handleTopicChange(index, e.target.value)}
               placeholder={`Topic ${index + 1}`}
+              list="topic-suggestions"
               className="flex-1 px-4 py-2 border border-gray-300 dark:border-gray-600 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-blue-500 dark:bg-gray-700 dark:text-white"
               required
             />
@@ -150,6 +171,12 @@ const ScoreForm = ({ topics, scores, onSubmit, isLoading }) => {
         </div>
       ))}
 
+      <datalist id="topic-suggestions">
+        {topicSuggestions.map((suggestion) => (
+          <option key={suggestion} value={suggestion} />
+        ))}
+      </datalist>
+
       <div className="flex space-x-3">
         <button
           type="button"
@@ -23,4 +23,32 @@ export const API_ENDPOINTS = {
   HISTORY: `${API_BASE_URL}/history`,
   PROGRESS: `${API_BASE_URL}/progress`,
   EXPORT_CSV: `${API_BASE_URL}/export/csv`,
-};
\ No newline at end of file
+};
+
+// Conditional GETs: remember each URL's ETag and parsed body, and reuse the
+// body when the server answers 304 Not Modified. The server bumps the ETag
+// whenever the user's submissions change.
+const etagCache = new Map();
+
+export const fetchWithETag = async (makeAuthenticatedRequest, url, read = response => response.json()) => {
+  const cached = etagCache.get(url);
+  const options = cached ? { headers: { 'If-None-Match': cached.etag } } : {};
+
+  const response = await makeAuthenticatedRequest(url, options);
+  if (!response) return null;
+  if (response.status === 304 && cached) return cached.body;
+  if (!response.ok) {
+    throw new Error(`HTTP error! status: ${response.status}`);
+  }
+
+  const body = await read(response);
+  const etag = response.headers.get('ETag');
+  if (etag) {
+    etagCache.set(url, { etag, body });
+  }
+  return body;
+};
+
+export const clearETagCache = () => {
+  etagCache.clear();
+};
@@ -0,0 +1,35 @@
+// EventSource can neither POST nor send an Authorization header, so the
+// /feedback/stream response is read from fetch and split into Server-Sent
+// Events here. onEvent(event, data) is called once per event with its
+// parsed JSON payload; an error thrown by it stops reading.
+export const readEventStream = async (response, onEvent) => {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  try {
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let boundary = buffer.indexOf('\n\n');
+      while (boundary !== -1) {
+        const block = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+
+        let event = 'message';
+        const data = [];
+        block.split('\n').forEach(line => {
+          if (line.startsWith('event: ')) event = line.slice(7);
+          else if (line.startsWith('data: ')) data.push(line.slice(6));
+        });
+        if (data.length > 0) onEvent(event, JSON.parse(data.join('\n')));
+
+        boundary = buffer.indexOf('\n\n');
+      }
+    }
+  } finally {
+    reader.releaseLock();
+  }
+};
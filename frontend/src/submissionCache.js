@@ -0,0 +1,43 @@
+import { fetchWithETag } from './config/api';
+
+// In-memory cache of already downloaded submissions, so revisiting the
+// History tab only fetches what was added since the last visit.
+const emptyCache = () => ({
+  history: null,
+});
+
+let cache = emptyCache();
+
+export const getCachedHistory = () => cache.history;
+
+export const setCachedHistory = (history) => {
+  cache.history = history;
+};
+
+export const clearSubmissionCache = () => {
+  cache = emptyCache();
+};
+
+// Follow since_id deltas until the server reports nothing more to fetch.
+// Returns the new items (oldest first) and the latest id seen, or null if
+// the session expired mid-way.
+export const fetchSince = async (makeAuthenticatedRequest, url, key, sinceId) => {
+  let items = [];
+  let latestId = sinceId;
+  let hasMore = true;
+
+  while (hasMore) {
+    // Answered with 304 when nothing changed since the last identical request
+    const data = await fetchWithETag(makeAuthenticatedRequest, `${url}?since_id=${latestId}&limit=500`);
+    if (!data) return null;
+
+    items = items.concat(data[key] || []);
+    latestId = data.latest_id;
+    hasMore = data.has_more;
+  }
+
+  return { items, latestId };
+};
+
+export const maxId = (items, fallback = 0) =>
+  items.reduce((max, item) => Math.max(max, item.id), fallback);